@@ -0,0 +1,227 @@
+"""批量Text-to-SQL生成模块"""
+import csv
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Iterator
+from config import Config
+
+
+def read_questions(input_path: str) -> List[Dict[str, Any]]:
+    """
+    读取问题文件
+
+    支持两种格式：
+    - CSV：必须包含 `question` 列，可选 `id` 列
+    - JSONL：每行一个对象，必须包含 `question` 字段，可选 `id` 字段
+
+    没有id时使用问题文本作为唯一标识。
+
+    Args:
+        input_path: 问题文件路径
+
+    Returns:
+        问题列表，每项包含id和question
+    """
+    questions = []
+    if input_path.lower().endswith('.csv'):
+        with open(input_path, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.DictReader(f)
+            if 'question' not in (reader.fieldnames or []):
+                raise ValueError("CSV文件缺少必需的列: question")
+            for row in reader:
+                questions.append(row)
+    else:
+        with open(input_path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f"第 {line_no} 行不是合法的JSON: {e}")
+                if 'question' not in row:
+                    raise ValueError(f"第 {line_no} 行缺少 question 字段")
+                questions.append(row)
+
+    result = []
+    for row in questions:
+        question = str(row['question']).strip()
+        if not question:
+            continue
+        question_id = str(row.get('id') or '').strip() or question
+        result.append({'id': question_id, 'question': question})
+    return result
+
+
+def load_answered_ids(output_path: str) -> set:
+    """
+    读取已有的输出文件，返回已成功生成SQL的问题id
+
+    Args:
+        output_path: 输出文件路径（JSONL）
+
+    Returns:
+        已完成的问题id集合
+    """
+    answered = set()
+    if not os.path.exists(output_path):
+        return answered
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 上次中断时可能留下不完整的最后一行
+                continue
+            if record.get('sql') and not record.get('error'):
+                answered.add(record['id'])
+    return answered
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """计算已排序数据的百分位数（线性插值）"""
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+class BatchRunner:
+    """批量生成SQL，结果以JSONL格式流式写入输出文件"""
+
+    def __init__(
+        self,
+        text_to_sql,
+        workers: int = None,
+        use_examples: bool = True,
+        max_examples: int = None,
+    ):
+        """
+        初始化批量运行器
+
+        Args:
+            text_to_sql: TextToSQL实例
+            workers: 并发线程数，默认为config中的值
+            use_examples: 是否使用few-shot examples
+            max_examples: 最多使用的样例数量
+        """
+        self.text_to_sql = text_to_sql
+        self.workers = workers or Config.BATCH_WORKERS
+        self.use_examples = use_examples
+        self.max_examples = max_examples
+
+    def _generate(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """为单个问题生成SQL，记录耗时和错误"""
+        start = time.perf_counter()
+        record = {'id': item['id'], 'question': item['question'], 'sql': None, 'error': None}
+        try:
+            record['sql'] = self.text_to_sql.generate_sql(
+                question=item['question'],
+                use_examples=self.use_examples,
+                max_examples=self.max_examples,
+            )
+        except Exception as e:
+            record['error'] = str(e)
+        record['latency_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        return record
+
+    def _run_pool(self, pending: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """并发执行，按完成顺序返回结果；提交窗口有限，避免一次性提交全部问题"""
+        window = self.workers * 4
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            items = iter(pending)
+            futures = set()
+            for item in items:
+                futures.add(executor.submit(self._generate, item))
+                if len(futures) >= window:
+                    break
+            while futures:
+                future = next(as_completed(futures))
+                futures.remove(future)
+                yield future.result()
+                for item in items:
+                    futures.add(executor.submit(self._generate, item))
+                    break
+
+    def run(self, input_path: str, output_path: str) -> Dict[str, Any]:
+        """
+        批量生成SQL
+
+        已在输出文件中成功生成SQL的问题会被跳过，失败的问题会重新生成（追加新记录）。
+
+        Args:
+            input_path: 问题文件路径（CSV或JSONL）
+            output_path: 输出文件路径（JSONL）
+
+        Returns:
+            统计信息字典
+        """
+        questions = read_questions(input_path)
+        answered = load_answered_ids(output_path)
+
+        seen = set()
+        pending = []
+        for item in questions:
+            if item['id'] in answered or item['id'] in seen:
+                continue
+            seen.add(item['id'])
+            pending.append(item)
+
+        print(f"问题总数: {len(questions)}，已完成: {len(questions) - len(pending)}，待生成: {len(pending)}")
+
+        latencies = []
+        failed = 0
+        start = time.perf_counter()
+
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        with open(output_path, 'a', encoding='utf-8') as out:
+            for done, record in enumerate(self._run_pool(pending), 1):
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+
+                latencies.append(record['latency_ms'])
+                if record['error']:
+                    failed += 1
+                if done % 50 == 0 or done == len(pending):
+                    print(f"  进度: {done}/{len(pending)}，失败: {failed}")
+
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        return {
+            'total': len(questions),
+            'skipped': len(questions) - len(pending),
+            'processed': len(pending),
+            'succeeded': len(pending) - failed,
+            'failed': failed,
+            'elapsed_s': elapsed,
+            'throughput': len(pending) / elapsed if elapsed > 0 else 0.0,
+            'latency_ms': {
+                'p50': percentile(latencies, 50),
+                'p90': percentile(latencies, 90),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'max': latencies[-1] if latencies else 0.0,
+            },
+        }
+
+
+def print_stats(stats: Dict[str, Any]):
+    """打印批量运行统计信息"""
+    latency = stats['latency_ms']
+    print("\n批量生成完成")
+    print("-" * 60)
+    print(f"处理: {stats['processed']}（成功 {stats['succeeded']}，失败 {stats['failed']}），跳过: {stats['skipped']}")
+    print(f"耗时: {stats['elapsed_s']:.1f}s，吞吐: {stats['throughput']:.2f} 问题/秒")
+    print(
+        f"延迟(ms): p50={latency['p50']:.0f} p90={latency['p90']:.0f} "
+        f"p95={latency['p95']:.0f} p99={latency['p99']:.0f} max={latency['max']:.0f}"
+    )
+    print("-" * 60)
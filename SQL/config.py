@@ -27,3 +27,22 @@ class Config:
     # Few-shot learning配置
     MAX_EXAMPLES = 5  # 最多使用多少个样例
     EXAMPLE_SELECTION_METHOD = 'similarity'  # 'similarity' 或 'random'
+    
+    # 样例去重配置
+    DEDUP_SIMILARITY_THRESHOLD = 0.8  # 问题近似重复的相似度阈值
+    DEDUP_NUM_PERM = 64  # MinHash签名长度
+    DEDUP_LSH_BANDS = 16  # LSH分段数（必须整除DEDUP_NUM_PERM）
+    DEDUP_NGRAM = 2  # 问题切分的字符n-gram长度
+    
+    # Excel schema缓存配置
+    SCHEMA_CACHE_ENABLED = os.getenv('SCHEMA_CACHE_ENABLED', 'true').lower() == 'true'
+    SCHEMA_CACHE_SUFFIX = '.schema.json'  # 缓存文件保存在Excel文件旁
+    
+    # 业务规则筛选配置
+    RULE_SELECTION_ENABLED = os.getenv('RULE_SELECTION_ENABLED', 'true').lower() == 'true'
+    RULES_TOKEN_BUDGET = int(os.getenv('RULES_TOKEN_BUDGET', '1500'))  # 规则文本的token预算
+    RULES_MIN_SCORE = 2.0  # 规则被选中的最低相关性得分
+    RULES_INCLUDE_GLOBAL = True  # 预算有剩余时是否补充未命中的通用业务规则
+    
+    # 批量生成配置
+    BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', '4'))  # 批量模式的默认并发数
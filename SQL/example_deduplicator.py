@@ -0,0 +1,251 @@
+"""样例去重模块"""
+import hashlib
+import random
+import re
+from typing import List, Dict, Any, Tuple, Optional
+from config import Config
+
+
+# Mersenne素数，用于MinHash的哈希函数族
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# SQL中的字符串字面量（保留原样，不做大小写归一化）
+_SQL_STRING_PATTERN = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+
+
+def normalize_question(question: str) -> str:
+    """
+    归一化问题文本：去除空白和标点，英文统一小写
+
+    Args:
+        question: 原始问题
+
+    Returns:
+        归一化后的问题文本
+    """
+    question = question.lower()
+    return re.sub(r'[\s\W_]+', '', question)
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    归一化SQL：去除多余空白、末尾分号，字符串字面量以外的部分统一小写
+
+    Args:
+        sql: 原始SQL
+
+    Returns:
+        归一化后的SQL文本
+    """
+    sql = sql.strip().rstrip(';').strip()
+    parts = _SQL_STRING_PATTERN.split(sql)
+    normalized = []
+    for i, part in enumerate(parts):
+        if i % 2 == 1:
+            # 字符串字面量
+            normalized.append(part)
+        else:
+            part = ' '.join(part.lower().split())
+            # 去除标点两侧的空白，使 "a , b" 与 "a,b" 等价
+            part = re.sub(r'\s*([(),=<>!+\-*/])\s*', r'\1', part)
+            normalized.append(part)
+    return ''.join(normalized)
+
+
+def sql_hash(sql: str) -> str:
+    """计算归一化SQL的哈希值"""
+    return hashlib.sha1(normalize_sql(sql).encode('utf-8')).hexdigest()
+
+
+def _shingles(text: str, ngram: int) -> set:
+    """将文本切分为字符n-gram集合"""
+    if len(text) <= ngram:
+        return {text} if text else set()
+    return {text[i:i + ngram] for i in range(len(text) - ngram + 1)}
+
+
+def _stable_hash(token: str) -> int:
+    """跨进程稳定的32位哈希（内置hash()受PYTHONHASHSEED影响）"""
+    return int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=4).digest(), 'little')
+
+
+class ExampleDeduplicator:
+    """基于MinHash/LSH的样例去重器
+
+    判定规则：
+    - 归一化后问题完全相同，视为重复
+    - 归一化SQL相同，且问题的MinHash估计相似度不低于阈值，视为近似重复
+    - 如果设置了 max_per_sql，同一条SQL最多保留指定数量的问题
+
+    LSH分桶只在同一SQL哈希内比较候选，整体复杂度接近线性。
+    """
+
+    def __init__(
+        self,
+        threshold: float = None,
+        num_perm: int = None,
+        bands: int = None,
+        ngram: int = None,
+        max_per_sql: Optional[int] = None,
+        seed: int = 1,
+    ):
+        """
+        初始化去重器
+
+        Args:
+            threshold: 问题近似重复的相似度阈值（Jaccard），默认为config中的值
+            num_perm: MinHash签名长度，默认为config中的值
+            bands: LSH分段数，必须整除num_perm，默认为config中的值
+            ngram: 问题切分的字符n-gram长度，默认为config中的值
+            max_per_sql: 同一条SQL最多保留的样例数，None表示不限制
+            seed: 哈希函数族的随机种子，保证结果可复现
+        """
+        self.threshold = threshold if threshold is not None else Config.DEDUP_SIMILARITY_THRESHOLD
+        self.num_perm = num_perm or Config.DEDUP_NUM_PERM
+        self.bands = bands or Config.DEDUP_LSH_BANDS
+        self.ngram = ngram or Config.DEDUP_NGRAM
+        self.max_per_sql = max_per_sql
+
+        if self.num_perm % self.bands != 0:
+            raise ValueError(f"num_perm ({self.num_perm}) 必须能被 bands ({self.bands}) 整除")
+        self.rows = self.num_perm // self.bands
+
+        rng = random.Random(seed)
+        self._perms = [
+            (rng.randint(1, _MERSENNE_PRIME - 1), rng.randint(0, _MERSENNE_PRIME - 1))
+            for _ in range(self.num_perm)
+        ]
+
+        self._seen_questions = set()
+        self._sql_counts = {}
+        self._buckets = {}
+        self._signatures = []
+
+    def _minhash(self, question: str) -> Tuple[int, ...]:
+        """计算问题的MinHash签名"""
+        hashes = [_stable_hash(s) for s in _shingles(question, self.ngram)]
+        if not hashes:
+            return tuple([_MAX_HASH] * self.num_perm)
+        return tuple(
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._perms
+        )
+
+    def _similarity(self, sig1: Tuple[int, ...], sig2: Tuple[int, ...]) -> float:
+        """根据签名估计Jaccard相似度"""
+        return sum(1 for x, y in zip(sig1, sig2) if x == y) / self.num_perm
+
+    def add(self, example: Dict[str, Any]) -> bool:
+        """
+        尝试加入一个样例
+
+        Args:
+            example: 样例字典，包含question和sql
+
+        Returns:
+            True表示样例被保留，False表示样例是重复的
+        """
+        question = normalize_question(example.get('question', ''))
+        sql_key = sql_hash(example.get('sql', ''))
+
+        if question in self._seen_questions:
+            return False
+
+        if self.max_per_sql is not None and self._sql_counts.get(sql_key, 0) >= self.max_per_sql:
+            return False
+
+        signature = self._minhash(question)
+        band_keys = [
+            (sql_key, band, signature[band * self.rows:(band + 1) * self.rows])
+            for band in range(self.bands)
+        ]
+
+        candidates = set()
+        for key in band_keys:
+            candidates.update(self._buckets.get(key, ()))
+        for idx in candidates:
+            if self._similarity(signature, self._signatures[idx]) >= self.threshold:
+                return False
+
+        idx = len(self._signatures)
+        self._signatures.append(signature)
+        for key in band_keys:
+            self._buckets.setdefault(key, []).append(idx)
+        self._seen_questions.add(question)
+        self._sql_counts[sql_key] = self._sql_counts.get(sql_key, 0) + 1
+        return True
+
+    def deduplicate(self, examples: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        对样例列表去重，保留每组重复中最先出现的样例
+
+        Args:
+            examples: 样例列表
+
+        Returns:
+            (保留的样例列表, 被移除的样例列表)
+        """
+        kept = []
+        removed = []
+        for example in examples:
+            if self.add(example):
+                kept.append(example)
+            else:
+                removed.append(example)
+        return kept, removed
+
+
+def main():
+    """主函数：压缩样例文件，移除重复和近似重复的样例"""
+    import argparse
+    from example_manager import ExampleManager
+
+    parser = argparse.ArgumentParser(description='样例去重工具')
+    parser.add_argument(
+        'examples_file',
+        nargs='?',
+        default=Config.EXAMPLES_FILE,
+        help=f'样例文件路径（默认: {Config.EXAMPLES_FILE}）',
+    )
+    parser.add_argument(
+        '--threshold',
+        '-t',
+        type=float,
+        default=Config.DEDUP_SIMILARITY_THRESHOLD,
+        help=f'问题近似重复的相似度阈值（默认: {Config.DEDUP_SIMILARITY_THRESHOLD}）',
+    )
+    parser.add_argument(
+        '--max-per-sql',
+        type=int,
+        help='同一条SQL最多保留的样例数量',
+    )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='只显示去重结果，不写回文件',
+    )
+
+    args = parser.parse_args()
+
+    example_manager = ExampleManager(args.examples_file)
+    examples = example_manager.get_examples()
+
+    deduplicator = ExampleDeduplicator(threshold=args.threshold, max_per_sql=args.max_per_sql)
+    kept, removed = deduplicator.deduplicate(examples)
+
+    print(f"样例总数: {len(examples)}，保留: {len(kept)}，移除: {len(removed)}")
+    for example in removed[:10]:
+        print(f"  - {example['question'][:50]}")
+    if len(removed) > 10:
+        print(f"  ... 另有 {len(removed) - 10} 个")
+
+    if args.dry_run or not removed:
+        return
+
+    example_manager.save(kept)
+    print(f"已写回 {args.examples_file}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,7 @@
 import json
 from excel_reader import ExcelReader
 from example_manager import ExampleManager
+from example_deduplicator import ExampleDeduplicator
 from rules_manager import RulesManager
 from llm_client import LLMClient
 from config import Config
@@ -27,6 +28,7 @@ class ExampleExpander:
         variations_per_example: int = 2,
         variation_types: list = None,
         use_diverse_types: bool = True,
+        deduplicate: bool = True,
     ) -> list:
         """
         扩展所有现有样例
@@ -35,6 +37,7 @@ class ExampleExpander:
             variations_per_example: 每个样例生成多少个变体
             variation_types: 变体类型列表，如果为None则自动选择
             use_diverse_types: 是否使用多样化的变体类型，True则自动选择多种类型
+            deduplicate: 是否过滤与现有样例或已生成样例重复、近似重复的变体
         
         Returns:
             新生成的样例列表
@@ -65,6 +68,13 @@ class ExampleExpander:
             return []
         
         new_examples = []
+        skipped_count = 0
+        
+        # 用现有样例初始化去重器，新变体只与已保留的样例比较
+        deduplicator = None
+        if deduplicate:
+            deduplicator = ExampleDeduplicator()
+            deduplicator.deduplicate(existing_examples)
         
         print(f"开始扩展 {len(existing_examples)} 个样例...")
         
@@ -94,30 +104,46 @@ class ExampleExpander:
                             diversity_hint=diversity_hint,
                             rules_text=rules_text if rules_text else None,
                         )
+                        if deduplicator and not deduplicator.add(new_example):
+                            skipped_count += 1
+                            print(f"  - 跳过重复样例: {new_example['question'][:50]}...")
+                            continue
                         new_examples.append(new_example)
                         print(f"  ✓ 生成成功: {new_example['question'][:50]}...")
                     
                     except Exception as e:
                         print(f"  ✗ 生成失败: {str(e)}")
         
+        if skipped_count:
+            print(f"\n共跳过 {skipped_count} 个重复或近似重复的样例")
+        
         return new_examples
     
-    def save_expanded_examples(self, new_examples: list, merge: bool = True):
+    def save_expanded_examples(self, new_examples: list, merge: bool = True, deduplicate: bool = True):
         """
         保存扩展后的样例
         
         Args:
             new_examples: 新生成的样例列表
             merge: 是否合并到现有样例中，True则合并，False则替换
+            deduplicate: 是否在保存前对全部样例去重
         """
         if merge:
             existing_examples = self.example_manager.get_examples()
             all_examples = existing_examples + new_examples
         else:
+            existing_examples = []
             all_examples = new_examples
         
+        if deduplicate:
+            all_examples, removed = ExampleDeduplicator().deduplicate(all_examples)
+            if removed:
+                print(f"\n去重移除 {len(removed)} 个重复样例")
+        
         self.example_manager.save(all_examples)
-        print(f"\n已保存 {len(new_examples)} 个新样例，总计 {len(all_examples)} 个样例")
+        # 去重后实际新增的样例数（与已有样例重复的新样例不计入）
+        added = max(len(all_examples) - len(existing_examples), 0)
+        print(f"\n已保存 {added} 个新样例，总计 {len(all_examples)} 个样例")
 
 
 def main():
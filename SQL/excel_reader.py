@@ -1,21 +1,33 @@
 """Excel表定义读取模块"""
-import pandas as pd
-from typing import List, Dict, Any
-from collections import defaultdict
+import hashlib
+import json
+import os
+from typing import List, Dict, Any, Optional
+from config import Config
+
+
+# 缓存格式版本，解析逻辑变化时递增以使旧缓存失效
+SCHEMA_CACHE_VERSION = 1
 
 
 class ExcelReader:
     """读取Excel格式的数据库表定义"""
     
-    def __init__(self, excel_path: str):
+    REQUIRED_COLUMNS = ['表名', '表含义', '字段名', '字段类型', '字段含义']
+    
+    def __init__(self, excel_path: str, use_cache: bool = None):
         """
         初始化Excel读取器
         
         Args:
             excel_path: Excel文件路径
+            use_cache: 是否使用解析结果缓存，None则使用配置中的默认值
         """
         self.excel_path = excel_path
+        self.use_cache = Config.SCHEMA_CACHE_ENABLED if use_cache is None else use_cache
+        self.cache_path = excel_path + Config.SCHEMA_CACHE_SUFFIX
         self.schema = None
+        self._prompt_text = None  # format_schema_for_prompt() 的缓存结果
     
     def read(self) -> Dict[str, Any]:
         """
@@ -33,56 +45,111 @@ class ExcelReader:
             }
         """
         try:
-            df = pd.read_excel(self.excel_path)
-            
-            # 标准化列名（去除空格，统一大小写）
-            df.columns = df.columns.str.strip()
+            file_hash = self._file_hash()
             
-            # 检查必需的列
-            required_columns = ['表名', '表含义', '字段名', '字段类型', '字段含义']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            
-            if missing_columns:
-                raise ValueError(f"Excel文件缺少必需的列: {missing_columns}")
-            
-            # 按表名分组
-            schema = {}
-            
-            for _, row in df.iterrows():
-                table_name = str(row['表名']).strip()
-                table_desc = str(row['表含义']).strip()
-                field_name = str(row['字段名']).strip()
-                field_type = str(row['字段类型']).strip()
-                field_desc = str(row['字段含义']).strip()
-                
-                if table_name not in schema:
-                    schema[table_name] = {
-                        '表含义': table_desc,
-                        '字段': [],
-                    }
-                
-                schema[table_name]['字段'].append({
-                    '字段名': field_name,
-                    '字段类型': field_type,
-                    '字段含义': field_desc,
-                })
+            schema = self._load_cache(file_hash) if self.use_cache else None
+            if schema is None:
+                schema = self._parse_excel()
+                if self.use_cache:
+                    self._save_cache(file_hash, schema)
             
             self.schema = schema
+            self._prompt_text = None
             return schema
         
         except Exception as e:
             raise Exception(f"读取Excel文件失败: {str(e)}")
     
+    def _parse_excel(self) -> Dict[str, Any]:
+        """使用pandas解析Excel文件"""
+        # 延迟导入：命中缓存时无需加载pandas
+        import pandas as pd
+        
+        df = pd.read_excel(self.excel_path)
+        
+        # 标准化列名（去除空格，统一大小写）
+        df.columns = df.columns.str.strip()
+        
+        # 检查必需的列
+        missing_columns = [col for col in self.REQUIRED_COLUMNS if col not in df.columns]
+        
+        if missing_columns:
+            raise ValueError(f"Excel文件缺少必需的列: {missing_columns}")
+        
+        # 按列向量化地转换为去除空白的字符串，空单元格转换为空字符串
+        df = df[self.REQUIRED_COLUMNS].fillna('').astype(str).apply(lambda col: col.str.strip())
+        
+        # 按表名分组，保持表在Excel中首次出现的顺序
+        schema = {}
+        for table_name, group in df.groupby('表名', sort=False):
+            schema[table_name] = {
+                '表含义': group['表含义'].iloc[0],
+                '字段': group[['字段名', '字段类型', '字段含义']].to_dict('records'),
+            }
+        
+        return schema
+    
+    def _file_hash(self) -> str:
+        """计算Excel文件内容的哈希值"""
+        digest = hashlib.sha256()
+        with open(self.excel_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def _load_cache(self, file_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        读取解析结果缓存
+        
+        Args:
+            file_hash: 当前Excel文件的内容哈希
+        
+        Returns:
+            缓存的schema，缓存不存在或已失效时返回None
+        """
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        if cache.get('version') != SCHEMA_CACHE_VERSION or cache.get('sha256') != file_hash:
+            return None
+        return cache.get('schema')
+    
+    def _save_cache(self, file_hash: str, schema: Dict[str, Any]):
+        """写入解析结果缓存，写入失败不影响读取结果"""
+        cache = {
+            'version': SCHEMA_CACHE_VERSION,
+            'sha256': file_hash,
+            'schema': schema,
+        }
+        tmp_path = self.cache_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(cache, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"写入schema缓存失败: {e}")
+    
     def format_schema_for_prompt(self) -> str:
         """
         将schema格式化为适合大模型输入的文本格式
         
+        结果会被缓存，重新调用 read() 后失效。
+        
         Returns:
             格式化后的schema文本
         """
         if not self.schema:
             self.read()
         
+        if self._prompt_text is None:
+            self._prompt_text = self._render_schema()
+        return self._prompt_text
+    
+    def _render_schema(self) -> str:
+        """生成schema的Markdown文本"""
         lines = []
         lines.append("## 数据库表结构定义\n")
         
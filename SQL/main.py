@@ -6,6 +6,7 @@ from example_manager import ExampleManager
 from rules_manager import RulesManager
 from prompt_formatter import PromptFormatter
 from llm_client import LLMClient
+from batch_runner import BatchRunner, print_stats
 from config import Config
 
 
@@ -143,6 +144,24 @@ def main():
         type=int,
         help='最多使用的样例数量',
     )
+    parser.add_argument(
+        '--batch',
+        '-b',
+        metavar='INPUT',
+        help='批量模式：从CSV（question列）或JSONL（question字段）文件读取问题',
+    )
+    parser.add_argument(
+        '--output',
+        '-o',
+        help='批量模式的输出文件（JSONL），默认为 <输入文件名>.results.jsonl；重新运行时跳过已完成的问题',
+    )
+    parser.add_argument(
+        '--workers',
+        '-w',
+        type=int,
+        default=Config.BATCH_WORKERS,
+        help=f'批量模式的并发数（默认: {Config.BATCH_WORKERS}）',
+    )
     
     args = parser.parse_args()
     
@@ -158,8 +177,27 @@ def main():
         print(f"初始化失败: {str(e)}")
         sys.exit(1)
     
+    # 批量模式
+    if args.batch:
+        if not os.path.exists(args.batch):
+            print(f"错误: 问题文件不存在: {args.batch}")
+            sys.exit(1)
+        output_path = args.output or os.path.splitext(args.batch)[0] + '.results.jsonl'
+        try:
+            runner = BatchRunner(
+                text_to_sql,
+                workers=args.workers,
+                use_examples=not args.no_examples,
+                max_examples=args.max_examples,
+            )
+            stats = runner.run(args.batch, output_path)
+            print_stats(stats)
+            print(f"结果已写入: {output_path}")
+        except Exception as e:
+            print(f"批量生成失败: {str(e)}")
+            sys.exit(1)
     # 如果提供了问题，直接生成SQL
-    if args.question:
+    elif args.question:
         try:
             sql = text_to_sql.generate_sql(
                 question=args.question,
@@ -1,8 +1,9 @@
 """Prompt格式化模块"""
-from typing import Optional
+from typing import Optional, List
 from excel_reader import ExcelReader
 from example_manager import ExampleManager
 from rules_manager import RulesManager
+from rule_selector import RuleSelector
 from config import Config
 
 
@@ -26,6 +27,7 @@ class PromptFormatter:
         self.excel_reader = excel_reader
         self.example_manager = example_manager
         self.rules_manager = rules_manager or RulesManager()
+        self.rule_selector = RuleSelector(self.rules_manager)
     
     def format_prompt(
         self,
@@ -34,6 +36,7 @@ class PromptFormatter:
         max_examples: int = None,
         include_schema: bool = True,
         include_rules: bool = True,
+        rules_token_budget: int = None,
     ) -> str:
         """
         格式化完整的Prompt
@@ -44,6 +47,7 @@ class PromptFormatter:
             max_examples: 最多使用的样例数量
             include_schema: 是否包含数据库schema
             include_rules: 是否包含业务规则
+            rules_token_budget: 业务规则的token预算，None则使用配置中的默认值
         
         Returns:
             格式化后的完整Prompt
@@ -62,7 +66,15 @@ class PromptFormatter:
         
         # 3. 业务规则和约定（在schema之后，examples之前）
         if include_rules:
-            rules_text = self.rules_manager.format_rules_for_prompt()
+            if Config.RULE_SELECTION_ENABLED:
+                # 只包含与问题相关的规则，控制Prompt长度
+                rules_text = self.rule_selector.format_rules_for_question(
+                    user_question,
+                    candidate_tables=self._find_candidate_tables(user_question),
+                    token_budget=rules_token_budget,
+                )
+            else:
+                rules_text = self.rules_manager.format_rules_for_prompt()
             if rules_text:
                 parts.append(rules_text)
                 parts.append("")
@@ -86,6 +98,32 @@ class PromptFormatter:
         
         return "\n".join(parts)
     
+    def _find_candidate_tables(self, user_question: str) -> List[str]:
+        """
+        根据表名、表含义、字段名和字段含义找出问题可能涉及的表
+        
+        Args:
+            user_question: 用户问题
+        
+        Returns:
+            候选表名列表
+        """
+        if not self.excel_reader.schema:
+            self.excel_reader.read()
+        
+        question = user_question.lower()
+        candidates = []
+        for table_name, table_info in self.excel_reader.schema.items():
+            names = [table_name, table_info.get('表含义', '')]
+            for field in table_info.get('字段', []):
+                names.append(field.get('字段含义', ''))
+                # 过短的字段名（如id）容易误匹配
+                if len(field.get('字段名', '')) > 3:
+                    names.append(field['字段名'])
+            if any(len(name) >= 2 and name.lower() in question for name in names):
+                candidates.append(table_name)
+        return candidates
+    
     def _get_system_prompt(self) -> str:
         """获取系统提示词"""
         return """# SQL生成助手
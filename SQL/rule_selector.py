@@ -0,0 +1,229 @@
+"""业务规则相关性筛选模块"""
+import math
+import re
+from typing import Dict, List, Any, Iterable, Set
+from rules_manager import RulesManager
+from config import Config
+
+
+_CJK_RUN_PATTERN = re.compile(r'[\u4e00-\u9fff]+')
+_IDENTIFIER_PATTERN = re.compile(r'[a-z0-9_]+')
+_SUFFIX_PATTERN = re.compile(r'_[a-z0-9]+')
+
+
+def extract_terms(text: str) -> Set[str]:
+    """
+    从文本中提取用于匹配的词项
+
+    - 英文标识符整体作为一个词项（小写），并额外提取 `_1h` 这类下划线后缀
+    - 中文按连续汉字切分为二元组（单个汉字保留自身）
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        词项集合
+    """
+    if not text:
+        return set()
+    text = str(text).lower()
+    terms = set()
+
+    for identifier in _IDENTIFIER_PATTERN.findall(text):
+        if len(identifier) > 1:
+            terms.add(identifier)
+        terms.update(_SUFFIX_PATTERN.findall(identifier))
+
+    for run in _CJK_RUN_PATTERN.findall(text):
+        if len(run) == 1:
+            terms.add(run)
+        else:
+            terms.update(run[i:i + 2] for i in range(len(run) - 1))
+
+    return terms
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计文本的token数：每个汉字约1个token，其他字符约4个字符1个token"""
+    cjk_count = sum(len(run) for run in _CJK_RUN_PATTERN.findall(text))
+    return cjk_count + math.ceil((len(text) - cjk_count) / 4)
+
+
+class RuleSelector:
+    """根据用户问题和候选表筛选相关的业务规则
+
+    规则按词项建立倒排索引，相关性得分为问题与规则共有词项的IDF之和，
+    再加上表名、字段名、表名后缀等结构化匹配的加分。索引随 RulesManager.version 自动重建。
+    """
+
+    # 结构化匹配的加分
+    TABLE_MATCH_BONUS = 3.0
+    FIELD_MATCH_BONUS = 3.0
+    SUFFIX_MATCH_BONUS = 3.0
+
+    def __init__(self, rules_manager: RulesManager, token_budget: int = None, min_score: float = None):
+        """
+        初始化规则筛选器
+
+        Args:
+            rules_manager: 规则管理器实例
+            token_budget: 规则文本的token预算，默认为config中的值
+            min_score: 规则被选中的最低相关性得分，默认为config中的值
+        """
+        self.rules_manager = rules_manager
+        self.token_budget = token_budget or Config.RULES_TOKEN_BUDGET
+        self.min_score = min_score if min_score is not None else Config.RULES_MIN_SCORE
+        self._index_version = None
+        self._entries = []
+        self._postings = {}
+        self._idf = {}
+
+    def _rule_text(self, category: str, rule: Dict[str, Any]) -> str:
+        """获取规则中用于建立索引的文本"""
+        if category == 'table_naming':
+            parts = [rule.get('pattern'), rule.get('meaning'), rule.get('usage')]
+            parts.extend(rule.get('examples') or [])
+        elif category == 'field_values':
+            parts = [rule.get('table_name'), rule.get('field_name'), rule.get('meaning'), rule.get('usage')]
+        elif category == 'query_patterns':
+            parts = [rule.get('pattern'), rule.get('description')]
+        else:
+            parts = [rule.get('rule'), rule.get('description')]
+            parts.extend(rule.get('examples') or [])
+        return ' '.join(str(part) for part in parts if part)
+
+    def _ensure_index(self):
+        """规则变化时重建倒排索引"""
+        if self._index_version == self.rules_manager.version:
+            return
+
+        entries = []
+        postings = {}
+        for category, _ in RulesManager.CATEGORY_TITLES:
+            for position, rule in enumerate(self.rules_manager.rules.get(category) or []):
+                terms = extract_terms(self._rule_text(category, rule))
+                suffixes = set()
+                if category == 'table_naming':
+                    suffixes = set(_SUFFIX_PATTERN.findall(str(rule.get('pattern', '')).lower()))
+                text = "\n".join(RulesManager.render_rule(category, position + 1, rule))
+                entries.append({
+                    'category': category,
+                    'position': position,
+                    'rule': rule,
+                    'suffixes': suffixes,
+                    'tokens': estimate_tokens(text),
+                })
+                for term in terms:
+                    postings.setdefault(term, []).append(len(entries) - 1)
+
+        total = len(entries)
+        self._idf = {
+            term: math.log((total + 1) / (len(ids) + 1)) + 1.0
+            for term, ids in postings.items()
+        }
+        self._entries = entries
+        self._postings = postings
+        self._index_version = self.rules_manager.version
+
+    def _score(self, question: str, candidate_tables: Set[str]) -> Dict[int, float]:
+        """计算每条规则的相关性得分"""
+        scores = {}
+        for term in extract_terms(question):
+            for idx in self._postings.get(term, ()):
+                scores[idx] = scores.get(idx, 0.0) + self._idf[term]
+
+        question_lower = question.lower()
+        for idx, entry in enumerate(self._entries):
+            rule = entry['rule']
+            bonus = 0.0
+            if entry['category'] == 'field_values':
+                table_name = (rule.get('table_name') or '').lower()
+                if table_name and candidate_tables:
+                    if table_name not in candidate_tables:
+                        # 规则限定的表不在候选表中，与本次问题无关
+                        scores.pop(idx, None)
+                        continue
+                    bonus += self.TABLE_MATCH_BONUS
+                field_name = str(rule.get('field_name', '')).lower()
+                if field_name and field_name in question_lower:
+                    bonus += self.FIELD_MATCH_BONUS
+            elif entry['category'] == 'table_naming':
+                examples = {str(example).lower() for example in rule.get('examples') or []}
+                if examples & candidate_tables:
+                    bonus += self.TABLE_MATCH_BONUS
+                if any(table.endswith(suffix) for table in candidate_tables for suffix in entry['suffixes']):
+                    bonus += self.SUFFIX_MATCH_BONUS
+            if bonus:
+                scores[idx] = scores.get(idx, 0.0) + bonus
+        return scores
+
+    def select(
+        self,
+        question: str,
+        candidate_tables: Iterable[str] = None,
+        token_budget: int = None,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        选出与问题相关的规则
+
+        得分不低于 min_score 的规则按得分从高到低放入预算；
+        若 Config.RULES_INCLUDE_GLOBAL 为True，未命中的业务规则在预算有剩余时补充加入。
+
+        Args:
+            question: 用户问题
+            candidate_tables: 问题可能涉及的表名
+            token_budget: 规则文本的token预算，None则使用初始化时的预算
+
+        Returns:
+            规则子集，格式同 RulesManager.rules，每类规则保持原有顺序
+        """
+        self._ensure_index()
+        budget = token_budget or self.token_budget
+        tables = {str(table).lower() for table in candidate_tables or []}
+        scores = self._score(question, tables)
+
+        ranked = sorted(
+            (idx for idx, score in scores.items() if score >= self.min_score),
+            key=lambda idx: -scores[idx],
+        )
+        if Config.RULES_INCLUDE_GLOBAL:
+            ranked.extend(
+                idx for idx, entry in enumerate(self._entries)
+                if entry['category'] == 'business_rules' and scores.get(idx, 0.0) < self.min_score
+            )
+
+        chosen = []
+        used = 0
+        for idx in ranked:
+            tokens = self._entries[idx]['tokens']
+            if used + tokens > budget:
+                continue
+            chosen.append(idx)
+            used += tokens
+
+        # 索引按规则类型和原有顺序建立，按下标排序即恢复原有顺序
+        selected = {category: [] for category, _ in RulesManager.CATEGORY_TITLES}
+        for idx in sorted(chosen):
+            entry = self._entries[idx]
+            selected[entry['category']].append(entry['rule'])
+        return selected
+
+    def format_rules_for_question(
+        self,
+        question: str,
+        candidate_tables: Iterable[str] = None,
+        token_budget: int = None,
+    ) -> str:
+        """
+        将与问题相关的规则格式化为Prompt文本
+
+        Args:
+            question: 用户问题
+            candidate_tables: 问题可能涉及的表名
+            token_budget: 规则文本的token预算
+
+        Returns:
+            格式化后的规则文本，没有相关规则时返回空字符串
+        """
+        selected = self.select(question, candidate_tables, token_budget)
+        return self.rules_manager.format_rules_for_prompt(selected)
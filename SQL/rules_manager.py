@@ -1,6 +1,8 @@
 """业务规则管理模块"""
+import copy
 import json
 import os
+from contextlib import contextmanager
 from typing import Dict, List, Any, Optional
 from config import Config
 
@@ -22,6 +24,11 @@ class RulesManager:
             'query_patterns': [],     # 查询模式规则
             'business_rules': [],     # 业务规则
         }
+        self.version = 0             # 规则版本号，规则变化时递增
+        self._prompt_text = None     # format_rules_for_prompt() 的缓存结果
+        self._batch_depth = 0
+        self._batch_dirty = False
+        self._batch_snapshot = None
         self._ensure_file_exists()
         self.load()
     
@@ -58,6 +65,7 @@ class RulesManager:
                 'business_rules': [],
             }
         
+        self._invalidate()
         return self.rules
     
     def save(self, rules: Dict[str, Any] = None):
@@ -70,12 +78,59 @@ class RulesManager:
         if rules is not None:
             self.rules = rules
         
+        self._invalidate()
+        
         try:
             with open(self.rules_file, 'w', encoding='utf-8') as f:
                 json.dump(self.rules, f, ensure_ascii=False, indent=2)
+            self._batch_dirty = False
         except Exception as e:
             raise Exception(f"保存规则文件失败: {str(e)}")
     
+    def _invalidate(self):
+        """规则发生变化，清除格式化缓存"""
+        self.version += 1
+        self._prompt_text = None
+    
+    def _commit(self):
+        """添加规则后保存；批量模式下延迟到批量结束时统一保存"""
+        if self._batch_depth > 0:
+            self._batch_dirty = True
+            self._invalidate()
+        else:
+            self.save()
+    
+    @contextmanager
+    def batch(self):
+        """
+        批量修改规则，退出时只写一次规则文件
+        
+        示例:
+            with rules_manager.batch():
+                rules_manager.add_table_naming_rule(...)
+                rules_manager.add_field_value_rule(...)
+        """
+        if self._batch_depth == 0:
+            # 最外层批量开始时的规则快照，异常时恢复
+            self._batch_snapshot = (copy.deepcopy(self.rules), self._batch_dirty)
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._batch_depth -= 1
+            # 异常时撤销整个批量（包括内层批量）的修改，不写入也不留在内存中
+            if self._batch_depth == 0:
+                self.rules, self._batch_dirty = self._batch_snapshot
+                self._batch_snapshot = None
+                self._invalidate()
+            raise
+        self._batch_depth -= 1
+        # 仅在最外层批量正常退出时保存
+        if self._batch_depth == 0:
+            self._batch_snapshot = None
+            if self._batch_dirty:
+                self.save()
+    
     def add_table_naming_rule(
         self,
         pattern: str,
@@ -99,7 +154,7 @@ class RulesManager:
             'examples': examples or [],
         }
         self.rules['table_naming'].append(rule)
-        self.save()
+        self._commit()
     
     def add_field_value_rule(
         self,
@@ -127,7 +182,7 @@ class RulesManager:
             'usage': usage,
         }
         self.rules['field_values'].append(rule)
-        self.save()
+        self._commit()
     
     def add_query_pattern_rule(
         self,
@@ -149,7 +204,7 @@ class RulesManager:
             'sql_example': sql_example,
         }
         self.rules['query_patterns'].append(rule)
-        self.save()
+        self._commit()
     
     def add_business_rule(
         self,
@@ -171,72 +226,99 @@ class RulesManager:
             'examples': examples or [],
         }
         self.rules['business_rules'].append(business_rule)
-        self.save()
+        self._commit()
+    
+    # 各类规则在Prompt中的标题，顺序即输出顺序
+    CATEGORY_TITLES = [
+        ('table_naming', '### 1. 表命名规则'),
+        ('field_values', '### 2. 字段值含义规则'),
+        ('query_patterns', '### 3. 查询模式规则'),
+        ('business_rules', '### 4. 业务规则'),
+    ]
     
-    def format_rules_for_prompt(self) -> str:
+    def format_rules_for_prompt(self, rules: Dict[str, Any] = None) -> str:
         """
         将规则格式化为适合大模型输入的文本格式
         
+        全部规则的格式化结果会被缓存，直到规则通过 load()/save()/add_* 发生变化。
+        直接修改 self.rules 后需要调用 save() 使缓存失效。
+        
+        Args:
+            rules: 要格式化的规则子集（格式同self.rules），None表示全部规则
+        
         Returns:
             格式化后的规则文本
         """
-        if not any(self.rules.values()):
+        if rules is not None:
+            return self._render_rules(rules)
+        
+        if self._prompt_text is None:
+            self._prompt_text = self._render_rules(self.rules)
+        return self._prompt_text
+    
+    def _render_rules(self, rules: Dict[str, Any]) -> str:
+        """生成规则的Markdown文本"""
+        if not any(rules.values()):
             return ""
         
         lines = []
         lines.append("## 数据库业务规则和约定\n")
         lines.append("**重要**：生成SQL时必须严格遵守以下规则和约定。\n")
         
-        # 1. 表命名规则
-        if self.rules.get('table_naming'):
-            lines.append("### 1. 表命名规则")
-            lines.append("")
-            for i, rule in enumerate(self.rules['table_naming'], 1):
-                lines.append(f"**规则 {i}**: {rule['pattern']}")
-                lines.append(f"- 含义: {rule['meaning']}")
-                lines.append(f"- 使用场景: {rule['usage']}")
-                if rule.get('examples'):
-                    examples_str = "、".join(rule['examples'])
-                    lines.append(f"- 示例表名: {examples_str}")
+        for category, title in self.CATEGORY_TITLES:
+            if rules.get(category):
+                lines.append(title)
                 lines.append("")
+                for i, rule in enumerate(rules[category], 1):
+                    lines.extend(self.render_rule(category, i, rule))
         
-        # 2. 字段值含义规则
-        if self.rules.get('field_values'):
-            lines.append("### 2. 字段值含义规则")
-            lines.append("")
-            for i, rule in enumerate(self.rules['field_values'], 1):
-                table_info = f"表 `{rule['table_name']}`" if rule['table_name'] else "所有表"
-                lines.append(f"**规则 {i}**: {table_info} 的字段 `{rule['field_name']}`")
-                lines.append(f"- 当 `{rule['field_name']} = {rule['value']}` 时，表示: {rule['meaning']}")
-                if rule.get('usage'):
-                    lines.append(f"- 使用说明: {rule['usage']}")
-                lines.append("")
+        return "\n".join(lines)
+    
+    @staticmethod
+    def render_rule(category: str, index: int, rule: Dict[str, Any]) -> List[str]:
+        """
+        生成单条规则的Markdown文本行
         
-        # 3. 查询模式规则
-        if self.rules.get('query_patterns'):
-            lines.append("### 3. 查询模式规则")
-            lines.append("")
-            for i, rule in enumerate(self.rules['query_patterns'], 1):
-                lines.append(f"**规则 {i}**: {rule['pattern']}")
-                lines.append(f"- 说明: {rule['description']}")
-                if rule.get('sql_example'):
-                    lines.append(f"- SQL示例: ```sql\n{rule['sql_example']}\n```")
-                lines.append("")
+        Args:
+            category: 规则类型（table_naming、field_values、query_patterns、business_rules）
+            index: 规则在所属类型中的序号（从1开始）
+            rule: 规则字典
         
-        # 4. 业务规则
-        if self.rules.get('business_rules'):
-            lines.append("### 4. 业务规则")
-            lines.append("")
-            for i, rule in enumerate(self.rules['business_rules'], 1):
-                lines.append(f"**规则 {i}**: {rule['rule']}")
-                lines.append(f"- 说明: {rule['description']}")
-                if rule.get('examples'):
-                    lines.append("- 示例:")
-                    for example in rule['examples']:
-                        lines.append(f"  - {example}")
-                lines.append("")
+        Returns:
+            文本行列表，以空行结尾
+        """
+        lines = []
+        if category == 'table_naming':
+            lines.append(f"**规则 {index}**: {rule['pattern']}")
+            lines.append(f"- 含义: {rule['meaning']}")
+            lines.append(f"- 使用场景: {rule['usage']}")
+            if rule.get('examples'):
+                examples_str = "、".join(rule['examples'])
+                lines.append(f"- 示例表名: {examples_str}")
         
-        return "\n".join(lines)
+        elif category == 'field_values':
+            table_info = f"表 `{rule['table_name']}`" if rule['table_name'] else "所有表"
+            lines.append(f"**规则 {index}**: {table_info} 的字段 `{rule['field_name']}`")
+            lines.append(f"- 当 `{rule['field_name']} = {rule['value']}` 时，表示: {rule['meaning']}")
+            if rule.get('usage'):
+                lines.append(f"- 使用说明: {rule['usage']}")
+        
+        elif category == 'query_patterns':
+            lines.append(f"**规则 {index}**: {rule['pattern']}")
+            lines.append(f"- 说明: {rule['description']}")
+            if rule.get('sql_example'):
+                lines.append(f"- SQL示例: ```sql\n{rule['sql_example']}\n```")
+        
+        elif category == 'business_rules':
+            lines.append(f"**规则 {index}**: {rule['rule']}")
+            lines.append(f"- 说明: {rule['description']}")
+            if rule.get('examples'):
+                lines.append("- 示例:")
+                for example in rule['examples']:
+                    lines.append(f"  - {example}")
+        
+        lines.append("")
+        return lines
     
     def get_rules_summary(self) -> str:
         """获取规则摘要"""
@@ -1,11 +1,18 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response, send_file
 from flask_cors import CORS
 from dotenv import load_dotenv
 import os
+import time
+from config import Config
 from services.nl2sql_service import NL2SQLService
 from services.database_service import DatabaseService
 from services.query_service import QueryService
 from services.report_service import ReportService
+from services.export_service import ExportService, EXPORT_FORMATS
+from services.report_scheduler import ReportScheduler
+from services.schema_registry import SchemaRegistry
+from services.metrics_service import metrics, span, start_trace, current_trace, end_trace
+from services.response_encoding import encode_response, compress_response
 
 load_dotenv()
 
@@ -14,9 +21,57 @@ CORS(app)
 
 # 初始化服务
 db_service = DatabaseService()
-nl2sql_service = NL2SQLService(db_service)
+if db_service.replica is not None:
+  db_service.replica.start()
+schema_registry = SchemaRegistry(db_service)
+nl2sql_service = NL2SQLService(db_service, schema_registry)
 query_service = QueryService(db_service, nl2sql_service)
 report_service = ReportService(db_service)
+export_service = ExportService(db_service, report_service)
+report_scheduler = ReportScheduler(db_service, report_service)
+if Config.REPORT_SCHEDULER_ENABLED:
+  report_scheduler.start()
+
+HTTP_REQUEST_DURATION = metrics.histogram(
+  'aireport_http_request_duration_seconds',
+  'HTTP请求处理耗时（秒）',
+  labelnames=('endpoint', 'method', 'status'),
+)
+
+@app.before_request
+def before_request():
+  """开始追踪请求，优先使用客户端传入的请求ID"""
+  g.request_start = time.perf_counter()
+  g.trace = start_trace(request.headers.get('X-Request-ID'))
+
+@app.after_request
+def after_request(response):
+  """压缩响应，记录请求耗时，返回请求ID和各阶段耗时"""
+  with span('compress'):
+    response = compress_response(response, request)
+  trace = g.get('trace')
+  if trace is not None:
+    HTTP_REQUEST_DURATION.observe(
+      time.perf_counter() - g.request_start,
+      endpoint=request.endpoint or 'unknown',
+      method=request.method,
+      status=response.status_code,
+    )
+    response.headers['X-Request-ID'] = trace.request_id
+    server_timing = ', '.join(f'{name.replace(".", "-")};dur={value}' for name, value in trace.timings().items())
+    response.headers['Server-Timing'] = server_timing
+  return response
+
+@app.teardown_request
+def teardown_request(exception=None):
+  """结束请求追踪"""
+  end_trace()
+
+def _include_timings(data) -> bool:
+  """请求体中的timings参数优先，否则使用配置的默认值"""
+  if data and 'timings' in data:
+    return bool(data.get('timings'))
+  return Config.INCLUDE_TIMINGS
 
 @app.route('/api/query', methods=['POST'])
 def query():
@@ -35,7 +90,11 @@ def query():
     # 执行查询
     result = query_service.execute_query(query_text, show_sql)
 
-    return jsonify(result)
+    if _include_timings(data):
+      result['timings'] = current_trace().timings()
+
+    with span('serialize'):
+      return encode_response(result, request)
 
   except Exception as e:
     return jsonify({
@@ -43,6 +102,22 @@ def query():
       'message': f'查询失败: {str(e)}',
     }), 500
 
+@app.route('/api/schema', methods=['GET'])
+def get_schema():
+  """一次返回所有表、别名和字段，内容未变化时返回304"""
+  try:
+    snapshot = schema_registry.current()
+    response = Response(snapshot.api_body(), mimetype='application/json')
+    response.set_etag(snapshot.etag())
+    # 浏览器每次使用前都用ETag重新验证
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+  except Exception as e:
+    return jsonify({
+      'success': False,
+      'message': f'获取schema失败: {str(e)}',
+    }), 500
+
 @app.route('/api/tables', methods=['GET'])
 def get_tables():
   """获取数据库表列表"""
@@ -73,6 +148,76 @@ def get_table_columns(table_name):
       'message': f'获取字段信息失败: {str(e)}',
     }), 500
 
+@app.route('/api/admin/schema/reload', methods=['POST'])
+def reload_schema():
+  """立即重新加载表名、字段映射，无需重启服务"""
+  try:
+    snapshot = schema_registry.reload()
+    return jsonify({
+      'success': True,
+      'data': snapshot.to_dict(),
+    })
+  except Exception as e:
+    return jsonify({
+      'success': False,
+      'message': f'重新加载schema失败: {str(e)}',
+    }), 500
+
+@app.route('/api/admin/replica', methods=['GET'])
+def get_replica_status():
+  """只读副本的刷新时间和落后时间"""
+  if db_service.replica is None:
+    return jsonify({
+      'success': True,
+      'data': {'enabled': False},
+    })
+  return jsonify({
+    'success': True,
+    'data': dict(db_service.replica.status(), enabled=True),
+  })
+
+@app.route('/api/admin/replica/refresh', methods=['POST'])
+def refresh_replica():
+  """立即刷新只读副本（如数据导入完成后调用）"""
+  if db_service.replica is None:
+    return jsonify({
+      'success': False,
+      'message': '未配置只读副本',
+    }), 400
+  try:
+    data = request.get_json(silent=True) or {}
+    refreshed = db_service.replica.refresh(force=bool(data.get('force')))
+    return jsonify({
+      'success': True,
+      'data': dict(db_service.replica.status(), enabled=True, refreshed=refreshed),
+    })
+  except Exception as e:
+    return jsonify({
+      'success': False,
+      'message': str(e),
+    }), 500
+
+@app.route('/api/admin/engines', methods=['GET'])
+def get_engine_status():
+  """分析查询执行引擎的状态"""
+  return jsonify({
+    'success': True,
+    'data': db_service.engine_status(),
+  })
+
+@app.route('/api/admin/llm/providers', methods=['GET'])
+def get_llm_providers():
+  """大模型提供商的延迟统计和熔断状态"""
+  return jsonify({
+    'success': True,
+    'data': nl2sql_service.llm_router.stats(),
+  })
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+  """Prometheus格式的指标接口"""
+  return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/health', methods=['GET'])
 def health():
   """健康检查接口"""
@@ -107,6 +252,7 @@ def create_report():
     data_source = data.get('data_source', '').strip()
     layout_config = data.get('layout_config', {})
     query_config = data.get('query_config', {})
+    schedule = data.get('schedule')
     
     if not name:
       return jsonify({
@@ -120,7 +266,7 @@ def create_report():
         'message': '数据源不能为空',
       }), 400
     
-    report = report_service.create_report(name, description, data_source, layout_config, query_config)
+    report = report_service.create_report(name, description, data_source, layout_config, query_config, schedule)
     return jsonify({
       'success': True,
       'data': report,
@@ -161,6 +307,7 @@ def update_report(report_id):
     description = data.get('description')
     layout_config = data.get('layout_config')
     query_config = data.get('query_config')
+    schedule = data.get('schedule')
     
     report = report_service.update_report(
       report_id,
@@ -168,7 +315,9 @@ def update_report(report_id):
       description=description,
       layout_config=layout_config,
       query_config=query_config,
+      schedule=schedule,
     )
+    report_scheduler.invalidate(report_id)
     
     return jsonify({
       'success': True,
@@ -185,6 +334,7 @@ def delete_report(report_id):
   """删除报表"""
   try:
     deleted = report_service.delete_report(report_id)
+    report_scheduler.invalidate(report_id)
     if not deleted:
       return jsonify({
         'success': False,
@@ -208,8 +358,20 @@ def execute_report():
     data = request.get_json()
     query_config = data.get('query_config', {})
     
-    result = report_service.execute_report_query(query_config)
-    return jsonify(result)
+    result = report_service.execute_report_query(
+      query_config,
+      data.get('chart'),
+      data.get('target_points'),
+      data.get('downsample_method'),
+      data.get('x_field'),
+      data.get('y_field'),
+    )
+
+    if _include_timings(data):
+      result['timings'] = current_trace().timings()
+
+    with span('serialize'):
+      return encode_response(result, request)
   except Exception as e:
     return jsonify({
       'success': False,
@@ -218,6 +380,148 @@ def execute_report():
       'columns': [],
     }), 500
 
+@app.route('/api/reports/<int:report_id>/dashboard', methods=['POST'])
+def execute_dashboard(report_id):
+  """执行报表中所有组件的查询"""
+  try:
+    data = request.get_json(silent=True) or {}
+    if data.get('refresh'):
+      result = report_service.execute_dashboard(report_id)
+    else:
+      result = report_scheduler.execute(report_id, 'dashboard')
+
+    if _include_timings(data):
+      result['timings'] = current_trace().timings()
+
+    with span('serialize'):
+      return encode_response(result, request)
+  except Exception as e:
+    return jsonify({
+      'success': False,
+      'message': f'执行仪表盘查询失败: {str(e)}',
+      'widgets': {},
+    }), 500
+
+@app.route('/api/reports/<int:report_id>/execute', methods=['POST'])
+def execute_saved_report(report_id):
+  """执行已保存报表的查询，数据未变化时直接返回预计算的快照"""
+  try:
+    data = request.get_json(silent=True) or {}
+    if data.get('refresh'):
+      report = report_service.get_report(report_id)
+      if not report:
+        return jsonify({
+          'success': False,
+          'message': '报表不存在',
+        }), 404
+      result = report_service.execute_report_query(report.get('query_config') or {})
+    else:
+      result = report_scheduler.execute(report_id, 'query')
+
+    if _include_timings(data):
+      result['timings'] = current_trace().timings()
+
+    with span('serialize'):
+      return encode_response(result, request)
+  except Exception as e:
+    return jsonify({
+      'success': False,
+      'message': f'执行报表查询失败: {str(e)}',
+      'data': [],
+      'columns': [],
+    }), 500
+
+@app.route('/api/admin/reports/precompute', methods=['POST'])
+def precompute_reports():
+  """预计算报表快照（如数据导入完成后调用），未指定report_ids时预计算所有设置了计划的报表"""
+  data = request.get_json(silent=True) or {}
+  report_ids = data.get('report_ids')
+  if report_ids:
+    results = [report_scheduler.precompute(int(report_id), reason='manual') for report_id in report_ids]
+  else:
+    results = report_scheduler.precompute_scheduled(reason='manual')
+  return jsonify({
+    'success': all('error' not in item for item in results),
+    'data': results,
+  })
+
+@app.route('/api/admin/reports/schedules', methods=['GET'])
+def get_report_schedules():
+  """计划报表的下次执行时间和快照状态"""
+  return jsonify({
+    'success': True,
+    'data': report_scheduler.status(),
+  })
+
+# 导出相关接口
+@app.route('/api/exports', methods=['POST'])
+def create_export():
+  """提交后台导出任务"""
+  try:
+    data = request.get_json() or {}
+    job = export_service.submit(data.get('format', 'csv'), data.get('report_id'), data.get('query_config'))
+    return jsonify({
+      'success': True,
+      'data': job.to_dict(),
+    }), 202
+  except Exception as e:
+    return jsonify({
+      'success': False,
+      'message': f'创建导出任务失败: {str(e)}',
+    }), 400
+
+@app.route('/api/exports', methods=['GET'])
+def list_exports():
+  """导出任务列表"""
+  return jsonify({
+    'success': True,
+    'data': export_service.list_jobs(),
+  })
+
+@app.route('/api/exports/<job_id>', methods=['GET'])
+def get_export(job_id):
+  """导出任务状态和进度"""
+  job = export_service.get_job(job_id)
+  if job is None:
+    return jsonify({
+      'success': False,
+      'message': '导出任务不存在',
+    }), 404
+  return jsonify({
+    'success': True,
+    'data': job.to_dict(),
+  })
+
+@app.route('/api/exports/<job_id>/download', methods=['GET'])
+def download_export(job_id):
+  """下载导出文件，支持断点续传（Range请求）"""
+  job = export_service.get_job(job_id)
+  if job is None or job.status != 'completed':
+    return jsonify({
+      'success': False,
+      'message': '导出文件不存在或尚未完成',
+    }), 404
+  return send_file(
+    job.path,
+    mimetype=EXPORT_FORMATS[job.format][0],
+    as_attachment=True,
+    download_name=job.filename,
+    conditional=True,
+  )
+
+@app.route('/api/exports/<job_id>', methods=['DELETE'])
+def delete_export(job_id):
+  """取消导出任务并删除文件"""
+  if not export_service.cancel(job_id):
+    return jsonify({
+      'success': False,
+      'message': '导出任务不存在',
+    }), 404
+  return jsonify({
+    'success': True,
+    'message': '已取消',
+  })
+
 if __name__ == '__main__':
   port = int(os.getenv('PORT', 5000))
   debug = os.getenv('DEBUG', 'False').lower() == 'true'
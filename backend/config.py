@@ -16,6 +16,59 @@ class Config:
   # 查询限制
   MAX_RESULT_SIZE = int(os.getenv('MAX_RESULT_SIZE', 10000))
   QUERY_TIMEOUT = int(os.getenv('QUERY_TIMEOUT', 30))
+  # 只读连接池大小，也是仪表盘组件查询的并发数
+  DB_READ_POOL_SIZE = int(os.getenv('DB_READ_POOL_SIZE', '4'))
+  # 相同的并发请求（问题相同的NL2SQL转换、SQL和参数相同的查询）只执行一次，共享结果
+  SINGLE_FLIGHT_ENABLED = os.getenv('SINGLE_FLIGHT_ENABLED', 'True').lower() == 'true'
+  # 分析查询的只读副本：设置后报表和自然语言查询在副本上执行，副本每DB_REPLICA_REFRESH_INTERVAL秒检查主库变化并刷新（0表示只手动刷新）
+  _db_replica_path = os.getenv('DB_REPLICA_PATH', '')
+  DB_REPLICA_PATH = (os.path.join(BASE_DIR, _db_replica_path) if not os.path.isabs(_db_replica_path) else _db_replica_path) if _db_replica_path else ''
+  DB_REPLICA_REFRESH_INTERVAL = float(os.getenv('DB_REPLICA_REFRESH_INTERVAL', '60'))
+  # 分析查询执行引擎：auto（安装了duckdb时，数据量大的聚合查询使用DuckDB）、duckdb（必须使用DuckDB）、sqlite
+  QUERY_ENGINE = os.getenv('QUERY_ENGINE', 'auto').lower()
+  # DuckDB读取数据的方式：attach（sqlite扩展直接读取）、copy（复制到内存）、auto（优先attach）
+  DUCKDB_MODE = os.getenv('DUCKDB_MODE', 'auto').lower()
+  # 涉及的表估计行数不少于此值的聚合查询使用DuckDB
+  DUCKDB_MIN_ROWS = int(os.getenv('DUCKDB_MIN_ROWS', '200000'))
+  # DuckDB线程数，0表示使用全部CPU核数；copy模式两次同步的最小间隔（秒）
+  DUCKDB_THREADS = int(os.getenv('DUCKDB_THREADS', '0'))
+  DUCKDB_SYNC_INTERVAL = float(os.getenv('DUCKDB_SYNC_INTERVAL', '60'))
+
+  # 图表聚合：分类保留的个数（其余合并为“其他”），自动时间分段的最多分段数
+  CHART_TOP_N = int(os.getenv('CHART_TOP_N', '10'))
+  CHART_MAX_BUCKETS = int(os.getenv('CHART_MAX_BUCKETS', '24'))
+  # 时间序列降采样的默认方法（lttb 或 minmax），请求中指定 target_points 时生效
+  DOWNSAMPLE_METHOD = os.getenv('DOWNSAMPLE_METHOD', 'lttb')
+
+  # schema热加载：检查映射表版本号的间隔（秒），0表示每次使用前都检查
+  SCHEMA_POLL_INTERVAL = float(os.getenv('SCHEMA_POLL_INTERVAL', '5'))
+
+  # 报表导出：后台任务数、每批读取的行数、任务和文件保留时间（秒）
+  _export_dir = os.getenv('EXPORT_DIR', 'database/exports')
+  EXPORT_DIR = os.path.join(BASE_DIR, _export_dir) if not os.path.isabs(_export_dir) else _export_dir
+  EXPORT_WORKERS = int(os.getenv('EXPORT_WORKERS', '2'))
+  EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '5000'))
+  EXPORT_TTL = float(os.getenv('EXPORT_TTL', '86400'))
+
+  # 报表预计算：按报表的schedule预先执行查询并保存快照，数据版本未变时直接返回快照
+  REPORT_SCHEDULER_ENABLED = os.getenv('REPORT_SCHEDULER_ENABLED', 'True').lower() == 'true'
+  _report_snapshot_path = os.getenv('REPORT_SNAPSHOT_PATH', 'database/report_snapshots.db')
+  REPORT_SNAPSHOT_PATH = os.path.join(BASE_DIR, _report_snapshot_path) if not os.path.isabs(_report_snapshot_path) else _report_snapshot_path
+  # 调度线程检查间隔（秒）；数据变化后两次重新预计算同一报表的最小间隔（秒）
+  REPORT_SCHEDULER_TICK = float(os.getenv('REPORT_SCHEDULER_TICK', '30'))
+  REPORT_REFRESH_MIN_INTERVAL = float(os.getenv('REPORT_REFRESH_MIN_INTERVAL', '300'))
+  # 快照最长有效时间（秒），0表示只按数据版本判断
+  REPORT_SNAPSHOT_MAX_AGE = float(os.getenv('REPORT_SNAPSHOT_MAX_AGE', '0'))
+
+  # 响应压缩：大于COMPRESS_MIN_SIZE字节的响应按Accept-Encoding使用brotli（需安装brotli）或gzip压缩
+  COMPRESS_ENABLED = os.getenv('COMPRESS_ENABLED', 'True').lower() == 'true'
+  COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+  COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', '6'))
+  COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', '4'))
+
+  # 监控配置
+  # 是否默认在查询响应中返回各阶段耗时（请求体中的timings参数可覆盖）
+  INCLUDE_TIMINGS = os.getenv('INCLUDE_TIMINGS', 'False').lower() == 'true'
 
   # 安全配置
   ALLOWED_SQL_KEYWORDS = ['SELECT']
@@ -34,7 +87,43 @@ class Config:
   
   # 通义千问配置
   DASHSCOPE_API_KEY = os.getenv('DASHSCOPE_API_KEY', '')
+  DASHSCOPE_BASE_URL = os.getenv('DASHSCOPE_BASE_URL', 'https://dashscope.aliyuncs.com/api/v1')
   QWEN_MODEL = os.getenv('QWEN_MODEL', 'qwen3-32b')
+
+  # 结果解读：行数超过20行时用统计摘要代替原始数据
+  INTERPRETATION_SUMMARY_ENABLED = os.getenv('INTERPRETATION_SUMMARY_ENABLED', 'True').lower() == 'true'
+
+  # 结果解读缓存：同一问题和相同结果数据的解读在TTL内直接返回
+  LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'True').lower() == 'true'
+  _llm_cache_path = os.getenv('LLM_CACHE_PATH', 'database/llm_cache.db')
+  LLM_CACHE_PATH = os.path.join(BASE_DIR, _llm_cache_path) if not os.path.isabs(_llm_cache_path) else _llm_cache_path
+  LLM_CACHE_TTL = float(os.getenv('LLM_CACHE_TTL', '3600'))
+  LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '1000'))
+  LLM_CACHE_MAX_DISK_ENTRIES = int(os.getenv('LLM_CACHE_MAX_DISK_ENTRIES', '10000'))
+
+  # 本地意图匹配：计数、分组统计、前N名、条件筛选等模板类问题不调用大模型
+  INTENT_MATCH_ENABLED = os.getenv('INTENT_MATCH_ENABLED', 'True').lower() == 'true'
+  # 问题中能被识别的文字占比低于此阈值时交给大模型
+  INTENT_MATCH_THRESHOLD = float(os.getenv('INTENT_MATCH_THRESHOLD', '1.0'))
+
+  # SQL模板缓存：从大模型生成的SQL学习参数化模板，只在取值上不同的问题直接代入生成SQL
+  SQL_TEMPLATE_ENABLED = os.getenv('SQL_TEMPLATE_ENABLED', 'True').lower() == 'true'
+  _sql_template_path = os.getenv('SQL_TEMPLATE_PATH', 'database/sql_templates.db')
+  SQL_TEMPLATE_PATH = os.path.join(BASE_DIR, _sql_template_path) if not os.path.isabs(_sql_template_path) else _sql_template_path
+  SQL_TEMPLATE_MAX = int(os.getenv('SQL_TEMPLATE_MAX', '2000'))
+
+  # 大模型路由配置（NL2SQL）
+  # LLM_PROVIDER 指定首选提供商，其他已配置密钥的提供商作为备选
+  # 额外的OpenAI兼容提供商，JSON数组，如 [{"name": "backup", "base_url": "...", "api_key": "...", "model": "..."}]
+  LLM_EXTRA_PROVIDERS = os.getenv('LLM_EXTRA_PROVIDERS', '')
+  # 对冲请求：首选提供商超过其p95延迟未返回时向下一个提供商发出同样的请求
+  LLM_HEDGE_ENABLED = os.getenv('LLM_HEDGE_ENABLED', 'True').lower() == 'true'
+  # 样本不足时使用的对冲等待时间（毫秒）
+  LLM_HEDGE_DELAY_MS = float(os.getenv('LLM_HEDGE_DELAY_MS', '3000'))
+  LLM_HEDGE_MIN_SAMPLES = int(os.getenv('LLM_HEDGE_MIN_SAMPLES', '20'))
+  # 熔断：连续失败次数阈值和冷却时间（秒）
+  LLM_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('LLM_CIRCUIT_FAILURE_THRESHOLD', '3'))
+  LLM_CIRCUIT_COOLDOWN = float(os.getenv('LLM_CIRCUIT_COOLDOWN', '30'))
   
   # 文心一言配置
   WENXIN_API_KEY = os.getenv('WENXIN_API_KEY', '')
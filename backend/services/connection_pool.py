@@ -0,0 +1,74 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable
+
+class ConnectionPool:
+  """
+  SQLite连接池
+
+  连接按需创建，数量达到上限时等待其他查询归还。reset() 之后，空闲连接立即关闭，
+  借出中的连接在归还后关闭，之后借出的都是新建的连接（如只读副本文件被替换后）。
+  """
+
+  def __init__(self, connect: Callable[[], sqlite3.Connection], size: int):
+    self._connect = connect
+    self._size = max(size, 1)
+    self._pool = queue.LifoQueue()
+    self._created = 0
+    self._generation = 0
+    self._lock = threading.Lock()
+
+  def _create(self):
+    with self._lock:
+      create = self._created < self._size
+      if create:
+        self._created += 1
+        generation = self._generation
+    if not create:
+      return None
+    try:
+      return self._connect(), generation
+    except Exception:
+      with self._lock:
+        self._created -= 1
+      raise
+
+  def _discard(self, connection: sqlite3.Connection):
+    with self._lock:
+      self._created -= 1
+    connection.close()
+
+  @contextmanager
+  def connection(self):
+    """借出一个连接"""
+    item = None
+    while item is None:
+      try:
+        item = self._pool.get_nowait()
+      except queue.Empty:
+        item = self._create() or self._pool.get()
+      if item[1] != self._generation:
+        self._discard(item[0])
+        item = None
+    try:
+      yield item[0]
+    finally:
+      # 过期的连接也放回，由下一次借出时关闭，唤醒等待中的查询
+      self._pool.put(item)
+
+  def reset(self):
+    """关闭现有连接，之后借出新建的连接"""
+    with self._lock:
+      self._generation += 1
+    self.close()
+
+  def close(self):
+    """关闭空闲连接"""
+    while True:
+      try:
+        connection, _ = self._pool.get_nowait()
+      except queue.Empty:
+        break
+      self._discard(connection)
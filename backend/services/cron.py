@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+from typing import Set
+
+# 分 时 日 月 周，周日为0（7也表示周日）
+CRON_FIELDS = [('minute', 0, 59), ('hour', 0, 23), ('day', 1, 31), ('month', 1, 12), ('weekday', 0, 7)]
+CRON_ALIASES = {
+  '@hourly': '0 * * * *',
+  '@daily': '0 0 * * *',
+  '@weekly': '0 0 * * 0',
+  '@monthly': '0 0 1 * *',
+}
+
+def _parse_field(text: str, low: int, high: int) -> Set[int]:
+  """解析一个字段：支持 *、数字、a-b 范围、逗号列表和 /n 步长"""
+  values = set()
+  for part in text.split(','):
+    step = 1
+    if '/' in part:
+      part, step_text = part.split('/', 1)
+      step = int(step_text)
+      if step <= 0:
+        raise ValueError(f'步长必须大于0: {text}')
+    if part == '*':
+      start, end = low, high
+    elif '-' in part:
+      start_text, end_text = part.split('-', 1)
+      start, end = int(start_text), int(end_text)
+    else:
+      start = int(part)
+      end = high if step > 1 else start
+    if start < low or end > high or start > end:
+      raise ValueError(f'取值超出范围 {low}-{high}: {text}')
+    values.update(range(start, end + 1, step))
+  return values
+
+class CronSchedule:
+  """
+  cron表达式（分 时 日 月 周）
+
+  日和周都不是 * 时，满足其中之一即匹配（与标准cron一致）。
+  """
+
+  def __init__(self, expression: str):
+    self.expression = expression.strip()
+    fields = CRON_ALIASES.get(self.expression, self.expression).split()
+    if len(fields) != len(CRON_FIELDS):
+      raise ValueError(f'cron表达式需要5个字段: {expression}')
+    try:
+      parsed = [_parse_field(text, low, high) for text, (_, low, high) in zip(fields, CRON_FIELDS)]
+    except ValueError as e:
+      raise ValueError(f'无效的cron表达式 {expression}: {str(e)}')
+    self.minutes, self.hours, self.days, self.months, weekdays = parsed
+    self.weekdays = {0 if day == 7 else day for day in weekdays}
+    self._any_day = fields[2] == '*'
+    self._any_weekday = fields[4] == '*'
+
+  def _day_matches(self, moment: datetime) -> bool:
+    day_match = moment.day in self.days
+    # datetime.weekday() 周一为0，转换为周日为0
+    weekday_match = (moment.weekday() + 1) % 7 in self.weekdays
+    if self._any_day and self._any_weekday:
+      return True
+    if self._any_day:
+      return weekday_match
+    if self._any_weekday:
+      return day_match
+    return day_match or weekday_match
+
+  def matches(self, moment: datetime) -> bool:
+    return (moment.minute in self.minutes and moment.hour in self.hours
+            and moment.month in self.months and self._day_matches(moment))
+
+  def next_after(self, moment: datetime) -> datetime:
+    """moment 之后的下一次执行时间（精确到分钟）"""
+    candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    # 不匹配时按月、日、小时、分钟逐级跳过；最多向后查找约5年，覆盖2月29日这类表达式
+    limit = candidate.replace(year=candidate.year + 5, month=1, day=1)
+    while candidate < limit:
+      if candidate.month not in self.months:
+        candidate = (candidate.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+      elif not self._day_matches(candidate):
+        candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+      elif candidate.hour not in self.hours:
+        candidate = candidate.replace(minute=0) + timedelta(hours=1)
+      elif candidate.minute not in self.minutes:
+        candidate += timedelta(minutes=1)
+      else:
+        return candidate
+    raise ValueError(f'cron表达式没有可执行的时间: {self.expression}')
@@ -0,0 +1,102 @@
+import os
+import sqlite3
+import threading
+from typing import List
+
+# 元数据表：写入时不改变分析数据的版本
+METADATA_TABLES = ('report_configs', 'table_mapping', 'column_mapping', 'schema_version', 'data_version')
+
+# 数据版本表和分析表触发器，与 database/init.sql 保持一致，用于升级已有的数据库和之后新建的分析表
+DATA_VERSION_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS data_version (
+  id INTEGER PRIMARY KEY CHECK (id = 1),
+  version INTEGER NOT NULL DEFAULT 0,
+  updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0);
+"""
+_DATA_VERSION_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS "trg_data_{table}_{event}" AFTER {operation} ON "{table}"
+BEGIN UPDATE data_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1; END;
+"""
+
+def file_data_version(path: str) -> str:
+  """数据库文件（及WAL文件）的修改时间和大小，任何连接或进程提交修改后都会变化"""
+  parts = []
+  for file_path in (path, path + '-wal'):
+    try:
+      stat = os.stat(file_path)
+    except FileNotFoundError:
+      continue
+    parts.append(f'{stat.st_mtime_ns}:{stat.st_size}')
+  return '-'.join(parts)
+
+def analytical_tables(connection: sqlite3.Connection) -> List[str]:
+  """元数据表以外的表"""
+  return [
+    row[0] for row in connection.execute(
+      "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+    )
+    if row[0] not in METADATA_TABLES
+  ]
+
+def data_version_sql(tables: List[str]) -> str:
+  return DATA_VERSION_TABLE_SQL + ''.join(
+    _DATA_VERSION_TRIGGER.format(table=table, event=operation.lower(), operation=operation)
+    for table in tables
+    for operation in ('INSERT', 'UPDATE', 'DELETE')
+  )
+
+class DataVersion:
+  """
+  分析数据的版本
+
+  分析表上的触发器在每次写入时递增 data_version 表的计数，任何连接或进程的写入都会计入，报表配置、映射表等元数据的写入不计入；
+  版本为该计数和SQLite的schema版本号（新建、删除表时变化）。先比较数据库文件的修改时间和大小，文件未变时不读取数据库。
+  schema变化后为新建的分析表补建触发器。
+  """
+
+  def __init__(self, path: str):
+    self.path = path
+    self._file_version = None
+    self._version = None
+    self._schema_version = None
+    self._lock = threading.Lock()
+
+  def ensure(self):
+    """确保数据版本表和所有分析表的触发器存在"""
+    connection = sqlite3.connect(self.path)
+    try:
+      connection.executescript(data_version_sql(analytical_tables(connection)))
+      connection.commit()
+    finally:
+      connection.close()
+
+  def _read(self):
+    connection = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True)
+    try:
+      counter = connection.execute('SELECT version FROM data_version WHERE id = 1').fetchone()
+      schema_version = connection.execute('PRAGMA schema_version').fetchone()[0]
+    finally:
+      connection.close()
+    return (counter[0] if counter else 0), schema_version
+
+  def get(self) -> str:
+    # 先获取文件版本：读取期间有新的写入时，下次调用会重新读取
+    file_version = file_data_version(self.path)
+    with self._lock:
+      if file_version == self._file_version:
+        return self._version
+      try:
+        counter, schema_version = self._read()
+        if self._schema_version is not None and schema_version != self._schema_version:
+          self.ensure()
+          counter, schema_version = self._read()
+      except sqlite3.Error:
+        # 数据版本表不可用（如数据库只读、尚未升级）时退回按文件判断
+        self._file_version = self._version = file_version
+        return self._version
+      self._file_version = file_version
+      self._schema_version = schema_version
+      self._version = f'{counter}:{schema_version}'
+      return self._version
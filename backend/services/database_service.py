@@ -1,7 +1,46 @@
 import sqlite3
 import os
+import re
+from contextlib import contextmanager
 from config import Config
 from typing import List, Dict, Any
+from services.metrics_service import metrics, span
+from services.single_flight import SingleFlight
+from services.connection_pool import ConnectionPool
+from services.read_replica import ReadReplica
+from services.data_version import DataVersion, METADATA_TABLES
+from services.query_engine import (
+  SQLiteEngine, DuckDBEngine, ENGINE_QUERIES, ENGINE_FALLBACKS, duckdb, duckdb_sql, query_tables,
+)
+
+# schema版本表和映射表触发器，与 database/init.sql 保持一致，用于升级已有的数据库
+_SCHEMA_VERSION_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS trg_{table}_{event} AFTER {operation} ON {table}
+BEGIN UPDATE schema_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1; END;
+"""
+SCHEMA_VERSION_SQL = """
+CREATE TABLE IF NOT EXISTS schema_version (
+  id INTEGER PRIMARY KEY CHECK (id = 1),
+  version INTEGER NOT NULL DEFAULT 0,
+  updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+INSERT OR IGNORE INTO schema_version (id, version) VALUES (1, 0);
+""" + ''.join(
+  _SCHEMA_VERSION_TRIGGER.format(table=table, event=operation.lower(), operation=operation)
+  for table in ('table_mapping', 'column_mapping')
+  for operation in ('INSERT', 'UPDATE', 'DELETE')
+)
+
+DB_QUERIES = metrics.counter(
+  'aireport_db_queries_total',
+  '按执行位置（主库、只读副本）统计的查询数',
+  labelnames=('target',),
+)
+# 报表配置、映射表等元数据表的查询总是在主库执行，保证修改后立即可见
+PRIMARY_TABLES_PATTERN = re.compile(
+  r'\b(' + '|'.join(METADATA_TABLES + ('sqlite_master', 'sqlite_schema')) + r')\b',
+  re.IGNORECASE,
+)
 
 class DatabaseService:
   """数据库服务类"""
@@ -9,7 +48,36 @@ class DatabaseService:
   def __init__(self):
     self.config = Config
     self.connection = None
+    # 只读连接池，用于可以并发执行的查询
+    self._read_pool = ConnectionPool(self.connect_read_only, self.config.DB_READ_POOL_SIZE)
+    # 相同SQL和参数的并发查询只执行一次
+    self._single_flight = SingleFlight('query', self.config.SINGLE_FLIGHT_ENABLED)
+    # 分析表的数据版本，报表配置等元数据的写入不改变版本
+    self._data_version = DataVersion(self.config.DB_PATH)
     self._init_database()
+    # 分析查询使用的只读副本，未配置 DB_REPLICA_PATH 时在主库上查询
+    self.replica = None
+    if self.config.DB_REPLICA_PATH:
+      self.replica = ReadReplica(
+        self.config.DB_PATH,
+        self.config.DB_REPLICA_PATH,
+        self.config.DB_REPLICA_REFRESH_INTERVAL,
+        self.config.DB_READ_POOL_SIZE,
+        self._data_version.get,
+      )
+    # 分析查询的执行引擎：聚合查询在数据量大时使用DuckDB（QUERY_ENGINE=auto 且安装了duckdb），其余使用SQLite
+    self.engines = {'sqlite': SQLiteEngine(self)}
+    if self.config.QUERY_ENGINE == 'duckdb' or (self.config.QUERY_ENGINE == 'auto' and duckdb is not None):
+      self.engines['duckdb'] = DuckDBEngine(
+        self,
+        mode=self.config.DUCKDB_MODE,
+        threads=self.config.DUCKDB_THREADS,
+        sync_interval=self.config.DUCKDB_SYNC_INTERVAL,
+        skip_tables=PRIMARY_TABLES_PATTERN,
+      )
+    # 各表的估计行数，数据版本变化后重新估计
+    self._table_rows = {}
+    self._table_rows_version = None
 
   def _init_database(self):
     """初始化数据库，如果不存在则创建并执行初始化脚本"""
@@ -23,6 +91,9 @@ class DatabaseService:
     # 如果数据库文件不存在，执行初始化脚本
     if not os.path.exists(db_path):
       self._create_database()
+    self._ensure_schema_version()
+    self._ensure_report_schedule()
+    self._data_version.ensure()
 
   def _create_database(self):
     """创建数据库并执行初始化脚本"""
@@ -40,6 +111,45 @@ class DatabaseService:
       finally:
         connection.close()
 
+  def _ensure_schema_version(self):
+    """确保schema版本表和映射表触发器存在（兼容在此之前创建的数据库）"""
+    connection = sqlite3.connect(self.config.DB_PATH)
+    try:
+      tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+      if {'table_mapping', 'column_mapping'} <= tables:
+        connection.executescript(SCHEMA_VERSION_SQL)
+        connection.commit()
+    finally:
+      connection.close()
+
+  def _ensure_report_schedule(self):
+    """确保报表配置表有 schedule 字段（兼容在此之前创建的数据库）"""
+    connection = sqlite3.connect(self.config.DB_PATH)
+    try:
+      columns = {row[1] for row in connection.execute('PRAGMA table_info(report_configs)')}
+      if columns and 'schedule' not in columns:
+        connection.execute('ALTER TABLE report_configs ADD COLUMN schedule TEXT')
+        connection.commit()
+    finally:
+      connection.close()
+
+  def get_data_version(self) -> str:
+    """
+    分析查询所见数据的版本：分析表的写入计数（触发器维护，任何连接或进程的写入都会计入，报表配置、映射表的写入不计入），
+    重启后保持不变；使用只读副本时为副本对应的主库版本，副本刷新后才变化
+    """
+    if self.replica is not None:
+      return self.replica.data_version
+    return self._data_version.get()
+
+  def get_schema_version(self) -> int:
+    """获取当前schema版本号，表名、字段映射每次变化后递增"""
+    try:
+      rows = self.execute_query('SELECT version FROM schema_version WHERE id = 1')
+      return rows[0]['version'] if rows else 0
+    except Exception:
+      return 0
+
   def get_connection(self):
     """获取数据库连接"""
     if self.connection is None:
@@ -51,6 +161,30 @@ class DatabaseService:
       self.connection.row_factory = sqlite3.Row
     return self.connection
 
+  def connect_read_only(self) -> sqlite3.Connection:
+    """打开一个新的只读连接（不属于连接池，由调用方关闭）"""
+    connection = sqlite3.connect(f'file:{self.config.DB_PATH}?mode=ro', uri=True, check_same_thread=False)
+    connection.row_factory = sqlite3.Row
+    return connection
+
+  @contextmanager
+  def read_connection(self, sql: str = None):
+    """
+    从只读连接池借出一个连接，连接数达到上限时等待其他查询归还
+
+    使用只读副本时，不涉及元数据表的查询（sql）借出副本的连接
+    """
+    pool = self.replica.pool if self._use_replica(sql) else self._read_pool
+    with pool.connection() as connection:
+      yield connection
+
+  def _use_replica(self, sql: str = None) -> bool:
+    """查询是否在只读副本上执行"""
+    use_replica = self.replica is not None and sql is not None and not PRIMARY_TABLES_PATTERN.search(sql)
+    if sql is not None:
+      DB_QUERIES.inc(target='replica' if use_replica else 'primary')
+    return use_replica
+
   def _row_to_dict(self, row):
     """将 SQLite Row 对象转换为字典"""
     if row is None:
@@ -60,21 +194,135 @@ class DatabaseService:
   def execute_query(self, sql: str, params: tuple = None) -> List[Dict[str, Any]]:
     """执行查询SQL"""
     self._validate_sql(sql)
-    
+
+    def run():
+      # 元数据查询在主库连接上执行，分析查询由执行引擎执行
+      if PRIMARY_TABLES_PATTERN.search(sql):
+        DB_QUERIES.inc(target='primary')
+        return self._execute(self.get_connection(), sql, params)
+      return self._execute_analytical(sql, params)
+    return self._coalesce(sql, params, run)
+
+  def execute_read_query(self, sql: str, params: tuple = None) -> List[Dict[str, Any]]:
+    """在只读连接池上执行查询SQL，可在多个线程中并发调用"""
+    self._validate_sql(sql)
+
+    return self._coalesce(sql, params, lambda: self._execute_analytical(sql, params))
+
+  def _estimate_rows(self, tables: List[str]) -> int:
+    """查询涉及的表的估计总行数（按最大rowid估计，不需要扫描全表）"""
+    version = self.get_data_version()
+    if version != self._table_rows_version:
+      self._table_rows = {}
+      self._table_rows_version = version
+    total = 0
+    for table in tables:
+      if table not in self._table_rows:
+        try:
+          with self._read_pool.connection() as connection:
+            row = connection.execute(f'SELECT MAX(rowid) FROM "{table}"').fetchone()
+          self._table_rows[table] = row[0] or 0
+        except Exception:
+          # 子查询别名、CTE等不是表的名称
+          self._table_rows[table] = 0
+      total += self._table_rows[table]
+    return total
+
+  def _choose_engine(self, sql: str):
+    """
+    按代价选择执行引擎
+
+    DuckDB可用、查询可以转换为DuckDB写法、涉及的表估计行数不少于 DUCKDB_MIN_ROWS 且DuckDB中的数据是最新的时使用DuckDB
+
+    Returns:
+      (执行引擎, 在该引擎上执行的SQL)
+    """
+    sqlite_engine = self.engines['sqlite']
+    duckdb_engine = self.engines.get('duckdb')
+    if duckdb_engine is None or PRIMARY_TABLES_PATTERN.search(sql):
+      return sqlite_engine, sql
+    translated = duckdb_sql(sql)
+    if translated is None or self._estimate_rows(query_tables(sql)) < self.config.DUCKDB_MIN_ROWS \
+        or not duckdb_engine.ready():
+      return sqlite_engine, sql
+    return duckdb_engine, translated
+
+  def _execute_analytical(self, sql: str, params: tuple = None) -> List[Dict[str, Any]]:
+    """在选定的执行引擎上执行分析查询，DuckDB执行失败时改用SQLite"""
+    engine, engine_sql = self._choose_engine(sql)
+    if engine.name != 'sqlite':
+      try:
+        rows = engine.execute(engine_sql, params)
+        ENGINE_QUERIES.inc(engine=engine.name)
+        return rows
+      except Exception as e:
+        engine.last_error = str(e)
+        ENGINE_FALLBACKS.inc()
+    ENGINE_QUERIES.inc(engine='sqlite')
+    return self.engines['sqlite'].execute(sql, params)
+
+  def engine_status(self) -> List[Dict[str, Any]]:
+    """各执行引擎的状态"""
+    return [engine.status() for engine in self.engines.values()]
+
+  def _coalesce(self, sql: str, params: tuple, run) -> List[Dict[str, Any]]:
+    """
+    相同SQL和参数的并发查询合并为一次执行，每个请求得到结果的副本
+
+    只合并分析查询：元数据查询（如修改报表后读取报表配置）可能加入修改提交前开始的查询而读到旧的数据，不合并。
+    """
+    if PRIMARY_TABLES_PATTERN.search(sql):
+      return run()
+    key = (sql, tuple(params) if params else ())
+    try:
+      hash(key)
+    except TypeError:
+      return run()
+    return self._single_flight.do(key, run, share=lambda rows: [dict(row) for row in rows])
+
+  def count_query_rows(self, sql: str, params: tuple = None) -> int:
+    """统计查询结果的行数"""
+    rows = self.execute_read_query(f'SELECT COUNT(*) AS total FROM ({sql})', params)
+    return rows[0]['total'] if rows else 0
+
+  def stream_query(self, sql: str, params: tuple = None, chunk_size: int = 5000):
+    """
+    在独立的只读连接上执行查询，分批返回结果，内存占用只与批大小有关
+
+    Yields:
+      (列名列表, 行元组列表)，没有结果时返回一次空列表
+    """
+    self._validate_sql(sql)
+    connection = self.replica.connect() if self._use_replica(sql) else self.connect_read_only()
+    try:
+      cursor = connection.execute(sql.replace('%s', '?'), params or ())
+      columns = [description[0] for description in cursor.description]
+      rows = cursor.fetchmany(chunk_size)
+      # 没有结果时也返回一次列名
+      yield columns, [tuple(row) for row in rows]
+      while rows:
+        rows = cursor.fetchmany(chunk_size)
+        if rows:
+          yield columns, [tuple(row) for row in rows]
+    finally:
+      connection.close()
+
+  def _execute(self, connection, sql: str, params: tuple = None) -> List[Dict[str, Any]]:
     # 将 MySQL 的占位符 %s 转换为 SQLite 的 ?
     sql = sql.replace('%s', '?')
     
-    connection = self.get_connection()
     cursor = None
     try:
       cursor = connection.cursor()
-      if params:
-        cursor.execute(sql, params)
-      else:
-        cursor.execute(sql)
-      results = cursor.fetchall()
+      with span('db.execute'):
+        if params:
+          cursor.execute(sql, params)
+        else:
+          cursor.execute(sql)
+        results = cursor.fetchall()
       # 转换为字典列表
-      return [self._row_to_dict(row) for row in results]
+      with span('db.convert'):
+        return [self._row_to_dict(row) for row in results]
     except Exception as e:
       raise Exception(f'SQL执行失败: {str(e)}')
     finally:
@@ -85,9 +333,9 @@ class DatabaseService:
     """验证SQL安全性"""
     sql_upper = sql.upper().strip()
     
-    # 检查是否包含禁止的关键字
+    # 检查是否包含禁止的关键字（按单词匹配，避免误判created_at、updated_at等字段名）
     for keyword in self.config.FORBIDDEN_SQL_KEYWORDS:
-      if keyword in sql_upper:
+      if re.search(rf'\b{keyword}\b', sql_upper):
         raise Exception(f'不允许执行包含 {keyword} 的SQL语句')
     
     # 检查是否以允许的关键字开头
@@ -96,7 +344,7 @@ class DatabaseService:
 
   def get_tables(self) -> List[Dict[str, str]]:
     """获取所有表列表"""
-    # 从映射表获取表信息
+    # 从映射表获取表信息，同一个表有多个自然语言名称时只返回第一个
     sql = """
       SELECT 
         tm.id,
@@ -104,6 +352,7 @@ class DatabaseService:
         tm.db_table_name as name,
         tm.description
       FROM table_mapping tm
+      WHERE tm.id IN (SELECT MIN(id) FROM table_mapping GROUP BY db_table_name)
       ORDER BY tm.id
     """
     try:
@@ -122,8 +371,7 @@ class DatabaseService:
         cm.data_type as type,
         '' as description
       FROM column_mapping cm
-      INNER JOIN table_mapping tm ON cm.table_id = tm.id
-      WHERE tm.db_table_name = ?
+      WHERE cm.table_id = (SELECT MIN(id) FROM table_mapping WHERE db_table_name = ?)
       ORDER BY cm.id
     """
     try:
@@ -134,6 +382,10 @@ class DatabaseService:
       pass
     
     # 如果映射表查询失败，直接从数据库获取
+    return self._get_physical_columns(table_name)
+
+  def _get_physical_columns(self, table_name: str) -> List[Dict[str, str]]:
+    """通过PRAGMA获取表的实际字段"""
     connection = self.get_connection()
     try:
       cursor = connection.cursor()
@@ -152,8 +404,104 @@ class DatabaseService:
     except Exception:
       return []
 
+  def get_indexed_columns(self, table_name: str) -> List[str]:
+    """获取表中作为索引首列的字段"""
+    connection = self.get_connection()
+    try:
+      cursor = connection.cursor()
+      cursor.execute(f"PRAGMA index_list({table_name})")
+      index_names = [row[1] for row in cursor.fetchall()]
+      columns = []
+      for index_name in index_names:
+        cursor.execute(f"PRAGMA index_info({index_name})")
+        rows = cursor.fetchall()
+        if rows and rows[0][2] not in columns:
+          columns.append(rows[0][2])
+      cursor.close()
+      return columns
+    except Exception:
+      return []
+
+  def get_distinct_values(self, table_name: str, column_name: str, limit: int) -> List[Any]:
+    """获取字段的不同取值，取值个数超过limit时返回空列表"""
+    sql = f"SELECT {column_name} AS value FROM {table_name} WHERE {column_name} IS NOT NULL GROUP BY {column_name} LIMIT ?"
+    try:
+      rows = self.execute_query(sql, (limit + 1,))
+    except Exception:
+      return []
+    if len(rows) > limit:
+      return []
+    return [row['value'] for row in rows]
+
+  def get_schema(self) -> List[Dict[str, Any]]:
+    """
+    获取规范化的schema：每个物理表一项，别名归并到同一表下
+
+    table_mapping 中同一个 db_table_name 可以有多个自然语言名称，column_mapping 按别名重复存储，
+    同一字段也可以有多个自然语言名称。这里用一次查询取出全部映射，按物理表和字段去重。
+    没有字段映射的表通过PRAGMA获取实际字段。
+
+    Returns:
+      表列表，每项包含 db_name、aliases、description、columns，
+      字段包含 db_name、aliases、type、description
+    """
+    sql = """
+      SELECT
+        tm.natural_name as tableAlias,
+        tm.db_table_name as tableName,
+        tm.description,
+        cm.natural_name as columnAlias,
+        cm.db_column_name as columnName,
+        cm.data_type as type
+      FROM table_mapping tm
+      LEFT JOIN column_mapping cm ON cm.table_id = tm.id
+      ORDER BY tm.id, cm.id
+    """
+    try:
+      rows = self.execute_query(sql)
+    except Exception:
+      return []
+
+    tables = {}
+    for row in rows:
+      table_name = row['tableName']
+      table = tables.get(table_name)
+      if table is None:
+        table = {'db_name': table_name, 'aliases': [], 'description': '', 'columns': {}}
+        tables[table_name] = table
+      if row['tableAlias'] and row['tableAlias'] != table_name and row['tableAlias'] not in table['aliases']:
+        table['aliases'].append(row['tableAlias'])
+      if row['description'] and not table['description']:
+        table['description'] = row['description']
+
+      column_name = row['columnName']
+      if not column_name:
+        continue
+      column = table['columns'].get(column_name)
+      if column is None:
+        column = {'db_name': column_name, 'aliases': [], 'type': row['type'] or '', 'description': ''}
+        table['columns'][column_name] = column
+      if row['columnAlias'] and row['columnAlias'] != column_name and row['columnAlias'] not in column['aliases']:
+        column['aliases'].append(row['columnAlias'])
+
+    schema = []
+    for table in tables.values():
+      columns = list(table['columns'].values())
+      if not columns:
+        columns = [
+          {'db_name': col['name'], 'aliases': [], 'type': col['type'], 'description': ''}
+          for col in self._get_physical_columns(table['db_name'])
+        ]
+      schema.append(dict(table, columns=columns))
+    return schema
+
   def close(self):
     """关闭数据库连接"""
     if self.connection:
       self.connection.close()
       self.connection = None
+    self._read_pool.close()
+    for engine in self.engines.values():
+      engine.close()
+    if self.replica is not None:
+      self.replica.close()
@@ -0,0 +1,187 @@
+from typing import Dict, List, Any, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+DOWNSAMPLE_METHODS = ('lttb', 'minmax')
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+  """
+  Largest-Triangle-Three-Buckets 降采样
+
+  保留首尾两点，其余点分为 threshold-2 个桶，每个桶中选出与上一个选中点、
+  下一个桶的平均点构成的三角形面积最大的点，能较好地保留曲线的形状。
+
+  Args:
+    x: 按升序排列的横坐标
+    y: 纵坐标
+    threshold: 保留的点数
+
+  Returns:
+    保留点的下标（升序）
+  """
+  n = len(x)
+  if threshold >= n or threshold < 3:
+    return np.arange(n)
+
+  # 各桶在 [1, n-1) 范围内的边界
+  edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+  selected = np.empty(threshold, dtype=int)
+  selected[0] = 0
+  selected[-1] = n - 1
+  previous = 0
+  for i in range(threshold - 2):
+    start, end = edges[i], edges[i + 1]
+    # 下一个桶的平均点，最后一个桶使用最后一个点
+    if i + 2 < len(edges):
+      next_start, next_end = edges[i + 1], edges[i + 2]
+      avg_x = x[next_start:next_end].mean()
+      avg_y = y[next_start:next_end].mean()
+    else:
+      avg_x, avg_y = x[n - 1], y[n - 1]
+    bucket_x = x[start:end]
+    bucket_y = y[start:end]
+    areas = np.abs(
+      (x[previous] - avg_x) * (bucket_y - y[previous])
+      - (x[previous] - bucket_x) * (avg_y - y[previous])
+    )
+    previous = start + int(np.argmax(areas))
+    selected[i + 1] = previous
+  return selected
+
+def min_max(y: np.ndarray, threshold: int) -> np.ndarray:
+  """
+  按桶保留最小值和最大值的降采样
+
+  保留首尾两点，其余分为 (threshold-2)/2 个桶，每个桶保留最小值点和最大值点，峰值和谷值不会丢失。
+
+  Returns:
+    保留点的下标（升序）
+  """
+  n = len(y)
+  if threshold >= n or threshold < 4:
+    return np.arange(n)
+
+  edges = np.linspace(0, n, (threshold - 2) // 2 + 1).astype(int)
+  indices = [0, n - 1]
+  for start, end in zip(edges[:-1], edges[1:]):
+    if end <= start:
+      continue
+    bucket = y[start:end]
+    indices.append(start + int(np.argmin(bucket)))
+    indices.append(start + int(np.argmax(bucket)))
+  return np.unique(indices)
+
+def _is_numeric(values: pd.Series) -> bool:
+  return pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values)
+
+def _date_values(values: pd.Series) -> Optional[np.ndarray]:
+  """日期文本转换为时间戳，不是日期列时返回None"""
+  sample = values.dropna().head(50).astype(str)
+  # 至少形如 2024-01 的文本才当作日期
+  if sample.empty or not sample.str.match(r'^\d{4}[-/]\d{1,2}').all():
+    return None
+  parsed = pd.to_datetime(values, errors='coerce', format='ISO8601')
+  if parsed.notna().mean() < 0.9:
+    return None
+  return (parsed.ffill().bfill() - pd.Timestamp(0)).dt.total_seconds().to_numpy(dtype=float)
+
+def _x_values(frame: pd.DataFrame, column: str) -> Optional[np.ndarray]:
+  """横坐标转换为数值：数值列直接使用，日期列转换为时间戳，否则返回None"""
+  if _is_numeric(frame[column]):
+    return frame[column].to_numpy(dtype=float)
+  return _date_values(frame[column])
+
+def _is_value_column(frame: pd.DataFrame, column: str) -> bool:
+  """可以作为纵坐标的列：数值列，编号类字段除外"""
+  return _is_numeric(frame[column]) and column.lower() != 'id' and not column.lower().endswith('_id')
+
+def _choose_axes(frame: pd.DataFrame, columns: List[str], x_field: str = None,
+                 y_field: str = None) -> Tuple[Optional[str], Optional[np.ndarray], Optional[str]]:
+  """
+  选择横纵坐标：先选横坐标，再从其余列中选纵坐标
+
+  横坐标为指定的字段，或第一个日期列，没有日期列时为第一列（第一列是数值列且另有可作为纵坐标的列时）；
+  纵坐标为指定的字段，或横坐标以外第一个数值列（编号类字段除外）。
+
+  Returns:
+    (横坐标字段, 横坐标数值, 纵坐标字段)，没有横坐标时按行顺序，没有纵坐标时纵坐标字段为None
+  """
+  for field in (x_field, y_field):
+    if field and field not in columns:
+      raise Exception(f'降采样字段不存在: {field}')
+  if y_field and not _is_numeric(frame[y_field]):
+    raise Exception(f'纵坐标字段不是数值列: {y_field}')
+
+  x_column = x_field
+  x = None
+  if x_column:
+    x = _x_values(frame, x_column)
+    if x is None:
+      raise Exception(f'横坐标字段不是日期或数值列: {x_column}')
+  else:
+    for col in columns:
+      if col == y_field or _is_numeric(frame[col]):
+        continue
+      x = _date_values(frame[col])
+      if x is not None:
+        x_column = col
+        break
+  if x is None and columns:
+    first = columns[0]
+    others = [col for col in columns[1:] if _is_value_column(frame, col)]
+    if first != y_field and _is_numeric(frame[first]) and (y_field or others):
+      x_column, x = first, frame[first].to_numpy(dtype=float)
+
+  y_column = y_field or next((col for col in columns if col != x_column and _is_value_column(frame, col)), None)
+  return x_column, x, y_column
+
+def downsample_rows(rows: List[Dict[str, Any]], columns: List[str], target_points: int,
+                    method: str = 'lttb', x_field: str = None,
+                    y_field: str = None) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+  """
+  对时间序列查询结果降采样
+
+  先选横坐标（第一个日期列，没有时为数值类型的第一列），再从其余列中选第一个数值列（编号类字段除外）作为纵坐标，
+  也可以用 x_field、y_field 指定。结果按横坐标排序后降采样；没有可用的横坐标时按行顺序降采样。
+  多个数值列时以纵坐标选点，保留整行。
+
+  Args:
+    rows: 查询结果
+    columns: 列名列表
+    target_points: 目标点数
+    method: lttb 或 minmax
+    x_field: 横坐标字段（可选）
+    y_field: 纵坐标字段（可选）
+
+  Returns:
+    (降采样后的结果, 降采样信息)，行数不超过目标点数或没有数值列时原样返回，信息为None
+  """
+  if method not in DOWNSAMPLE_METHODS:
+    raise Exception(f'不支持的降采样方法: {method}')
+  if not rows or not target_points or len(rows) <= target_points:
+    return rows, None
+
+  frame = pd.DataFrame.from_records(rows, columns=columns)
+  x_column, x, value_column = _choose_axes(frame, columns, x_field, y_field)
+  if value_column is None:
+    return rows, None
+
+  if x is None:
+    x = np.arange(len(rows), dtype=float)
+  order = np.argsort(x, kind='stable')
+  x = x[order]
+  y = frame[value_column].to_numpy(dtype=float)[order]
+  y = np.nan_to_num(y)
+
+  if method == 'lttb':
+    selected = lttb(x, y, target_points)
+  else:
+    selected = min_max(y, target_points)
+  sampled = [rows[i] for i in order[selected]]
+  return sampled, {
+    'method': method,
+    'xField': x_column,
+    'yField': value_column,
+    'originalPoints': len(rows),
+    'points': len(sampled),
+  }
@@ -0,0 +1,286 @@
+import csv
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional
+from services.database_service import DatabaseService
+from services.report_service import ReportService
+from services.metrics_service import metrics
+from config import Config
+
+# 可选依赖：未安装时对应的导出格式不可用
+try:
+  import pyarrow as pa
+  import pyarrow.parquet as pq
+except ImportError:
+  pa = None
+  pq = None
+try:
+  from openpyxl import Workbook
+except ImportError:
+  Workbook = None
+
+EXPORT_JOBS = metrics.counter(
+  'aireport_export_jobs_total',
+  '导出任务数（按格式和结束状态）',
+  labelnames=('format', 'status'),
+)
+EXPORT_ROWS = metrics.counter(
+  'aireport_export_rows_total',
+  '导出的行数',
+  labelnames=('format',),
+)
+
+EXPORT_FORMATS = {
+  'csv': ('text/csv', 'csv'),
+  'parquet': ('application/vnd.apache.parquet', 'parquet'),
+  'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+# Excel单个工作表的最大行数（含表头）
+XLSX_MAX_ROWS = 1048576
+
+class ExportCancelled(Exception):
+  pass
+
+class CSVWriter:
+  def __init__(self, path: str, columns: List[str]):
+    # 带BOM，Excel打开时能正确识别中文
+    self._file = open(path, 'w', encoding='utf-8-sig', newline='')
+    self._writer = csv.writer(self._file)
+    self._writer.writerow(columns)
+
+  def write(self, rows: List[tuple]):
+    self._writer.writerows(rows)
+
+  def close(self):
+    self._file.close()
+
+class ParquetWriter:
+  def __init__(self, path: str, columns: List[str]):
+    if pq is None:
+      raise Exception('导出Parquet需要安装pyarrow')
+    self.path = path
+    self.columns = columns
+    self._writer = None
+    self._schema = None
+
+  def write(self, rows: List[tuple]):
+    arrays = [list(values) for values in zip(*rows)]
+    if self._writer is None:
+      # 以第一批数据推断列类型，全为空的列按字符串处理
+      table = pa.Table.from_arrays([pa.array(values) for values in arrays], names=self.columns)
+      fields = [pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in table.schema]
+      self._schema = pa.schema(fields)
+      self._writer = pq.ParquetWriter(self.path, self._schema)
+    table = pa.Table.from_arrays(
+      [pa.array(values, type=field.type) for values, field in zip(arrays, self._schema)],
+      schema=self._schema,
+    )
+    self._writer.write_table(table)
+
+  def close(self):
+    if self._writer is None:
+      # 没有数据时写出只有列名的文件
+      self._writer = pq.ParquetWriter(self.path, pa.schema([pa.field(col, pa.string()) for col in self.columns]))
+    self._writer.close()
+
+class XLSXWriter:
+  def __init__(self, path: str, columns: List[str]):
+    if Workbook is None:
+      raise Exception('导出Excel需要安装openpyxl')
+    self.path = path
+    # 只写模式逐行写出，内存占用与行数无关
+    self._workbook = Workbook(write_only=True)
+    self._sheet = self._workbook.create_sheet('data')
+    self._sheet.append(columns)
+    self._rows = 1
+
+  def write(self, rows: List[tuple]):
+    self._rows += len(rows)
+    if self._rows > XLSX_MAX_ROWS:
+      raise Exception(f'超过Excel单个工作表的最大行数 {XLSX_MAX_ROWS}，请导出为CSV或Parquet')
+    for row in rows:
+      self._sheet.append(list(row))
+
+  def close(self):
+    self._workbook.save(self.path)
+
+WRITERS = {'csv': CSVWriter, 'parquet': ParquetWriter, 'xlsx': XLSXWriter}
+
+class ExportJob:
+  """导出任务"""
+
+  def __init__(self, export_format: str, sql: str, params: tuple, name: str):
+    self.id = uuid.uuid4().hex
+    self.format = export_format
+    self.sql = sql
+    self.params = params
+    self.name = name
+    self.status = 'pending'
+    self.total_rows = None
+    self.rows_written = 0
+    self.path = None
+    self.size = None
+    self.error = None
+    self.cancelled = False
+    self.created_at = time.time()
+    self.finished_at = None
+
+  @property
+  def filename(self) -> str:
+    return f'{self.name}.{EXPORT_FORMATS[self.format][1]}'
+
+  def to_dict(self) -> Dict[str, Any]:
+    progress = None
+    if self.status == 'completed':
+      progress = 1.0
+    elif self.total_rows:
+      progress = round(min(self.rows_written / self.total_rows, 1.0), 4)
+    return {
+      'id': self.id,
+      'format': self.format,
+      'status': self.status,
+      'rowsWritten': self.rows_written,
+      'totalRows': self.total_rows,
+      'progress': progress,
+      'filename': self.filename,
+      'size': self.size,
+      'error': self.error,
+      'createdAt': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.created_at)),
+      'finishedAt': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.finished_at)) if self.finished_at else None,
+    }
+
+class ExportService:
+  """
+  报表导出服务
+
+  导出任务在后台线程池中执行：在独立的只读连接上执行报表查询，用 fetchmany 分批读取并直接写入文件，
+  内存占用只与批大小有关，不受 MAX_RESULT_SIZE 限制。写完后文件从临时文件名改为正式文件名，
+  超过 EXPORT_TTL 秒的任务和文件会被清理。
+  """
+
+  def __init__(self, db_service: DatabaseService, report_service: ReportService):
+    self.db_service = db_service
+    self.report_service = report_service
+    self.export_dir = Config.EXPORT_DIR
+    self.chunk_size = Config.EXPORT_CHUNK_SIZE
+    self.ttl = Config.EXPORT_TTL
+    self._jobs = {}
+    self._lock = threading.Lock()
+    self._executor = ThreadPoolExecutor(max_workers=max(Config.EXPORT_WORKERS, 1), thread_name_prefix='export')
+    os.makedirs(self.export_dir, exist_ok=True)
+
+  def submit(self, export_format: str, report_id: int = None, query_config: Dict[str, Any] = None) -> ExportJob:
+    """
+    提交导出任务
+
+    Args:
+      export_format: csv、parquet 或 xlsx
+      report_id: 导出已保存报表的查询
+      query_config: 未指定报表时使用的查询配置
+
+    Returns:
+      导出任务
+    """
+    export_format = (export_format or 'csv').lower()
+    if export_format not in EXPORT_FORMATS:
+      raise Exception(f'不支持的导出格式: {export_format}')
+    if export_format == 'parquet' and pq is None:
+      raise Exception('导出Parquet需要安装pyarrow')
+    if export_format == 'xlsx' and Workbook is None:
+      raise Exception('导出Excel需要安装openpyxl')
+    name = 'export'
+    if report_id is not None:
+      report = self.report_service.get_report(report_id)
+      if not report:
+        raise Exception('报表不存在')
+      if not report.get('query_config'):
+        raise Exception('报表未配置查询')
+      query_config = report['query_config']
+      name = f'report-{report_id}'
+    if not query_config:
+      raise Exception('查询配置不能为空')
+    sql, params = self.report_service.build_query(query_config)
+
+    self._cleanup()
+    job = ExportJob(export_format, sql, params, name)
+    with self._lock:
+      self._jobs[job.id] = job
+    self._executor.submit(self._run, job)
+    return job
+
+  def get_job(self, job_id: str) -> Optional[ExportJob]:
+    with self._lock:
+      return self._jobs.get(job_id)
+
+  def list_jobs(self) -> List[Dict[str, Any]]:
+    with self._lock:
+      jobs = sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+    return [job.to_dict() for job in jobs]
+
+  def cancel(self, job_id: str) -> bool:
+    """取消任务（进行中的任务在写完当前批后停止）并删除文件"""
+    job = self.get_job(job_id)
+    if job is None:
+      return False
+    job.cancelled = True
+    if job.status in ('completed', 'failed', 'cancelled'):
+      self._remove(job)
+    return True
+
+  def _remove(self, job: ExportJob):
+    with self._lock:
+      self._jobs.pop(job.id, None)
+    if job.path and os.path.exists(job.path):
+      os.remove(job.path)
+
+  def _cleanup(self):
+    """清理过期的任务和文件"""
+    now = time.time()
+    with self._lock:
+      expired = [job for job in self._jobs.values() if job.finished_at and now - job.finished_at > self.ttl]
+    for job in expired:
+      self._remove(job)
+
+  def _run(self, job: ExportJob):
+    job.status = 'running'
+    path = os.path.join(self.export_dir, f'{job.id}.{EXPORT_FORMATS[job.format][1]}')
+    temp_path = path + '.part'
+    writer = None
+    try:
+      # 先统计总行数，用于计算进度
+      job.total_rows = self.db_service.count_query_rows(job.sql, job.params)
+      for columns, rows in self.db_service.stream_query(job.sql, job.params, self.chunk_size):
+        if job.cancelled:
+          raise ExportCancelled()
+        if writer is None:
+          writer = WRITERS[job.format](temp_path, columns)
+        if rows:
+          writer.write(rows)
+          job.rows_written += len(rows)
+      writer.close()
+      writer = None
+      os.replace(temp_path, path)
+      job.path = path
+      job.size = os.path.getsize(path)
+      job.status = 'completed'
+      EXPORT_ROWS.inc(job.rows_written, format=job.format)
+    except ExportCancelled:
+      job.status = 'cancelled'
+    except Exception as e:
+      job.status = 'failed'
+      job.error = str(e)
+    finally:
+      if writer is not None:
+        try:
+          writer.close()
+        except Exception:
+          pass
+      if os.path.exists(temp_path):
+        os.remove(temp_path)
+      job.finished_at = time.time()
+      EXPORT_JOBS.inc(format=job.format, status=job.status)
+      if job.cancelled:
+        self._remove(job)
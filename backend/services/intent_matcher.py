@@ -0,0 +1,404 @@
+import re
+import time
+from typing import Dict, List, Any, Optional, Tuple
+from services.database_service import DatabaseService
+from services.schema_registry import SchemaRegistry
+from services.metrics_service import metrics
+from config import Config
+
+INTENT_MATCHES = metrics.counter(
+  'aireport_intent_match_total',
+  '本地意图匹配结果（命中时不调用大模型）',
+  labelnames=('result', 'intent'),
+)
+
+# 关键词：文本 -> 含义
+KEYWORDS = {
+  # 分组
+  '每个': ('group',), '每': ('group',), '各个': ('group',), '各': ('group',),
+  '按': ('group',), '按照': ('group',), '不同': ('group',),
+  # 按时间分组
+  '每年': ('time', '%Y', 'year'), '按年': ('time', '%Y', 'year'), '每一年': ('time', '%Y', 'year'),
+  '每月': ('time', '%Y-%m', 'month'), '每个月': ('time', '%Y-%m', 'month'), '按月': ('time', '%Y-%m', 'month'),
+  '每天': ('time', '%Y-%m-%d', 'day'), '每日': ('time', '%Y-%m-%d', 'day'),
+  '按天': ('time', '%Y-%m-%d', 'day'), '按日': ('time', '%Y-%m-%d', 'day'),
+  # 聚合
+  '数量': ('agg', 'count'), '数': ('agg', 'count'), '个数': ('agg', 'count'), '总数': ('agg', 'count'),
+  '多少': ('agg', 'count'), '多少个': ('agg', 'count'), '计数': ('agg', 'count'),
+  # “城市分布”：按前面的字段分组计数
+  '分布': ('distribution',),
+  '总和': ('agg', 'sum'), '合计': ('agg', 'sum'), '总计': ('agg', 'sum'), '之和': ('agg', 'sum'), '总额': ('agg', 'sum'),
+  '平均': ('agg', 'avg'), '平均值': ('agg', 'avg'), '均值': ('agg', 'avg'), '平均数': ('agg', 'avg'),
+  # 排序
+  '最高': ('order', 'DESC'), '最大': ('order', 'DESC'), '最多': ('order', 'DESC'), '最贵': ('order', 'DESC'),
+  '最低': ('order', 'ASC'), '最小': ('order', 'ASC'), '最少': ('order', 'ASC'), '最便宜': ('order', 'ASC'),
+  # 比较
+  '大于': ('cmp', '>'), '超过': ('cmp', '>'), '高于': ('cmp', '>'), '多于': ('cmp', '>'),
+  '小于': ('cmp', '<'), '低于': ('cmp', '<'), '少于': ('cmp', '<'),
+  '不低于': ('cmp', '>='), '至少': ('cmp', '>='), '大于等于': ('cmp', '>='),
+  '不超过': ('cmp', '<='), '至多': ('cmp', '<='), '小于等于': ('cmp', '<='),
+  '等于': ('cmp', '='), '为': ('cmp', '='),
+}
+
+# 不影响语义的词
+FILLERS = [
+  '的', '查询', '查看', '查找', '显示', '列出', '统计', '计算', '获取', '给出', '所有', '全部', '一下', '请',
+  '帮我', '我想', '看看', '有', '是', '哪些', '分组', '分别', '情况', '中', '里', '个', '条', '名', '位', '记录', '列表',
+]
+
+# 出现这些词时语义超出模板范围（否定、多条件组合、比率等），交给大模型
+UNSUPPORTED_WORDS = ['不是', '不在', '非', '除', '没', '或', '和', '与', '及', '同比', '环比', '占比', '比例', '排名', '增长', '之间', '以外']
+
+CHINESE_DIGITS = {'一': 1, '二': 2, '两': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9, '十': 10}
+
+NUMBER_PATTERN = re.compile(r'\d+(?:\.\d+)?')
+LIMIT_PATTERN = re.compile(r'前(\d+|[一二两三四五六七八九十])(?:个|名|条|位)?')
+IGNORED_CHARS = set(' \t\n，,。.？?！!：:；;、')
+
+NUMERIC_TYPES = ('INT', 'REAL', 'NUMERIC', 'DECIMAL', 'FLOAT', 'DOUBLE')
+TEXT_TYPES = ('CHAR', 'TEXT', 'CLOB')
+DATE_TYPES = ('DATE', 'TIME')
+
+class IntentMatch:
+  """意图匹配结果"""
+
+  def __init__(self, sql: str, intent: str, confidence: float):
+    self.sql = sql
+    self.intent = intent
+    self.confidence = confidence
+
+class IntentMatcher:
+  """
+  基于模板的本地意图匹配
+
+  用表名、字段映射中的自然语言名称和常见取值（如城市、状态）识别单表的
+  计数、求和/平均、分组统计、前N名和条件筛选类问题，直接生成SQL。
+  问题中所有有意义的文字都能被识别时才视为命中，否则返回None交给大模型。
+  """
+
+  # 作为筛选取值识别的字段最多允许的不同取值个数
+  VALUE_LIMIT = 200
+
+  def __init__(self, db_service: DatabaseService, schema_registry: SchemaRegistry,
+               threshold: float = None, values_ttl: float = 300):
+    self.db_service = db_service
+    self.schema_registry = schema_registry
+    self.threshold = Config.INTENT_MATCH_THRESHOLD if threshold is None else threshold
+    self.values_ttl = values_ttl
+    # (schema快照, 构建时间, 词典)
+    self._lexicon_state = None
+
+  def _column_kind(self, column_type: str) -> str:
+    column_type = (column_type or '').upper()
+    if any(t in column_type for t in DATE_TYPES):
+      return 'date'
+    if any(t in column_type for t in NUMERIC_TYPES):
+      return 'number'
+    if any(t in column_type for t in TEXT_TYPES):
+      return 'text'
+    return ''
+
+  def _build_lexicon(self, tables: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """由schema构建词典：词 -> 含义列表"""
+    terms = {}
+
+    def add(term: str, meaning: Tuple):
+      term = str(term).strip().lower()
+      if term and meaning not in terms.setdefault(term, []):
+        terms[term].append(meaning)
+
+    columns = {}
+    for table in tables:
+      table_name = table['db_name']
+      add(table_name, ('table', table_name))
+      for alias in table['aliases']:
+        add(alias, ('table', table_name))
+
+      indexed = set(self.db_service.get_indexed_columns(table_name))
+      for col in table['columns']:
+        kind = self._column_kind(col['type'])
+        columns[(table_name, col['db_name'])] = kind
+        add(col['db_name'], ('column', table_name, col['db_name']))
+        for alias in col['aliases']:
+          add(alias, ('column', table_name, col['db_name']))
+        # 有索引的文本字段加载不同取值，用于识别“北京的用户”这类筛选
+        if kind == 'text' and col['db_name'] in indexed:
+          for value in self.db_service.get_distinct_values(table_name, col['db_name'], self.VALUE_LIMIT):
+            if len(str(value)) >= 2:
+              add(value, ('value', table_name, col['db_name'], value))
+
+    for word, meaning in KEYWORDS.items():
+      add(word, meaning)
+    for word in FILLERS:
+      add(word, ('filler',))
+    return {
+      'terms': terms,
+      'max_length': max(len(term) for term in terms),
+      'tables': [table['db_name'] for table in tables],
+      'columns': columns,
+    }
+
+  def _get_lexicon(self) -> Dict[str, Any]:
+    snapshot = self.schema_registry.current()
+    state = self._lexicon_state
+    if state is None or state[0] is not snapshot or time.monotonic() - state[1] > self.values_ttl:
+      state = (snapshot, time.monotonic(), self._build_lexicon(snapshot.tables))
+      self._lexicon_state = state
+    return state[2]
+
+  def _tokenize(self, question: str, lexicon: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], int, int]:
+    """最长匹配分词，返回词列表、被识别的字符数和有效字符总数"""
+    text = question.lower()
+    terms = lexicon['terms']
+    tokens = []
+    covered = 0
+    total = 0
+    i = 0
+    while i < len(text):
+      if text[i] in IGNORED_CHARS:
+        i += 1
+        continue
+      match = LIMIT_PATTERN.match(text, i)
+      if match:
+        raw = match.group(1)
+        meanings = [('limit', int(raw) if raw.isdigit() else CHINESE_DIGITS[raw])]
+      else:
+        match = NUMBER_PATTERN.match(text, i)
+        if match:
+          meanings = [('number', float(match.group()) if '.' in match.group() else int(match.group()))]
+      if match:
+        length = match.end() - i
+      else:
+        meanings = None
+        for length in range(min(lexicon['max_length'], len(text) - i), 0, -1):
+          meanings = terms.get(text[i:i + length])
+          if meanings:
+            break
+      if meanings:
+        tokens.append({'text': question[i:i + length], 'meanings': meanings})
+        covered += length
+        total += length
+        i += length
+      else:
+        total += 1
+        i += 1
+    return tokens, covered, total
+
+  def _resolve_table(self, tokens: List[Dict[str, Any]], lexicon: Dict[str, Any]) -> Optional[str]:
+    """
+    确定问题涉及的唯一的表：所有表、字段、取值词都能在该表内解释。
+    有表被提及时只考虑被提及的表（如“北京的用户”），否则要求只有一个表能解释（如“电子产品的平均价格”）
+    """
+    candidates = []
+    mentioned_candidates = []
+    for table in lexicon['tables']:
+      mentioned = False
+      valid = True
+      for token in tokens:
+        entity = [m for m in token['meanings'] if m[0] in ('table', 'column', 'value')]
+        if not entity:
+          continue
+        local = [m for m in entity if m[1] == table]
+        keyword = len(entity) < len(token['meanings'])
+        if not local and not keyword:
+          valid = False
+          break
+        if ('table', table) in local:
+          mentioned = True
+      if valid:
+        candidates.append(table)
+        if mentioned:
+          mentioned_candidates.append(table)
+    if mentioned_candidates:
+      candidates = mentioned_candidates
+    return candidates[0] if len(candidates) == 1 else None
+
+  def _choose(self, token: Dict[str, Any], table: str, previous: Optional[Tuple]) -> Optional[Tuple]:
+    """选择词在该表下的含义"""
+    meanings = [m for m in token['meanings'] if m[0] not in ('table', 'column', 'value') or m[1] == table]
+    if not meanings:
+      return None
+    kinds = {m[0]: m for m in meanings}
+    # “产品数量”中的“数量”是计数而不是库存数量字段
+    if 'agg' in kinds and 'column' in kinds:
+      return kinds['agg'] if previous and previous[0] == 'table' else kinds['column']
+    for kind in ('table', 'column', 'value'):
+      if kind in kinds:
+        return kinds[kind]
+    return meanings[0]
+
+  @staticmethod
+  def _literal(value: Any) -> str:
+    if isinstance(value, (int, float)):
+      return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+  @staticmethod
+  def _add_value(filters: List[Any], values: Dict[str, List[Any]], column: str, value: Any):
+    """记录字段的取值条件"""
+    if column not in values:
+      values[column] = []
+      filters.append(('value', column))
+    if value not in values[column]:
+      values[column].append(value)
+
+  def _value_filter(self, column: str, column_values: List[Any]) -> str:
+    if len(column_values) == 1:
+      return f'{column} = {self._literal(column_values[0])}'
+    return f"{column} IN ({', '.join(self._literal(value) for value in column_values)})"
+
+  def _build_sql(self, table: str, meanings: List[Tuple], texts: List[str], lexicon: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """根据词的含义按模板生成SQL，无法套用模板时返回None"""
+    columns = lexicon['columns']
+    group = None
+    agg = None
+    order = None
+    limit = None
+    filters = []
+    # 同一字段的多个取值（“北京上海的用户”）合并为 IN 条件，在filters中的位置为该字段第一次出现的位置
+    values = {}
+    measures = []
+    pending_group = False
+    implied_sum = False
+
+    i = 0
+    while i < len(meanings):
+      meaning = meanings[i]
+      kind = meaning[0]
+      if pending_group and kind not in ('column', 'filler'):
+        return None
+      if kind == 'group':
+        pending_group = True
+      elif kind == 'time':
+        date_columns = [col for (t, col), k in columns.items() if t == table and k == 'date']
+        if group or not date_columns:
+          return None
+        group = (f"strftime('{meaning[1]}', {date_columns[0]})", meaning[2], True)
+      elif kind == 'column':
+        column = meaning[2]
+        next_meaning = meanings[i + 1] if i + 1 < len(meanings) else None
+        if pending_group or (next_meaning and next_meaning[0] == 'distribution'):
+          if group:
+            return None
+          group = (column, column, False)
+          pending_group = False
+          if next_meaning and next_meaning[0] == 'distribution':
+            agg = agg or 'count'
+            i += 1
+        elif next_meaning and next_meaning[0] == 'cmp':
+          operand = meanings[i + 2] if i + 2 < len(meanings) else None
+          if operand and operand[0] == 'number':
+            filters.append(f'{column} {next_meaning[1]} {self._literal(operand[1])}')
+          elif operand and operand[0] == 'value' and operand[2] == column and next_meaning[1] == '=':
+            self._add_value(filters, values, column, operand[3])
+          else:
+            return None
+          i += 2
+        elif columns.get((table, column)) == 'number' and column != 'id' and not column.endswith('_id'):
+          measures.append(column)
+          # “总金额”这类名称本身带有求和含义
+          implied_sum = implied_sum or texts[i].startswith('总')
+        else:
+          return None
+      elif kind == 'value':
+        self._add_value(filters, values, meaning[2], meaning[3])
+      elif kind == 'agg':
+        if agg and agg != meaning[1]:
+          return None
+        agg = meaning[1]
+      elif kind == 'order':
+        order = meaning[1]
+      elif kind == 'limit':
+        limit = meaning[1]
+      elif kind in ('cmp', 'number', 'distribution'):
+        return None
+      i += 1
+
+    if pending_group or len(measures) > 1:
+      return None
+    measure = measures[0] if measures else None
+    if agg is None and implied_sum:
+      agg = 'sum'
+    filters = [self._value_filter(item[1], values[item[1]]) if isinstance(item, tuple) else item for item in filters]
+    where = f" WHERE {' AND '.join(filters)}" if filters else ''
+
+    if agg:
+      if order or limit:
+        return None
+      if agg == 'count':
+        if measure:
+          return None
+        select, alias = 'COUNT(*)', 'count'
+      else:
+        if not measure:
+          return None
+        select, alias = f'{agg.upper()}({measure})', f'{"total" if agg == "sum" else "avg"}_{measure}'
+      if group:
+        expr, name, is_time = group
+        order_by = name if is_time else f'{alias} DESC'
+        select_group = expr if expr == name else f'{expr} AS {name}'
+        sql = f'SELECT {select_group}, {select} AS {alias} FROM {table}{where} GROUP BY {name} ORDER BY {order_by}'
+        return sql, f'group_{agg}'
+      return f'SELECT {select} AS {alias} FROM {table}{where}', agg
+
+    if group:
+      return None
+    if order:
+      if not measure:
+        return None
+      return f'SELECT * FROM {table}{where} ORDER BY {measure} {order} LIMIT {limit or 1}', 'top_n'
+    if measure:
+      return None
+    if limit:
+      return f'SELECT * FROM {table}{where} LIMIT {limit}', 'top_n'
+    return f'SELECT * FROM {table}{where}', 'filter' if filters else 'list'
+
+  def match(self, question: str) -> Optional[IntentMatch]:
+    """
+    匹配问题，命中模板时返回生成的SQL
+
+    Args:
+      question: 自然语言问题
+
+    Returns:
+      匹配结果，未命中或置信度低于阈值时返回None
+    """
+    result = self._match(question)
+    if result is None:
+      INTENT_MATCHES.inc(result='miss', intent='none')
+    else:
+      INTENT_MATCHES.inc(result='hit', intent=result.intent)
+    return result
+
+  def _match(self, question: str) -> Optional[IntentMatch]:
+    question = question.strip()
+    if not question or any(word in question for word in UNSUPPORTED_WORDS):
+      return None
+
+    lexicon = self._get_lexicon()
+    tokens, covered, total = self._tokenize(question, lexicon)
+    confidence = covered / total if total else 0.0
+    if confidence < self.threshold:
+      return None
+
+    table = self._resolve_table(tokens, lexicon)
+    if table is None:
+      return None
+
+    meanings = []
+    texts = []
+    previous = None
+    for token in tokens:
+      meaning = self._choose(token, table, previous)
+      if meaning is None:
+        return None
+      meanings.append(meaning)
+      texts.append(token['text'])
+      if meaning[0] != 'filler':
+        previous = meaning
+
+    built = self._build_sql(table, meanings, texts, lexicon)
+    if built is None:
+      return None
+    sql, intent = built
+    return IntentMatch(sql, intent, confidence)
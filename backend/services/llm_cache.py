@@ -0,0 +1,122 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from services.metrics_service import metrics
+from config import Config
+
+LLM_CACHE_REQUESTS = metrics.counter(
+  'aireport_llm_cache_requests_total',
+  '大模型响应缓存查询次数',
+  labelnames=('namespace', 'result'),
+)
+
+def make_cache_key(*parts: str) -> str:
+  """由多个部分生成缓存键"""
+  digest = hashlib.sha256()
+  for part in parts:
+    digest.update(part.encode('utf-8'))
+    digest.update(b'\x00')
+  return digest.hexdigest()
+
+class LLMResponseCache:
+  """
+  大模型响应缓存
+
+  内存中为LRU缓存，同时写入SQLite文件以便重启后继续使用。条目在TTL后过期；
+  内存按条目数淘汰最久未使用的条目，磁盘定期清理过期条目并按写入时间淘汰最旧的条目。
+  """
+
+  def __init__(self, path: str, ttl: float = 3600, max_entries: int = 1000, max_disk_entries: int = 10000):
+    self.path = path
+    self.ttl = ttl
+    self.max_entries = max_entries
+    self.max_disk_entries = max_disk_entries
+    self._memory = OrderedDict()
+    self._lock = threading.Lock()
+    self._writes = 0
+
+    cache_dir = os.path.dirname(path)
+    if cache_dir and not os.path.exists(cache_dir):
+      os.makedirs(cache_dir, exist_ok=True)
+    self._connection = sqlite3.connect(path, check_same_thread=False)
+    self._connection.execute("""
+      CREATE TABLE IF NOT EXISTS llm_cache (
+        cache_key TEXT PRIMARY KEY,
+        namespace TEXT NOT NULL,
+        response TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        expires_at REAL NOT NULL
+      )
+    """)
+    self._connection.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_expires_at ON llm_cache(expires_at)')
+    self._connection.commit()
+
+  @classmethod
+  def from_config(cls) -> 'LLMResponseCache':
+    return cls(Config.LLM_CACHE_PATH, Config.LLM_CACHE_TTL, Config.LLM_CACHE_MAX_ENTRIES, Config.LLM_CACHE_MAX_DISK_ENTRIES)
+
+  def get(self, key: str, namespace: str = 'default') -> Optional[str]:
+    """获取缓存的响应，未命中或已过期时返回None"""
+    now = time.time()
+    with self._lock:
+      entry = self._memory.get(key)
+      if entry is not None:
+        response, expires_at = entry
+        if expires_at > now:
+          self._memory.move_to_end(key)
+          LLM_CACHE_REQUESTS.inc(namespace=namespace, result='memory_hit')
+          return response
+        del self._memory[key]
+
+      row = self._connection.execute(
+        'SELECT response, expires_at FROM llm_cache WHERE cache_key = ? AND expires_at > ?',
+        (key, now),
+      ).fetchone()
+      if row is None:
+        LLM_CACHE_REQUESTS.inc(namespace=namespace, result='miss')
+        return None
+      self._remember(key, row[0], row[1])
+    LLM_CACHE_REQUESTS.inc(namespace=namespace, result='disk_hit')
+    return row[0]
+
+  def set(self, key: str, response: str, namespace: str = 'default'):
+    """写入缓存"""
+    now = time.time()
+    expires_at = now + self.ttl
+    with self._lock:
+      self._remember(key, response, expires_at)
+      self._connection.execute(
+        'INSERT OR REPLACE INTO llm_cache (cache_key, namespace, response, created_at, expires_at) VALUES (?, ?, ?, ?, ?)',
+        (key, namespace, response, now, expires_at),
+      )
+      self._writes += 1
+      # 每写入一定次数清理一次磁盘
+      if self._writes % 100 == 0:
+        self._prune(now)
+      self._connection.commit()
+
+  def _remember(self, key: str, response: str, expires_at: float):
+    self._memory[key] = (response, expires_at)
+    self._memory.move_to_end(key)
+    while len(self._memory) > self.max_entries:
+      self._memory.popitem(last=False)
+
+  def _prune(self, now: float):
+    """删除过期条目，并将磁盘条目数限制在上限以内"""
+    self._connection.execute('DELETE FROM llm_cache WHERE expires_at <= ?', (now,))
+    self._connection.execute("""
+      DELETE FROM llm_cache WHERE cache_key IN (
+        SELECT cache_key FROM llm_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?
+      )
+    """, (self.max_disk_entries,))
+
+  def clear(self):
+    """清空缓存"""
+    with self._lock:
+      self._memory.clear()
+      self._connection.execute('DELETE FROM llm_cache')
+      self._connection.commit()
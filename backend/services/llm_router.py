@@ -0,0 +1,300 @@
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, FIRST_COMPLETED, wait
+from typing import Dict, List, Any, Optional
+import requests
+from services.metrics_service import metrics
+from config import Config
+
+LLM_REQUESTS = metrics.counter(
+  'aireport_llm_requests_total',
+  '大模型请求次数',
+  labelnames=('provider', 'outcome'),
+)
+LLM_LATENCY = metrics.histogram(
+  'aireport_llm_request_duration_seconds',
+  '大模型请求耗时（秒）',
+  labelnames=('provider',),
+)
+LLM_HEDGES = metrics.counter(
+  'aireport_llm_hedged_requests_total',
+  '因主提供商响应慢而发出的对冲请求次数',
+  labelnames=('provider',),
+)
+LLM_CIRCUIT_OPEN = metrics.gauge(
+  'aireport_llm_circuit_open',
+  '提供商熔断状态（1为熔断中）',
+  labelnames=('provider',),
+)
+
+class LLMProvider:
+  """OpenAI兼容的大模型提供商"""
+
+  def __init__(self, name: str, base_url: str, api_key: str, model: str, timeout: float = 30):
+    self.name = name
+    self.base_url = base_url.rstrip('/')
+    self.api_key = api_key
+    self.model = model
+    self.timeout = timeout
+
+  def _post(self, url: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    headers = {
+      'Authorization': f'Bearer {self.api_key}',
+      'Content-Type': 'application/json',
+    }
+    try:
+      response = requests.post(url, headers=headers, json=data, timeout=self.timeout)
+      response.raise_for_status()
+      return response.json()
+    except requests.exceptions.RequestException as e:
+      raise Exception(f'调用{self.name}失败: {str(e)}')
+
+  def complete(self, messages: List[Dict[str, str]]) -> str:
+    """发送对话请求，返回回答文本"""
+    result = self._post(f'{self.base_url}/chat/completions', {
+      'model': self.model,
+      'messages': messages,
+      'temperature': Config.OPENAI_TEMPERATURE,
+      'max_tokens': Config.OPENAI_MAX_TOKENS,
+    })
+    if 'choices' in result and len(result['choices']) > 0:
+      return result['choices'][0]['message']['content'].strip()
+    raise Exception(f'{self.name}返回格式异常')
+
+class QwenProvider(LLMProvider):
+  """通义千问（DashScope原生接口）"""
+
+  def complete(self, messages: List[Dict[str, str]]) -> str:
+    result = self._post(f'{self.base_url}/services/aigc/text-generation/generation', {
+      'model': self.model,
+      'input': {'messages': messages},
+      'parameters': {
+        'temperature': Config.OPENAI_TEMPERATURE,
+        'max_tokens': Config.OPENAI_MAX_TOKENS,
+      },
+    })
+    if 'output' in result and result['output'].get('choices'):
+      return result['output']['choices'][0]['message']['content'].strip()
+    raise Exception(f'{self.name}返回格式异常')
+
+class ProviderStats:
+  """提供商的延迟统计和熔断状态"""
+
+  def __init__(self, window: int = 100):
+    self.ewma_ms = None
+    self.latencies = deque(maxlen=window)
+    self.successes = 0
+    self.failures = 0
+    self.consecutive_failures = 0
+    self.opened_at = None
+    self.probing = False
+    self.last_error = None
+
+  def p95_ms(self) -> Optional[float]:
+    if not self.latencies:
+      return None
+    ordered = sorted(self.latencies)
+    return ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)]
+
+class LLMRouter:
+  """
+  多提供商大模型路由
+
+  - 按近期延迟的EWMA选择提供商，未测量过的提供商按配置顺序排在已测量的提供商之后
+  - 对冲请求：首选提供商在其p95延迟内未返回时，向下一个提供商发出同样的请求，取先返回的结果
+  - 熔断：连续失败达到阈值后暂停使用，冷却后放行一个探测请求
+  - 失败时依次回退到其他提供商
+  """
+
+  def __init__(self, providers: List[LLMProvider], hedge_enabled: bool = None, hedge_delay_ms: float = None,
+               hedge_min_samples: int = None, failure_threshold: int = None, cooldown: float = None,
+               ewma_alpha: float = 0.3):
+    self.providers = providers
+    self.hedge_enabled = Config.LLM_HEDGE_ENABLED if hedge_enabled is None else hedge_enabled
+    self.hedge_delay_ms = Config.LLM_HEDGE_DELAY_MS if hedge_delay_ms is None else hedge_delay_ms
+    self.hedge_min_samples = Config.LLM_HEDGE_MIN_SAMPLES if hedge_min_samples is None else hedge_min_samples
+    self.failure_threshold = Config.LLM_CIRCUIT_FAILURE_THRESHOLD if failure_threshold is None else failure_threshold
+    self.cooldown = Config.LLM_CIRCUIT_COOLDOWN if cooldown is None else cooldown
+    self.ewma_alpha = ewma_alpha
+    self._stats = {provider.name: ProviderStats() for provider in providers}
+    self._lock = threading.Lock()
+
+  @classmethod
+  def from_config(cls) -> 'LLMRouter':
+    """根据配置创建路由：LLM_PROVIDER 指定的提供商排在最前，其次是其他已配置密钥的提供商和额外提供商"""
+    providers = []
+    if Config.OPENAI_API_KEY:
+      providers.append(LLMProvider('openai', Config.OPENAI_BASE_URL, Config.OPENAI_API_KEY, Config.OPENAI_MODEL))
+    if Config.DASHSCOPE_API_KEY:
+      providers.append(QwenProvider('qwen', Config.DASHSCOPE_BASE_URL, Config.DASHSCOPE_API_KEY, Config.QWEN_MODEL))
+    primary = Config.LLM_PROVIDER.lower()
+    providers.sort(key=lambda provider: provider.name != primary)
+
+    for item in json.loads(Config.LLM_EXTRA_PROVIDERS or '[]'):
+      providers.append(LLMProvider(
+        item['name'],
+        item['base_url'],
+        item.get('api_key', ''),
+        item.get('model', Config.OPENAI_MODEL),
+        item.get('timeout', 30),
+      ))
+    return cls(providers)
+
+  def _available(self, provider: LLMProvider, now: float) -> bool:
+    """熔断器检查：未熔断，或冷却已结束且没有进行中的探测请求"""
+    stats = self._stats[provider.name]
+    if stats.opened_at is None:
+      return True
+    return now - stats.opened_at >= self.cooldown and not stats.probing
+
+  def _acquire(self, provider: LLMProvider) -> bool:
+    """发出请求前再次检查熔断器，熔断中的提供商只放行一个探测请求"""
+    with self._lock:
+      if not self._available(provider, time.monotonic()):
+        return False
+      stats = self._stats[provider.name]
+      if stats.opened_at is not None:
+        stats.probing = True
+      return True
+
+  def _ranked(self) -> List[LLMProvider]:
+    """可用的提供商，按EWMA延迟从低到高排序，未测量过的按配置顺序排在最后"""
+    now = time.monotonic()
+    with self._lock:
+      available = [provider for provider in self.providers if self._available(provider, now)]
+      order = {provider.name: index for index, provider in enumerate(self.providers)}
+      return sorted(available, key=lambda p: (
+        self._stats[p.name].ewma_ms is None,
+        self._stats[p.name].ewma_ms or 0.0,
+        order[p.name],
+      ))
+
+  def _hedge_delay(self, provider: LLMProvider) -> float:
+    """对冲等待时间（秒）：样本足够时使用该提供商的p95延迟"""
+    stats = self._stats[provider.name]
+    with self._lock:
+      p95 = stats.p95_ms() if len(stats.latencies) >= self.hedge_min_samples else None
+    return (p95 if p95 is not None else self.hedge_delay_ms) / 1000
+
+  def _record(self, provider: LLMProvider, elapsed: float, error: Exception = None):
+    stats = self._stats[provider.name]
+    with self._lock:
+      stats.probing = False
+      if error is None:
+        latency_ms = elapsed * 1000
+        stats.successes += 1
+        stats.consecutive_failures = 0
+        stats.opened_at = None
+        stats.latencies.append(latency_ms)
+        if stats.ewma_ms is None:
+          stats.ewma_ms = latency_ms
+        else:
+          stats.ewma_ms = self.ewma_alpha * latency_ms + (1 - self.ewma_alpha) * stats.ewma_ms
+      else:
+        stats.failures += 1
+        stats.consecutive_failures += 1
+        stats.last_error = str(error)
+        if stats.consecutive_failures >= self.failure_threshold:
+          stats.opened_at = time.monotonic()
+      circuit_open = stats.opened_at is not None
+    LLM_REQUESTS.inc(provider=provider.name, outcome='success' if error is None else 'error')
+    LLM_LATENCY.observe(elapsed, provider=provider.name)
+    LLM_CIRCUIT_OPEN.set(1 if circuit_open else 0, provider=provider.name)
+
+  def _call(self, provider: LLMProvider, messages: List[Dict[str, str]]) -> str:
+    start = time.perf_counter()
+    try:
+      content = provider.complete(messages)
+    except Exception as e:
+      self._record(provider, time.perf_counter() - start, e)
+      raise
+    self._record(provider, time.perf_counter() - start)
+    return content
+
+  def _start(self, provider: LLMProvider, messages: List[Dict[str, str]]) -> Future:
+    """
+    在单独的线程中调用提供商，立即开始，不在线程池中排队（排队时间会被计入对冲等待时间）
+
+    被对冲请求淘汰的调用仍在后台完成，用于更新统计。
+    """
+    future = Future()
+
+    def run():
+      try:
+        future.set_result(self._call(provider, messages))
+      except Exception as e:
+        future.set_exception(e)
+
+    threading.Thread(target=run, name=f'llm-{provider.name}', daemon=True).start()
+    return future
+
+  def complete(self, messages: List[Dict[str, str]]) -> str:
+    """
+    发送对话请求，返回最先成功的回答
+
+    Raises:
+      Exception: 没有可用的提供商，或所有提供商都失败
+    """
+    candidates = self._ranked()
+    if not candidates:
+      if not self.providers:
+        raise Exception('未配置可用的大模型提供商，请设置OPENAI_API_KEY或DASHSCOPE_API_KEY')
+      raise Exception('所有大模型提供商均处于熔断状态，请稍后重试')
+
+    pending = {}
+    errors = []
+
+    def launch() -> Optional[LLMProvider]:
+      while candidates:
+        provider = candidates.pop(0)
+        if self._acquire(provider):
+          pending[self._start(provider, messages)] = provider
+          return provider
+      return None
+
+    primary = launch()
+    if primary is None:
+      raise Exception('所有大模型提供商均处于熔断状态，请稍后重试')
+    timeout = self._hedge_delay(primary) if self.hedge_enabled else None
+    while pending:
+      done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+      if not done:
+        # 首选提供商超过p95仍未返回，发出对冲请求
+        hedge = launch()
+        if hedge is not None:
+          LLM_HEDGES.inc(provider=hedge.name)
+        timeout = None
+        continue
+      for future in done:
+        provider = pending.pop(future)
+        try:
+          return future.result()
+        except Exception as e:
+          errors.append(f'{provider.name}: {str(e)}')
+          # 失败时回退到下一个提供商
+          launch()
+    raise Exception('所有大模型提供商调用失败: ' + '; '.join(errors))
+
+  def stats(self) -> List[Dict[str, Any]]:
+    """各提供商的统计信息"""
+    now = time.monotonic()
+    result = []
+    with self._lock:
+      for provider in self.providers:
+        stats = self._stats[provider.name]
+        p95 = stats.p95_ms()
+        result.append({
+          'name': provider.name,
+          'model': provider.model,
+          'ewmaMs': round(stats.ewma_ms, 1) if stats.ewma_ms is not None else None,
+          'p95Ms': round(p95, 1) if p95 is not None else None,
+          'successes': stats.successes,
+          'failures': stats.failures,
+          'consecutiveFailures': stats.consecutive_failures,
+          'circuitOpen': stats.opened_at is not None,
+          'circuitRetryIn': round(max(self.cooldown - (now - stats.opened_at), 0), 1) if stats.opened_at is not None else None,
+          'lastError': stats.last_error,
+        })
+    return result
@@ -0,0 +1,237 @@
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Any, Optional, Tuple
+
+# 默认延迟直方图分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: Dict[str, str] = None) -> str:
+  """格式化Prometheus标签"""
+  pairs = list(zip(labelnames, values))
+  if extra:
+    pairs.extend(extra.items())
+  if not pairs:
+    return ''
+  escaped = []
+  for name, value in pairs:
+    value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    escaped.append(f'{name}="{value}"')
+  return '{' + ','.join(escaped) + '}'
+
+def _format_value(value: float) -> str:
+  """格式化指标值"""
+  if value == float('inf'):
+    return '+Inf'
+  if float(value).is_integer():
+    return str(int(value))
+  return repr(float(value))
+
+class _Metric:
+  """指标基类，按标签值分别存储"""
+  metric_type = ''
+
+  def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+    self.name = name
+    self.documentation = documentation
+    self.labelnames = tuple(labelnames)
+    self._lock = threading.Lock()
+    self._values = {}
+
+  def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+    """根据标签生成存储键"""
+    if set(labels) != set(self.labelnames):
+      raise Exception(f'指标 {self.name} 的标签必须为: {", ".join(self.labelnames)}')
+    return tuple(str(labels[name]) for name in self.labelnames)
+
+  def _render_samples(self) -> List[str]:
+    raise NotImplementedError
+
+  def render(self) -> List[str]:
+    """生成Prometheus文本格式"""
+    lines = [
+      f'# HELP {self.name} {self.documentation}',
+      f'# TYPE {self.name} {self.metric_type}',
+    ]
+    lines.extend(self._render_samples())
+    return lines
+
+class Counter(_Metric):
+  """计数器"""
+  metric_type = 'counter'
+
+  def inc(self, amount: float = 1, **labels):
+    """计数增加"""
+    key = self._key(labels)
+    with self._lock:
+      self._values[key] = self._values.get(key, 0) + amount
+
+  def value(self, **labels) -> float:
+    """获取当前计数"""
+    return self._values.get(self._key(labels), 0)
+
+  def _render_samples(self) -> List[str]:
+    with self._lock:
+      items = sorted(self._values.items())
+    return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in items]
+
+class Gauge(_Metric):
+  """瞬时值"""
+  metric_type = 'gauge'
+
+  def set(self, value: float, **labels):
+    """设置当前值"""
+    key = self._key(labels)
+    with self._lock:
+      self._values[key] = value
+
+  def value(self, **labels) -> float:
+    """获取当前值"""
+    return self._values.get(self._key(labels), 0)
+
+  def _render_samples(self) -> List[str]:
+    with self._lock:
+      items = sorted(self._values.items())
+    return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in items]
+
+class Histogram(_Metric):
+  """直方图，用于记录延迟分布"""
+  metric_type = 'histogram'
+
+  def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+    super().__init__(name, documentation, labelnames)
+    self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+  def observe(self, value: float, **labels):
+    """记录一次观测值"""
+    key = self._key(labels)
+    with self._lock:
+      state = self._values.get(key)
+      if state is None:
+        state = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+        self._values[key] = state
+      for i, bound in enumerate(self.buckets):
+        if value <= bound:
+          state['buckets'][i] += 1
+          break
+      state['sum'] += value
+      state['count'] += 1
+
+  def _render_samples(self) -> List[str]:
+    lines = []
+    with self._lock:
+      items = sorted((key, dict(state, buckets=list(state['buckets']))) for key, state in self._values.items())
+    for key, state in items:
+      cumulative = 0
+      for bound, count in zip(self.buckets, state['buckets']):
+        cumulative += count
+        labels = _format_labels(self.labelnames, key, {'le': _format_value(bound)})
+        lines.append(f'{self.name}_bucket{labels} {cumulative}')
+      labels = _format_labels(self.labelnames, key)
+      lines.append(f'{self.name}_sum{labels} {_format_value(state["sum"])}')
+      lines.append(f'{self.name}_count{labels} {state["count"]}')
+    return lines
+
+class MetricsRegistry:
+  """指标注册表，按名称获取或创建指标"""
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._metrics = {}
+
+  def _get_or_create(self, cls, name: str, *args, **kwargs):
+    with self._lock:
+      metric = self._metrics.get(name)
+      if metric is None:
+        metric = cls(name, *args, **kwargs)
+        self._metrics[name] = metric
+      elif not isinstance(metric, cls):
+        raise Exception(f'指标 {name} 已注册为 {metric.metric_type}')
+      return metric
+
+  def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+    """获取或创建计数器"""
+    return self._get_or_create(Counter, name, documentation, labelnames)
+
+  def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+    """获取或创建瞬时值指标"""
+    return self._get_or_create(Gauge, name, documentation, labelnames)
+
+  def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+    """获取或创建直方图"""
+    return self._get_or_create(Histogram, name, documentation, labelnames, buckets)
+
+  def render(self) -> str:
+    """生成Prometheus文本格式的全部指标"""
+    with self._lock:
+      metrics = [self._metrics[name] for name in sorted(self._metrics)]
+    lines = []
+    for metric in metrics:
+      lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+# 全局指标注册表
+metrics = MetricsRegistry()
+
+STAGE_DURATION = metrics.histogram(
+  'aireport_stage_duration_seconds',
+  '请求各处理阶段耗时（秒）',
+  labelnames=('stage',),
+)
+
+class Trace:
+  """单个请求的追踪信息，记录各阶段耗时"""
+
+  def __init__(self, request_id: str = None):
+    self.request_id = request_id or uuid.uuid4().hex
+    self.start_time = time.perf_counter()
+    self.spans = []
+    self._lock = threading.Lock()
+
+  def add_span(self, name: str, duration: float):
+    """记录一个阶段的耗时（秒）"""
+    with self._lock:
+      self.spans.append((name, duration))
+
+  def timings(self) -> Dict[str, float]:
+    """各阶段耗时（毫秒），同名阶段累加"""
+    result = {}
+    with self._lock:
+      spans = list(self.spans)
+    for name, duration in spans:
+      result[name] = result.get(name, 0.0) + duration * 1000
+    result = {name: round(value, 2) for name, value in result.items()}
+    result['total'] = round((time.perf_counter() - self.start_time) * 1000, 2)
+    return result
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar('current_trace', default=None)
+
+def start_trace(request_id: str = None) -> Trace:
+  """开始追踪当前请求"""
+  trace = Trace(request_id)
+  _current_trace.set(trace)
+  return trace
+
+def current_trace() -> Optional[Trace]:
+  """获取当前请求的追踪信息"""
+  return _current_trace.get()
+
+def end_trace():
+  """结束追踪当前请求"""
+  _current_trace.set(None)
+
+@contextmanager
+def span(name: str):
+  """记录一个处理阶段的耗时，写入直方图和当前请求的追踪信息"""
+  start = time.perf_counter()
+  try:
+    yield
+  finally:
+    duration = time.perf_counter() - start
+    STAGE_DURATION.observe(duration, stage=name)
+    trace = _current_trace.get()
+    if trace is not None:
+      trace.add_span(name, duration)
@@ -1,20 +1,46 @@
 import json
 import re
 from typing import Dict, List, Any, Optional
-import requests
 from services.database_service import DatabaseService
+from services.metrics_service import span
+from services.schema_registry import SchemaRegistry, SchemaSnapshot
+from services.llm_router import LLMRouter
+from services.intent_matcher import IntentMatcher
+from services.sql_template_cache import SQLTemplateCache, normalize_question
+from services.single_flight import SingleFlight
 from config import Config
 
 class NL2SQLService:
   """NL2SQL转换服务 - 基于大模型"""
   
-  def __init__(self, db_service: DatabaseService):
+  def __init__(self, db_service: DatabaseService, schema_registry: SchemaRegistry = None, llm_router: LLMRouter = None):
     self.db_service = db_service
     self.config = Config
-    self.schema_info = self._load_schema_info()
+    self.schema_registry = schema_registry or SchemaRegistry(db_service)
+    self.llm_router = llm_router or LLMRouter.from_config()
+    self.intent_matcher = IntentMatcher(db_service, self.schema_registry) if self.config.INTENT_MATCH_ENABLED else None
+    self.template_cache = SQLTemplateCache(db_service, self.schema_registry) if self.config.SQL_TEMPLATE_ENABLED else None
+    # (schema快照, schema信息, 系统提示词)，快照变化时整体替换
+    self._prompt_state = None
+    self._single_flight = SingleFlight('nl2sql', self.config.SINGLE_FLIGHT_ENABLED)
   
-  def _load_schema_info(self) -> Dict[str, Any]:
-    """加载数据库schema信息，用于构建prompt"""
+  def _get_prompt_state(self):
+    """获取与当前schema快照对应的schema信息和系统提示词"""
+    snapshot = self.schema_registry.current()
+    state = self._prompt_state
+    if state is None or state[0] is not snapshot:
+      schema_info = self._load_schema_info(snapshot)
+      state = (snapshot, schema_info, self._build_system_prompt(schema_info))
+      self._prompt_state = state
+    return state
+  
+  @property
+  def schema_info(self) -> Dict[str, Any]:
+    """当前的schema信息"""
+    return self._get_prompt_state()[1]
+  
+  def _load_schema_info(self, snapshot: SchemaSnapshot) -> Dict[str, Any]:
+    """根据schema快照构建schema信息，用于构建prompt"""
     schema = {
       'tables': [],
       'table_mapping': {},
@@ -22,63 +48,36 @@ class NL2SQLService:
     }
     
     try:
-      # 获取所有表
-      tables = self.db_service.get_tables()
-      for table in tables:
-        table_name = table.get('name', '')
-        natural_name = table.get('naturalName', '')
-        description = table.get('description', '')
+      # 每个物理表只加载一次，别名已归并
+      schema['tables'] = snapshot.tables
+      for table in schema['tables']:
+        table_name = table['db_name']
         
-        if table_name:
-          table_info = {
-            'db_name': table_name,
-            'natural_name': natural_name or table_name,
-            'description': description,
-            'columns': [],
-          }
-          
-          # 获取表的字段信息
-          columns = self.db_service.get_table_columns(table_name)
-          for col in columns:
-            col_name = col.get('name', '')
-            col_natural_name = col.get('naturalName', '')
-            col_type = col.get('type', '')
-            col_desc = col.get('description', '')
-            
-            if col_name:
-              column_info = {
-                'db_name': col_name,
-                'natural_name': col_natural_name or col_name,
-                'type': col_type,
-                'description': col_desc,
-              }
-              table_info['columns'].append(column_info)
-              
-              # 建立映射
-              if col_natural_name:
-                if table_name not in schema['column_mapping']:
-                  schema['column_mapping'][table_name] = {}
-                schema['column_mapping'][table_name][col_natural_name] = col_name
-          
-          schema['tables'].append(table_info)
-          
-          # 建立表名映射
-          if natural_name:
-            schema['table_mapping'][natural_name] = table_name
-          schema['table_mapping'][table_name] = table_name
+        # 建立表名映射
+        schema['table_mapping'][table_name] = table_name
+        for alias in table['aliases']:
+          schema['table_mapping'][alias] = table_name
+        
+        # 建立字段映射
+        column_mapping = {}
+        for col in table['columns']:
+          for alias in col['aliases']:
+            column_mapping[alias] = col['db_name']
+        if column_mapping:
+          schema['column_mapping'][table_name] = column_mapping
     except Exception as e:
       print(f'加载schema信息失败: {str(e)}')
     
     return schema
   
-  def _build_schema_prompt(self) -> str:
-    """构建数据库schema的prompt描述"""
+  def _build_schema_prompt(self, schema_info: Dict[str, Any]) -> str:
+    """构建数据库schema的prompt描述，每个表和字段只出现一次，别名合并显示"""
     prompt_parts = ["数据库表结构信息：\n"]
     
-    for table in self.schema_info['tables']:
+    for table in schema_info['tables']:
       table_desc = f"表名: {table['db_name']}"
-      if table['natural_name'] != table['db_name']:
-        table_desc += f" (自然语言名称: {table['natural_name']})"
+      if table['aliases']:
+        table_desc += f" (别名: {'、'.join(table['aliases'])})"
       if table['description']:
         table_desc += f" - {table['description']}"
       prompt_parts.append(table_desc)
@@ -86,8 +85,8 @@ class NL2SQLService:
       prompt_parts.append("字段列表:")
       for col in table['columns']:
         col_desc = f"  - {col['db_name']}"
-        if col['natural_name'] != col['db_name']:
-          col_desc += f" (自然语言名称: {col['natural_name']})"
+        if col['aliases']:
+          col_desc += f" (别名: {'、'.join(col['aliases'])})"
         if col['type']:
           col_desc += f" 类型: {col['type']}"
         if col['description']:
@@ -97,9 +96,9 @@ class NL2SQLService:
     
     return "\n".join(prompt_parts)
   
-  def _build_system_prompt(self) -> str:
+  def _build_system_prompt(self, schema_info: Dict[str, Any]) -> str:
     """构建系统提示词"""
-    schema_text = self._build_schema_prompt()
+    schema_text = self._build_schema_prompt(schema_info)
     
     return f"""你是一个专业的SQL生成助手。你的任务是根据用户的自然语言查询，生成准确的SQLite SQL语句。
 
@@ -119,112 +118,25 @@ class NL2SQLService:
 
 请根据用户的自然语言查询，生成对应的SQL语句。"""
   
-  def _call_openai_api(self, user_query: str) -> str:
-    """调用OpenAI API"""
-    if not self.config.OPENAI_API_KEY:
-      raise Exception('未配置OPENAI_API_KEY，请在环境变量中设置')
-    
-    headers = {
-      'Authorization': f'Bearer {self.config.OPENAI_API_KEY}',
-      'Content-Type': 'application/json',
-    }
-    
-    data = {
-      'model': self.config.OPENAI_MODEL,
-      'messages': [
-        {'role': 'system', 'content': self._build_system_prompt()},
-        {'role': 'user', 'content': user_query},
-      ],
-      'temperature': self.config.OPENAI_TEMPERATURE,
-      'max_tokens': self.config.OPENAI_MAX_TOKENS,
-    }
-    
-    try:
-      response = requests.post(
-        f'{self.config.OPENAI_BASE_URL}/chat/completions',
-        headers=headers,
-        json=data,
-        timeout=30,
-      )
-      response.raise_for_status()
-      result = response.json()
-      
-      if 'choices' in result and len(result['choices']) > 0:
-        sql = result['choices'][0]['message']['content'].strip()
-        # 清理可能的markdown代码块
-        sql = re.sub(r'^```sql\s*', '', sql, flags=re.IGNORECASE)
-        sql = re.sub(r'^```\s*', '', sql)
-        sql = re.sub(r'\s*```\s*$', '', sql)
-        return sql.strip()
-      else:
-        raise Exception('API返回格式异常')
-    except requests.exceptions.RequestException as e:
-      raise Exception(f'调用OpenAI API失败: {str(e)}')
-  
-  def _call_qwen_api(self, user_query: str) -> str:
-    """调用通义千问API"""
-    if not self.config.DASHSCOPE_API_KEY:
-      raise Exception('未配置DASHSCOPE_API_KEY，请在环境变量中设置')
-    
-    headers = {
-      'Authorization': f'Bearer {self.config.DASHSCOPE_API_KEY}',
-      'Content-Type': 'application/json',
-    }
-    
-    data = {
-      'model': self.config.QWEN_MODEL,
-      'input': {
-        'messages': [
-          {'role': 'system', 'content': self._build_system_prompt()},
-          {'role': 'user', 'content': user_query},
-        ],
-      },
-      'parameters': {
-        'temperature': self.config.OPENAI_TEMPERATURE,
-        'max_tokens': self.config.OPENAI_MAX_TOKENS,
-      },
-    }
-    
-    try:
-      response = requests.post(
-        'https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation',
-        headers=headers,
-        json=data,
-        timeout=30,
-      )
-      response.raise_for_status()
-      result = response.json()
-      
-      if 'output' in result and 'choices' in result['output']:
-        if len(result['output']['choices']) > 0:
-          sql = result['output']['choices'][0]['message']['content'].strip()
-          # 清理可能的markdown代码块
-          sql = re.sub(r'^```sql\s*', '', sql, flags=re.IGNORECASE)
-          sql = re.sub(r'^```\s*', '', sql)
-          sql = re.sub(r'\s*```\s*$', '', sql)
-          return sql.strip()
-      raise Exception('API返回格式异常')
-    except requests.exceptions.RequestException as e:
-      raise Exception(f'调用通义千问API失败: {str(e)}')
-  
   def _call_llm_api(self, user_query: str) -> str:
-    """根据配置调用对应的大模型API"""
-    provider = self.config.LLM_PROVIDER.lower()
-    
-    if provider == 'openai':
-      return self._call_openai_api(user_query)
-    elif provider == 'qwen':
-      return self._call_qwen_api(user_query)
-    else:
-      raise Exception(f'不支持的大模型提供商: {provider}，支持: openai, qwen')
+    """通过大模型路由生成SQL"""
+    sql = self.llm_router.complete([
+      {'role': 'system', 'content': self._get_prompt_state()[2]},
+      {'role': 'user', 'content': user_query},
+    ])
+    # 清理可能的markdown代码块
+    sql = re.sub(r'^```sql\s*', '', sql, flags=re.IGNORECASE)
+    sql = re.sub(r'^```\s*', '', sql)
+    sql = re.sub(r'\s*```\s*$', '', sql)
+    return sql.strip()
   
   def _validate_sql(self, sql: str) -> None:
     """验证SQL安全性"""
     sql_upper = sql.upper().strip()
     
-    # 检查是否包含禁止的关键字
+    # 检查是否包含禁止的关键字（按单词匹配，避免误判created_at、updated_at等字段名）
     for keyword in self.config.FORBIDDEN_SQL_KEYWORDS:
-      if keyword in sql_upper:
+      if re.search(rf'\b{keyword}\b', sql_upper):
         raise Exception(f'生成的SQL包含禁止的关键字: {keyword}')
     
     # 检查是否以允许的关键字开头
@@ -242,13 +154,33 @@ class NL2SQLService:
     return sql.strip()
   
   def convert_to_sql(self, natural_language: str) -> str:
-    """将自然语言转换为SQL（使用大模型）"""
+    """将自然语言转换为SQL（常见模板类问题和已学习的SQL模板本地生成，其余使用大模型）"""
     if not natural_language or not natural_language.strip():
       raise Exception('自然语言查询不能为空')
     
+    # 相同问题的并发请求只转换一次（只调用一次大模型）
+    return self._single_flight.do(normalize_question(natural_language), lambda: self._convert_to_sql(natural_language))
+
+  def _convert_to_sql(self, natural_language: str) -> str:
     try:
-      # 调用大模型API生成SQL
-      sql = self._call_llm_api(natural_language.strip())
+      match = None
+      if self.intent_matcher is not None:
+        with span('nl2sql.intent'):
+          match = self.intent_matcher.match(natural_language)
+      
+      learn = False
+      if match is not None:
+        sql = match.sql
+      else:
+        sql = None
+        if self.template_cache is not None:
+          with span('nl2sql.template'):
+            sql = self.template_cache.lookup(natural_language)
+        if sql is None:
+          # 调用大模型API生成SQL
+          with span('nl2sql.llm'):
+            sql = self._call_llm_api(natural_language.strip())
+          learn = self.template_cache is not None
       
       # 验证SQL安全性
       self._validate_sql(sql)
@@ -256,6 +188,10 @@ class NL2SQLService:
       # 清理和规范化SQL
       sql = self._clean_sql(sql)
       
+      # 通过校验的大模型SQL用于学习模板
+      if learn:
+        self.template_cache.learn(natural_language, sql)
+      
       return sql
     except Exception as e:
       raise Exception(f'NL2SQL转换失败: {str(e)}')
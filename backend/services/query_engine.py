@@ -0,0 +1,303 @@
+import re
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, List, Any, Optional
+from services.metrics_service import metrics, span
+
+# 可选依赖：未安装时只使用SQLite执行
+try:
+  import duckdb
+except ImportError:
+  duckdb = None
+try:
+  import pandas as pd
+except ImportError:
+  pd = None
+
+ENGINE_QUERIES = metrics.counter(
+  'aireport_engine_queries_total',
+  '按执行引擎统计的分析查询数',
+  labelnames=('engine',),
+)
+ENGINE_FALLBACKS = metrics.counter(
+  'aireport_engine_fallback_total',
+  'DuckDB执行失败后改用SQLite执行的查询数',
+)
+DUCKDB_SYNCS = metrics.counter(
+  'aireport_duckdb_sync_total',
+  'DuckDB数据副本的同步次数',
+  labelnames=('status',),
+)
+DUCKDB_SYNC_DURATION = metrics.histogram(
+  'aireport_duckdb_sync_duration_seconds',
+  'DuckDB数据副本的同步耗时（秒）',
+)
+
+TABLE_PATTERN = re.compile(r'\b(?:FROM|JOIN)\s+"?(\w+)', re.IGNORECASE)
+AGGREGATE_PATTERN = re.compile(r'\b(?:SUM|AVG|COUNT|MIN|MAX)\s*\(', re.IGNORECASE)
+GROUP_BY_PATTERN = re.compile(r'\bGROUP\s+BY\b', re.IGNORECASE)
+ORDER_BY_PATTERN = re.compile(r'\bORDER\s+BY\b', re.IGNORECASE)
+SELECT_PATTERN = re.compile(r'\bSELECT\b', re.IGNORECASE)
+# 语句末尾的 GROUP BY 分组字段、HAVING 和 LIMIT
+GROUP_CLAUSE_PATTERN = re.compile(r'\bGROUP\s+BY\s+(.+?)\s*(\bHAVING\b.+?)?\s*(\bLIMIT\b.+?)?\s*;?\s*$', re.IGNORECASE | re.DOTALL)
+# 语句末尾的 GROUP BY 分组字段、HAVING、ORDER BY 排序字段和 LIMIT
+GROUP_ORDER_CLAUSE_PATTERN = re.compile(
+  r'\bGROUP\s+BY\s+(.+?)\s*(\bHAVING\b.+?)?\s*\bORDER\s+BY\s+(.+?)\s*(\bLIMIT\b.+?)?\s*;?\s*$',
+  re.IGNORECASE | re.DOTALL,
+)
+# strftime(格式, 字段) -> DuckDB的 strftime(时间, 格式)，只转换两者含义相同的格式符
+STRFTIME_PATTERN = re.compile(r"\bstrftime\s*\(\s*('(?:[^'%]|%[YmdHMS])*')\s*,\s*([\w.]+)\s*\)", re.IGNORECASE)
+# 在DuckDB中语义不同（整数除法、LIKE大小写、REAL精度等）或不支持的写法，包含时在SQLite上执行
+SQLITE_ONLY_PATTERN = re.compile(
+  r"\b(?:strftime|julianday|date|datetime|time|unixepoch|printf|instr|group_concat|total|typeof|"
+  r"random|randomblob|iif|char|hex|zeroblob)\s*\(|\b(?:LIKE|GLOB|REAL|ROWID)\b|/|\bLIMIT\s+\d+\s*,|"
+  # 转换为整数时SQLite截断小数（2.7 -> 2），DuckDB四舍五入（2.7 -> 3）
+  r"\bCAST\s*\(.*?\bAS\s+(?:INT|INTEGER|BIGINT)\b",
+  re.IGNORECASE | re.DOTALL,
+)
+
+def duckdb_sql(sql: str) -> Optional[str]:
+  """
+  把适合在DuckDB上执行的SQLite查询转换为DuckDB的写法
+
+  只转换聚合查询。SQLite的分组结果按分组字段有序而DuckDB无序：没有 ORDER BY 的分组查询按分组字段排序，
+  有 ORDER BY 的在排序字段之后加上分组字段，排序字段相同的行（及 LIMIT 截取的行）与SQLite一致
+  （只处理没有子查询的语句）；strftime 转换参数顺序，其余包含语义不同的函数或运算符时返回None。
+  """
+  if not AGGREGATE_PATTERN.search(sql):
+    return None
+  if GROUP_BY_PATTERN.search(sql):
+    if len(SELECT_PATTERN.findall(sql)) != 1:
+      return None
+    if ORDER_BY_PATTERN.search(sql):
+      match = GROUP_ORDER_CLAUSE_PATTERN.search(sql)
+      if match is None:
+        return None
+      keys, having, order, limit = match.group(1), match.group(2) or '', match.group(3), match.group(4) or ''
+      sql = f'{sql[:match.start()]}GROUP BY {keys} {having} ORDER BY {order}, {keys} {limit}'
+    else:
+      match = GROUP_CLAUSE_PATTERN.search(sql)
+      if match is None:
+        return None
+      keys, having, limit = match.group(1), match.group(2) or '', match.group(3) or ''
+      sql = f'{sql[:match.start()]}GROUP BY {keys} {having} ORDER BY {keys} {limit}'
+  # 可以转换的strftime去掉后再检查，剩下的strftime无法转换
+  if SQLITE_ONLY_PATTERN.search(STRFTIME_PATTERN.sub('NULL', sql)):
+    return None
+  translated = STRFTIME_PATTERN.sub(lambda m: f'strftime(CAST({m.group(2)} AS TIMESTAMP), {m.group(1)})', sql)
+  return translated.replace('%s', '?')
+
+def query_tables(sql: str) -> List[str]:
+  """查询中 FROM、JOIN 的表名"""
+  return list(dict.fromkeys(match.group(1) for match in TABLE_PATTERN.finditer(sql)))
+
+def _to_python(value: Any) -> Any:
+  """DuckDB返回的值转换为与SQLite一致的类型"""
+  if isinstance(value, Decimal):
+    return float(value)
+  if isinstance(value, (datetime, date)):
+    return str(value)
+  return value
+
+def _duckdb_type(declared: str) -> str:
+  """按SQLite的类型亲和性确定DuckDB列类型，日期仍按文本保存，与SQLite的查询结果一致"""
+  declared = (declared or '').upper()
+  if 'INT' in declared or 'BOOL' in declared:
+    return 'BIGINT'
+  if any(key in declared for key in ('REAL', 'FLOA', 'DOUB', 'DEC', 'NUM')):
+    return 'DOUBLE'
+  if 'BLOB' in declared:
+    return 'BLOB'
+  return 'VARCHAR'
+
+class QueryEngine(ABC):
+  """分析查询的执行引擎"""
+
+  name = ''
+  last_error = None
+
+  @abstractmethod
+  def execute(self, sql: str, params: tuple = None) -> List[Dict[str, Any]]:
+    """执行查询，返回字典列表"""
+
+  def status(self) -> Dict[str, Any]:
+    return {'name': self.name}
+
+  def close(self):
+    pass
+
+class SQLiteEngine(QueryEngine):
+  """在SQLite只读连接池（或只读副本）上执行"""
+
+  name = 'sqlite'
+
+  def __init__(self, db_service):
+    self.db_service = db_service
+
+  def execute(self, sql: str, params: tuple = None) -> List[Dict[str, Any]]:
+    with self.db_service.read_connection(sql) as connection:
+      return self.db_service._execute(connection, sql, params)
+
+class DuckDBEngine(QueryEngine):
+  """
+  在DuckDB上向量化、多线程执行聚合查询
+
+  两种数据来源：attach 模式通过DuckDB的sqlite扩展直接读取SQLite文件（使用只读副本时读取副本），
+  数据版本变化后重新挂载；copy 模式把分析表复制到内存中的DuckDB数据库，数据版本变化后在后台重新复制，
+  复制完成前查询在SQLite上执行。auto 模式优先使用attach，sqlite扩展不可用（如无法联网安装）时使用copy。
+  """
+
+  name = 'duckdb'
+
+  def __init__(self, db_service, mode: str = 'auto', threads: int = 0, sync_interval: float = 60,
+               skip_tables: re.Pattern = None):
+    if duckdb is None:
+      raise Exception('DuckDB引擎需要安装duckdb')
+    if mode not in ('auto', 'attach', 'copy'):
+      raise Exception(f'不支持的DuckDB模式: {mode}')
+    self.db_service = db_service
+    self.threads = threads
+    self.sync_interval = sync_interval
+    self.skip_tables = skip_tables
+    self.mode = mode
+    self.synced_at = None
+    self.last_error = None
+    # (DuckDB连接, 对应的数据版本)，整体替换，执行中的查询继续使用替换前的连接
+    self._state = None
+    self._lock = threading.Lock()
+    self._syncing = False
+    self._last_sync_start = 0.0
+
+    if mode in ('auto', 'attach'):
+      try:
+        self._attach()
+        self.mode = 'attach'
+      except Exception as e:
+        if mode == 'attach':
+          raise Exception(f'DuckDB无法挂载SQLite数据库: {str(e)}')
+        self.mode = 'copy'
+    if self.mode == 'copy':
+      self._start_sync()
+
+  def _source_path(self) -> str:
+    replica = self.db_service.replica
+    return replica.path if replica is not None else self.db_service.config.DB_PATH
+
+  def _connect(self):
+    connection = duckdb.connect(':memory:', config={'threads': self.threads} if self.threads else {})
+    # SQLite中NULL小于任何值：升序时在前，降序时在后
+    connection.execute("SET default_null_order = 'nulls_first_on_asc_last_on_desc'")
+    return connection
+
+  def _attach(self):
+    version = self.db_service.get_data_version()
+    connection = self._connect()
+    path = self._source_path().replace("'", "''")
+    connection.execute(f"ATTACH '{path}' AS source (TYPE SQLITE, READ_ONLY)")
+    connection.execute('USE source')
+    self._state = (connection, version)
+
+  def _copy_tables(self, connection, source: sqlite3.Connection):
+    tables = [row[0] for row in source.execute(
+      "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+    )]
+    for table in tables:
+      if self.skip_tables is not None and self.skip_tables.search(table):
+        continue
+      columns = [(row[1], _duckdb_type(row[2])) for row in source.execute(f'PRAGMA table_info("{table}")')]
+      definitions = ', '.join(f'"{name}" {kind}' for name, kind in columns)
+      connection.execute(f'CREATE TABLE "{table}" ({definitions})')
+      cursor = source.execute(f'SELECT * FROM "{table}"')
+      while True:
+        rows = cursor.fetchmany(100000)
+        if not rows:
+          break
+        chunk = pd.DataFrame.from_records(rows, columns=[name for name, _ in columns])
+        connection.register('chunk', chunk)
+        connection.execute(f'INSERT INTO "{table}" SELECT * FROM chunk')
+        connection.unregister('chunk')
+
+  def _sync(self):
+    """把SQLite中的分析表复制到新的内存DuckDB数据库，完成后替换"""
+    start = time.time()
+    try:
+      if pd is None:
+        raise Exception('DuckDB复制模式需要安装pandas')
+      version = self.db_service.get_data_version()
+      source = sqlite3.connect(f'file:{self._source_path()}?mode=ro', uri=True)
+      try:
+        connection = self._connect()
+        self._copy_tables(connection, source)
+      finally:
+        source.close()
+      self._state = (connection, version)
+      self.synced_at = time.time()
+      self.last_error = None
+      DUCKDB_SYNCS.inc(status='success')
+      DUCKDB_SYNC_DURATION.observe(time.time() - start)
+    except Exception as e:
+      self.last_error = str(e)
+      DUCKDB_SYNCS.inc(status='error')
+      print(f'DuckDB同步失败: {str(e)}')
+    finally:
+      with self._lock:
+        self._syncing = False
+
+  def _start_sync(self):
+    """在后台同步，同步进行中或距上次开始不足 sync_interval 秒时跳过"""
+    with self._lock:
+      if self._syncing or (self._last_sync_start and time.time() - self._last_sync_start < self.sync_interval):
+        return
+      self._syncing = True
+      self._last_sync_start = time.time()
+    threading.Thread(target=self._sync, name='duckdb-sync', daemon=True).start()
+
+  def ready(self) -> bool:
+    """DuckDB中的数据是否与当前数据版本一致（attach 模式下版本变化时重新挂载）"""
+    version = self.db_service.get_data_version()
+    state = self._state
+    if state is not None and state[1] == version:
+      return True
+    if self.mode == 'attach':
+      try:
+        with self._lock:
+          if self._state is None or self._state[1] != version:
+            self._attach()
+        return True
+      except Exception as e:
+        self.last_error = str(e)
+        return False
+    self._start_sync()
+    return False
+
+  def execute(self, sql: str, params: tuple = None) -> List[Dict[str, Any]]:
+    connection = self._state[0]
+    cursor = connection.cursor()
+    try:
+      with span('db.execute'):
+        cursor.execute(sql, list(params) if params else [])
+        rows = cursor.fetchall()
+        columns = [description[0] for description in cursor.description]
+      with span('db.convert'):
+        return [dict(zip(columns, (_to_python(value) for value in row))) for row in rows]
+    finally:
+      cursor.close()
+
+  def status(self) -> Dict[str, Any]:
+    return {
+      'name': self.name,
+      'mode': self.mode,
+      'ready': self._state is not None and self._state[1] == self.db_service.get_data_version(),
+      'syncedAt': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.synced_at)) if self.synced_at else None,
+      'lastError': self.last_error,
+    }
+
+  def close(self):
+    state = self._state
+    self._state = None
+    if state is not None:
+      state[0].close()
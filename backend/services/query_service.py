@@ -2,6 +2,7 @@ from typing import Dict, Any, List
 from services.database_service import DatabaseService
 from services.nl2sql_service import NL2SQLService
 from services.result_interpretation_service import ResultInterpretationService
+from services.metrics_service import span
 from config import Config
 
 class QueryService:
@@ -16,12 +17,15 @@ class QueryService:
     """执行自然语言查询"""
     try:
       # 转换为SQL
-      sql = self.nl2sql_service.convert_to_sql(natural_language)
+      with span('nl2sql'):
+        sql = self.nl2sql_service.convert_to_sql(natural_language)
       
       # 执行查询
-      results = self.db_service.execute_query(sql)
+      with span('query'):
+        results = self.db_service.execute_query(sql)
       
-      # 限制结果集大小
+      # 限制返回的结果集大小，结果解读使用完整结果
+      all_results = results
       if len(results) > Config.MAX_RESULT_SIZE:
         results = results[:Config.MAX_RESULT_SIZE]
       
@@ -44,11 +48,12 @@ class QueryService:
       # 生成结果解读
       if enable_interpretation and results:
         try:
-          interpretation = self.interpretation_service.interpret_result(
-            natural_language,
-            results,
-            columns,
-          )
+          with span('interpretation'):
+            interpretation = self.interpretation_service.interpret_result(
+              natural_language,
+              all_results,
+              columns,
+            )
           if interpretation:
             result['interpretation'] = interpretation
         except Exception as e:
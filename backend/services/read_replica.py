@@ -0,0 +1,144 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Any
+from services.connection_pool import ConnectionPool
+from services.data_version import file_data_version
+from services.metrics_service import metrics
+
+REPLICA_REFRESHES = metrics.counter(
+  'aireport_replica_refresh_total',
+  '只读副本刷新次数',
+  labelnames=('status',),
+)
+REPLICA_REFRESH_DURATION = metrics.histogram(
+  'aireport_replica_refresh_duration_seconds',
+  '只读副本刷新耗时（秒）',
+)
+REPLICA_STALENESS = metrics.gauge(
+  'aireport_replica_staleness_seconds',
+  '只读副本落后于主库的时间（秒），与主库一致时为0',
+)
+
+# 每步复制的页数，步与步之间释放主库的读锁，减少对写入的阻塞
+BACKUP_PAGES_PER_STEP = 1024
+
+class ReadReplica:
+  """
+  分析查询使用的只读副本
+
+  用SQLite在线备份接口把主库复制到临时文件，完成后原子替换副本文件；后台线程每 refresh_interval 秒
+  检查主库的数据版本（data_version，默认为主库文件的修改时间和大小），变化时刷新。
+  副本只读打开（immutable），查询不会与主库的写入（报表保存、数据导入）争用锁。
+  """
+
+  def __init__(self, source_path: str, path: str, refresh_interval: float, pool_size: int,
+               data_version: Callable[[], str] = None):
+    self.source_path = source_path
+    self._source_version = data_version or (lambda: file_data_version(source_path))
+    self.path = path
+    self.refresh_interval = refresh_interval
+    # 副本对应的主库数据版本（复制开始前获取）和复制开始时间
+    self.data_version = None
+    self.refreshed_at = None
+    self.last_error = None
+    self.refreshes = 0
+    self.pool = ConnectionPool(self.connect, pool_size)
+    self._refresh_lock = threading.Lock()
+    self._stop = threading.Event()
+    self._thread = None
+
+    replica_dir = os.path.dirname(self.path)
+    if replica_dir and not os.path.exists(replica_dir):
+      os.makedirs(replica_dir, exist_ok=True)
+    self.refresh(force=True)
+
+  def connect(self) -> sqlite3.Connection:
+    """打开副本的只读连接（副本文件只会被整体替换，不会被修改）"""
+    connection = sqlite3.connect(f'file:{self.path}?mode=ro&immutable=1', uri=True, check_same_thread=False)
+    connection.row_factory = sqlite3.Row
+    return connection
+
+  def refresh(self, force: bool = False) -> bool:
+    """
+    主库数据版本变化时刷新副本
+
+    Returns:
+      是否执行了刷新
+    """
+    with self._refresh_lock:
+      version = self._source_version()
+      if not force and version == self.data_version:
+        return False
+      start = time.time()
+      temp_path = f'{self.path}.tmp'
+      source = sqlite3.connect(f'file:{self.source_path}?mode=ro', uri=True)
+      try:
+        target = sqlite3.connect(temp_path)
+        try:
+          source.backup(target, pages=BACKUP_PAGES_PER_STEP)
+        finally:
+          target.close()
+        os.replace(temp_path, self.path)
+      except Exception as e:
+        self.last_error = str(e)
+        REPLICA_REFRESHES.inc(status='error')
+        if os.path.exists(temp_path):
+          os.remove(temp_path)
+        raise Exception(f'刷新只读副本失败: {str(e)}')
+      finally:
+        source.close()
+      # 已打开的连接仍然读取替换前的文件，归还后关闭
+      self.pool.reset()
+      self.data_version = version
+      self.refreshed_at = start
+      self.last_error = None
+      self.refreshes += 1
+      REPLICA_REFRESHES.inc(status='success')
+      REPLICA_REFRESH_DURATION.observe(time.time() - start)
+      REPLICA_STALENESS.set(0)
+      return True
+
+  def staleness(self) -> float:
+    """副本落后于主库的时间（秒）：主库在上次复制后有修改时为距上次复制开始的时间，否则为0"""
+    if self.refreshed_at is None:
+      return 0.0
+    if self._source_version() == self.data_version:
+      staleness = 0.0
+    else:
+      staleness = round(time.time() - self.refreshed_at, 3)
+    REPLICA_STALENESS.set(staleness)
+    return staleness
+
+  def _loop(self):
+    while not self._stop.wait(self.refresh_interval):
+      try:
+        self.refresh()
+      except Exception as e:
+        print(str(e))
+      self.staleness()
+
+  def start(self):
+    """启动后台刷新线程"""
+    if self._thread is not None or self.refresh_interval <= 0:
+      return
+    self._thread = threading.Thread(target=self._loop, name='read-replica', daemon=True)
+    self._thread.start()
+
+  def stop(self):
+    self._stop.set()
+
+  def status(self) -> Dict[str, Any]:
+    return {
+      'path': self.path,
+      'refreshInterval': self.refresh_interval,
+      'refreshedAt': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.refreshed_at)) if self.refreshed_at else None,
+      'stalenessSeconds': self.staleness(),
+      'refreshes': self.refreshes,
+      'lastError': self.last_error,
+    }
+
+  def close(self):
+    self.stop()
+    self.pool.close()
@@ -0,0 +1,289 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+from services.database_service import DatabaseService
+from services.report_service import ReportService
+from services.cron import CronSchedule
+from services.metrics_service import metrics
+from config import Config
+
+SNAPSHOT_REQUESTS = metrics.counter(
+  'aireport_report_snapshot_requests_total',
+  '报表快照查询次数',
+  labelnames=('kind', 'result'),
+)
+PRECOMPUTE_RUNS = metrics.counter(
+  'aireport_report_precompute_total',
+  '报表预计算次数',
+  labelnames=('reason', 'status'),
+)
+PRECOMPUTE_DURATION = metrics.histogram(
+  'aireport_report_precompute_duration_seconds',
+  '报表预计算耗时（秒）',
+)
+
+# 快照类型：报表查询结果、仪表盘各组件结果
+SNAPSHOT_KINDS = ('query', 'dashboard')
+
+class ReportScheduler:
+  """
+  报表预计算和结果快照
+
+  - 设置了 schedule（cron表达式）的报表按计划预先执行报表查询和仪表盘查询，结果连同执行前的数据版本保存为快照
+  - 数据版本变化（数据导入、修改）后，有计划的报表在 REPORT_REFRESH_MIN_INTERVAL 秒内重新预计算
+  - 执行报表时数据版本未变的快照直接返回；否则实时执行，并把结果保存为新的快照
+  快照保存在 REPORT_SNAPSHOT_PATH（独立的SQLite文件，写快照不会改变业务库的数据版本），重启后仍然有效。
+  """
+
+  def __init__(self, db_service: DatabaseService, report_service: ReportService, path: str = None,
+               tick: float = None, max_age: float = None, refresh_interval: float = None):
+    self.db_service = db_service
+    self.report_service = report_service
+    self.path = path or Config.REPORT_SNAPSHOT_PATH
+    self.tick = Config.REPORT_SCHEDULER_TICK if tick is None else tick
+    self.max_age = Config.REPORT_SNAPSHOT_MAX_AGE if max_age is None else max_age
+    self.refresh_interval = Config.REPORT_REFRESH_MIN_INTERVAL if refresh_interval is None else refresh_interval
+    self._lock = threading.Lock()
+    self._snapshots = {}
+    # report_id -> (cron表达式, 下次执行时间)
+    self._next_runs = {}
+    self._last_refresh = {}
+    # report_id -> 配置版本，修改或删除报表时递增；执行期间配置版本变化的结果不保存为快照
+    self._generations = {}
+    self._stop = threading.Event()
+    self._thread = None
+
+    snapshot_dir = os.path.dirname(self.path)
+    if snapshot_dir and not os.path.exists(snapshot_dir):
+      os.makedirs(snapshot_dir, exist_ok=True)
+    self._connection = sqlite3.connect(self.path, check_same_thread=False)
+    self._connection.execute("""
+      CREATE TABLE IF NOT EXISTS report_snapshots (
+        report_id INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        data_version TEXT NOT NULL,
+        result TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        elapsed_ms REAL NOT NULL,
+        PRIMARY KEY (report_id, kind)
+      )
+    """)
+    self._connection.commit()
+
+  def _load(self, report_id: int, kind: str) -> Optional[Dict[str, Any]]:
+    key = (report_id, kind)
+    with self._lock:
+      snapshot = self._snapshots.get(key)
+      if snapshot is not None:
+        return snapshot
+      row = self._connection.execute(
+        'SELECT data_version, result, created_at, elapsed_ms FROM report_snapshots WHERE report_id = ? AND kind = ?',
+        key,
+      ).fetchone()
+      if row is None:
+        return None
+      snapshot = {'data_version': row[0], 'result': json.loads(row[1]), 'created_at': row[2], 'elapsed_ms': row[3]}
+      self._snapshots[key] = snapshot
+      return snapshot
+
+  def _is_fresh(self, snapshot: Dict[str, Any], data_version: str) -> bool:
+    if snapshot['data_version'] != data_version:
+      return False
+    return not self.max_age or time.time() - snapshot['created_at'] <= self.max_age
+
+  def get_snapshot(self, report_id: int, kind: str) -> Optional[Dict[str, Any]]:
+    """
+    获取数据版本未变的快照结果
+
+    Returns:
+      结果（附带 snapshot 字段说明快照时间），没有可用快照时返回None
+    """
+    snapshot = self._load(report_id, kind)
+    if snapshot is None:
+      SNAPSHOT_REQUESTS.inc(kind=kind, result='miss')
+      return None
+    if not self._is_fresh(snapshot, self.db_service.get_data_version()):
+      SNAPSHOT_REQUESTS.inc(kind=kind, result='stale')
+      return None
+    SNAPSHOT_REQUESTS.inc(kind=kind, result='hit')
+    return dict(snapshot['result'], snapshot={
+      'createdAt': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(snapshot['created_at'])),
+      'elapsedMs': snapshot['elapsed_ms'],
+    })
+
+  def generation(self, report_id: int) -> int:
+    """报表的配置版本，应在读取报表配置前获取"""
+    with self._lock:
+      return self._generations.get(report_id, 0)
+
+  def store(self, report_id: int, kind: str, result: Dict[str, Any], data_version: str, elapsed_ms: float,
+            generation: int = None):
+    """
+    保存快照，只保存成功的结果
+
+    data_version、generation 应在执行查询（读取报表配置）前获取；执行期间报表被修改或删除时不保存。
+    """
+    if not result.get('success'):
+      return
+    # 复制一份，调用方之后向结果中添加的字段（如timings）不影响快照
+    snapshot = {'data_version': data_version, 'result': dict(result), 'created_at': time.time(), 'elapsed_ms': round(elapsed_ms, 2)}
+    with self._lock:
+      if generation is not None and self._generations.get(report_id, 0) != generation:
+        return
+      self._snapshots[(report_id, kind)] = snapshot
+      self._connection.execute(
+        'INSERT OR REPLACE INTO report_snapshots (report_id, kind, data_version, result, created_at, elapsed_ms) VALUES (?, ?, ?, ?, ?, ?)',
+        (report_id, kind, data_version, json.dumps(result, ensure_ascii=False, default=str), snapshot['created_at'], snapshot['elapsed_ms']),
+      )
+      self._connection.commit()
+
+  def invalidate(self, report_id: int):
+    """报表配置修改或删除后丢弃快照和计划"""
+    with self._lock:
+      self._generations[report_id] = self._generations.get(report_id, 0) + 1
+      for kind in SNAPSHOT_KINDS:
+        self._snapshots.pop((report_id, kind), None)
+      self._connection.execute('DELETE FROM report_snapshots WHERE report_id = ?', (report_id,))
+      self._connection.commit()
+    self._next_runs.pop(report_id, None)
+
+  def _execute(self, report: Dict[str, Any], kind: str) -> Dict[str, Any]:
+    if kind == 'query':
+      return self.report_service.execute_report_query(report['query_config'])
+    return self.report_service.execute_dashboard(report['id'])
+
+  def execute(self, report_id: int, kind: str) -> Dict[str, Any]:
+    """执行报表：有可用快照时直接返回，否则实时执行并保存快照"""
+    result = self.get_snapshot(report_id, kind)
+    if result is not None:
+      return result
+    generation = self.generation(report_id)
+    report = self.report_service.get_report(report_id)
+    if not report:
+      raise Exception('报表不存在')
+    if kind == 'query' and not report.get('query_config'):
+      raise Exception('报表未配置查询')
+    data_version = self.db_service.get_data_version()
+    start = time.perf_counter()
+    result = self._execute(report, kind)
+    self.store(report_id, kind, result, data_version, (time.perf_counter() - start) * 1000, generation)
+    return result
+
+  def precompute(self, report_id: int, reason: str = 'manual') -> Dict[str, Any]:
+    """预先执行报表查询和仪表盘查询并保存快照"""
+    start = time.perf_counter()
+    status = 'success'
+    summary = {'reportId': report_id}
+    try:
+      generation = self.generation(report_id)
+      report = self.report_service.get_report(report_id)
+      if not report:
+        raise Exception('报表不存在')
+      for kind in SNAPSHOT_KINDS:
+        if kind == 'query' and not report.get('query_config'):
+          continue
+        data_version = self.db_service.get_data_version()
+        kind_start = time.perf_counter()
+        result = self._execute(report, kind)
+        self.store(report_id, kind, result, data_version, (time.perf_counter() - kind_start) * 1000, generation)
+        summary[kind] = bool(result.get('success'))
+    except Exception as e:
+      status = 'error'
+      summary['error'] = str(e)
+    finally:
+      elapsed = time.perf_counter() - start
+      PRECOMPUTE_RUNS.inc(reason=reason, status=status)
+      PRECOMPUTE_DURATION.observe(elapsed)
+      self._last_refresh[report_id] = time.time()
+    summary['elapsedMs'] = round(elapsed * 1000, 2)
+    return summary
+
+  def precompute_scheduled(self, reason: str = 'manual') -> List[Dict[str, Any]]:
+    """预计算所有设置了计划的报表（如数据导入完成后调用）"""
+    return [self.precompute(report['id'], reason) for report in self._scheduled_reports()]
+
+  def _scheduled_reports(self) -> List[Dict[str, Any]]:
+    return [report for report in self.report_service.list_reports() if report.get('schedule')]
+
+  def _is_stale(self, report_id: int, data_version: str) -> bool:
+    return any(
+      snapshot is not None and not self._is_fresh(snapshot, data_version)
+      for snapshot in (self._load(report_id, kind) for kind in SNAPSHOT_KINDS)
+    )
+
+  def run_pending(self, now: datetime = None):
+    """执行到期的计划，以及数据版本变化后需要刷新的报表"""
+    now = now or datetime.now()
+    data_version = self.db_service.get_data_version()
+    scheduled = self._scheduled_reports()
+    active = set()
+    for report in scheduled:
+      report_id = report['id']
+      active.add(report_id)
+      expression = report['schedule']
+      planned = self._next_runs.get(report_id)
+      if planned is None or planned[0] != expression:
+        try:
+          planned = (expression, CronSchedule(expression).next_after(now))
+        except ValueError:
+          continue
+        self._next_runs[report_id] = planned
+        # 新加入计划且没有可用快照的报表立即预计算一次
+        if self._load(report_id, 'dashboard') is None:
+          self.precompute(report_id, reason='initial')
+          continue
+      if now >= planned[1]:
+        self._next_runs[report_id] = (expression, CronSchedule(expression).next_after(now))
+        self.precompute(report_id, reason='schedule')
+      elif self._is_stale(report_id, data_version) \
+          and time.time() - self._last_refresh.get(report_id, 0) >= self.refresh_interval:
+        self.precompute(report_id, reason='data_change')
+    for report_id in list(self._next_runs):
+      if report_id not in active:
+        del self._next_runs[report_id]
+
+  def _loop(self):
+    while not self._stop.wait(self.tick):
+      try:
+        self.run_pending()
+      except Exception as e:
+        print(f'报表预计算失败: {str(e)}')
+
+  def start(self):
+    """启动后台调度线程"""
+    if self._thread is not None:
+      return
+    self._thread = threading.Thread(target=self._loop, name='report-scheduler', daemon=True)
+    self._thread.start()
+
+  def stop(self):
+    self._stop.set()
+
+  def status(self) -> List[Dict[str, Any]]:
+    """各计划报表的下次执行时间和快照状态"""
+    data_version = self.db_service.get_data_version()
+    result = []
+    for report in self._scheduled_reports():
+      report_id = report['id']
+      planned = self._next_runs.get(report_id)
+      snapshots = {}
+      for kind in SNAPSHOT_KINDS:
+        snapshot = self._load(report_id, kind)
+        if snapshot is not None:
+          snapshots[kind] = {
+            'createdAt': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(snapshot['created_at'])),
+            'elapsedMs': snapshot['elapsed_ms'],
+            'fresh': self._is_fresh(snapshot, data_version),
+          }
+      result.append({
+        'reportId': report_id,
+        'name': report['name'],
+        'schedule': report['schedule'],
+        'nextRun': planned[1].strftime('%Y-%m-%d %H:%M') if planned else None,
+        'snapshots': snapshots,
+      })
+    return result
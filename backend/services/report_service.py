@@ -1,19 +1,49 @@
+import contextvars
 import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from services.database_service import DatabaseService
+from services.metrics_service import span
+from services.downsampling import downsample_rows
+from services.cron import CronSchedule
+from config import Config
+
+# 图表聚合方式
+CHART_AGGREGATES = {'sum': 'SUM', 'count': 'COUNT', 'avg': 'AVG', 'max': 'MAX', 'min': 'MIN'}
+# 时间分段表达式，按从细到粗排列
+TIME_BUCKETS = {
+  'day': "strftime('%Y-%m-%d', {field})",
+  'month': "strftime('%Y-%m', {field})",
+  'quarter': "strftime('%Y', {field}) || '-Q' || ((CAST(strftime('%m', {field}) AS INTEGER) + 2) / 3)",
+  'year': "strftime('%Y', {field})",
+}
+TIME_BUCKET_DAYS = {'day': 1, 'month': 31, 'quarter': 92, 'year': 366}
+OTHER_CATEGORY = '其他'
 
 class ReportService:
   """报表服务类，负责报表配置的CRUD操作"""
   
   def __init__(self, db_service: DatabaseService):
     self.db_service = db_service
+    self._executor = ThreadPoolExecutor(max_workers=max(Config.DB_READ_POOL_SIZE, 1), thread_name_prefix='dashboard')
+  
+  def _validate_schedule(self, schedule: Optional[str]) -> Optional[str]:
+    """校验预计算的cron表达式，空字符串表示不预计算"""
+    if not schedule:
+      return None
+    CronSchedule(schedule)
+    return schedule.strip()
   
   def create_report(self, name: str, description: str, data_source: str, 
-                   layout_config: Dict[str, Any], query_config: Dict[str, Any] = None) -> Dict[str, Any]:
-    """创建报表配置"""
+                   layout_config: Dict[str, Any], query_config: Dict[str, Any] = None,
+                   schedule: str = None) -> Dict[str, Any]:
+    """创建报表配置，schedule 为预计算的cron表达式"""
     try:
+      schedule = self._validate_schedule(schedule)
+
       # 验证数据源
       if not data_source:
         raise Exception('数据源不能为空')
@@ -28,13 +58,13 @@ class ReportService:
       
       # 插入数据库
       sql = """
-        INSERT INTO report_configs (name, description, data_source, layout_config, query_config, created_at, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
+        INSERT INTO report_configs (name, description, data_source, layout_config, query_config, schedule, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
       """
       connection = self.db_service.get_connection()
       cursor = connection.cursor()
       now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-      cursor.execute(sql, (name, description, data_source, layout_json, query_json, now, now,))
+      cursor.execute(sql, (name, description, data_source, layout_json, query_json, schedule, now, now,))
       connection.commit()
       report_id = cursor.lastrowid
       cursor.close()
@@ -46,6 +76,7 @@ class ReportService:
         'data_source': data_source,
         'layout_config': layout_config,
         'query_config': query_config,
+        'schedule': schedule,
         'created_at': now,
         'updated_at': now,
       }
@@ -56,7 +87,7 @@ class ReportService:
     """获取报表配置"""
     try:
       sql = """
-        SELECT id, name, description, data_source, layout_config, query_config, created_at, updated_at
+        SELECT id, name, description, data_source, layout_config, query_config, schedule, created_at, updated_at
         FROM report_configs
         WHERE id = ?
       """
@@ -77,7 +108,7 @@ class ReportService:
     """获取所有报表配置列表"""
     try:
       sql = """
-        SELECT id, name, description, data_source, created_at, updated_at
+        SELECT id, name, description, data_source, schedule, created_at, updated_at
         FROM report_configs
         ORDER BY updated_at DESC
       """
@@ -86,8 +117,9 @@ class ReportService:
       raise Exception(f'获取报表列表失败: {str(e)}')
   
   def update_report(self, report_id: int, name: str = None, description: str = None,
-                   layout_config: Dict[str, Any] = None, query_config: Dict[str, Any] = None) -> Dict[str, Any]:
-    """更新报表配置"""
+                   layout_config: Dict[str, Any] = None, query_config: Dict[str, Any] = None,
+                   schedule: str = None) -> Dict[str, Any]:
+    """更新报表配置，schedule 为空字符串时取消预计算"""
     try:
       # 获取现有报表
       existing = self.get_report(report_id)
@@ -114,6 +146,10 @@ class ReportService:
         updates.append('query_config = ?')
         params.append(json.dumps(query_config, ensure_ascii=False))
       
+      if schedule is not None:
+        updates.append('schedule = ?')
+        params.append(self._validate_schedule(schedule))
+      
       if not updates:
         return existing
       
@@ -148,80 +184,251 @@ class ReportService:
     except Exception as e:
       raise Exception(f'删除报表失败: {str(e)}')
   
-  def execute_report_query(self, query_config: Dict[str, Any]) -> Dict[str, Any]:
-    """执行报表查询，根据查询配置生成SQL并执行"""
-    try:
-      # 构建SQL查询
-      tables = query_config.get('tables', [])
-      fields = query_config.get('fields', [])
-      filters = query_config.get('filters', [])
-      group_by = query_config.get('group_by', [])
-      order_by = query_config.get('order_by', [])
-      
-      if not tables or not fields:
-        raise Exception('表和字段不能为空')
-      
-      # 构建SELECT子句
-      select_fields = []
-      for field in fields:
-        table_name = field.get('table')
-        field_name = field.get('field')
-        alias = field.get('alias', field_name)
-        if table_name:
-          select_fields.append(f"{table_name}.{field_name} AS {alias}")
+  def _normalize_query_config(self, query_config: Dict[str, Any]) -> Dict[str, Any]:
+    """统一查询配置格式：兼容保存报表时的 table/fields[].name 写法"""
+    tables = query_config.get('tables') or ([query_config['table']] if query_config.get('table') else [])
+    fields = []
+    for field in query_config.get('fields', []):
+      field_name = field.get('field') or field.get('name')
+      fields.append({
+        'table': field.get('table'),
+        'field': field_name,
+        'alias': field.get('alias') or field_name,
+      })
+    return {
+      'tables': tables,
+      'fields': fields,
+      'filters': [f for f in query_config.get('filters', []) if f.get('field') and f.get('value') is not None],
+      'group_by': query_config.get('group_by', []),
+      'order_by': query_config.get('order_by', []),
+    }
+  
+  def _build_report_sql(self, query_config: Dict[str, Any]) -> Tuple[str, tuple]:
+    """根据规范化的查询配置生成SQL和参数"""
+    tables = query_config['tables']
+    fields = query_config['fields']
+    filters = query_config['filters']
+    group_by = query_config['group_by']
+    order_by = query_config['order_by']
+    
+    if not tables or not fields:
+      raise Exception('表和字段不能为空')
+    
+    # 构建SELECT子句
+    select_fields = []
+    for field in fields:
+      table_name = field.get('table')
+      field_name = field.get('field')
+      alias = field.get('alias', field_name)
+      if table_name:
+        select_fields.append(f"{table_name}.{field_name} AS {alias}")
+      else:
+        select_fields.append(f"{field_name} AS {alias}")
+    
+    # 构建FROM子句
+    from_clause = ', '.join(tables)
+    
+    # 构建WHERE子句
+    where_clause = ''
+    where_params = []
+    if filters:
+      where_conditions = []
+      for filter_item in filters:
+        where_conditions.append(f"{filter_item['field']} {filter_item.get('operator', '=')} ?")
+        where_params.append(filter_item['value'])
+      where_clause = 'WHERE ' + ' AND '.join(where_conditions)
+    
+    # 构建GROUP BY子句
+    group_by_clause = ''
+    if group_by:
+      group_by_clause = 'GROUP BY ' + ', '.join(group_by)
+    
+    # 构建ORDER BY子句
+    order_by_clause = ''
+    if order_by:
+      order_by_items = []
+      for order_item in order_by:
+        field = order_item.get('field')
+        direction = order_item.get('direction', 'ASC')
+        order_by_items.append(f"{field} {direction}")
+      order_by_clause = 'ORDER BY ' + ', '.join(order_by_items)
+    
+    # 组合SQL
+    sql = f"SELECT {', '.join(select_fields)} FROM {from_clause} {where_clause} {group_by_clause} {order_by_clause}"
+    return sql, tuple(where_params)
+  
+  def build_query(self, query_config: Dict[str, Any]) -> Tuple[str, tuple]:
+    """根据查询配置（保存报表的写法或执行接口的写法）生成SQL和参数"""
+    return self._build_report_sql(self._normalize_query_config(query_config))
+  
+  def _qualify(self, spec: Dict[str, Any]) -> str:
+    return f"{spec['table']}.{spec['field']}" if spec.get('table') else spec['field']
+  
+  def _auto_time_bucket(self, query_config: Dict[str, Any], field: str, max_buckets: int) -> str:
+    """根据筛选后数据的时间跨度选择分段粒度，使分段数尽量不超过上限"""
+    bounds_config = dict(query_config, fields=[
+      {'table': None, 'field': f'julianday(MIN({field}))', 'alias': 'first_day'},
+      {'table': None, 'field': f'julianday(MAX({field}))', 'alias': 'last_day'},
+    ], group_by=[], order_by=[])
+    sql, params = self._build_report_sql(bounds_config)
+    rows = self.db_service.execute_read_query(sql, params or None)
+    if not rows or rows[0]['first_day'] is None:
+      return 'day'
+    span_days = rows[0]['last_day'] - rows[0]['first_day']
+    for bucket in ('day', 'month', 'quarter'):
+      if span_days <= max_buckets * TIME_BUCKET_DAYS[bucket]:
+        return bucket
+    return 'year'
+  
+  def _chart_query_config(self, query_config: Dict[str, Any], chart: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    将图表配置转换为分组聚合查询
+
+    chart 包含 category（分类字段，{table, field}）、value（数值字段和聚合方式，{table, field, agg}，
+    count 可不指定字段）、time_bucket（day/month/quarter/year/auto，分类字段为日期时按时间分段）。
+    按分类表达式分组，结果行数等于分类数；avg 额外返回计数以便合并“其他”。
+    """
+    category = chart.get('category') or {}
+    value = chart.get('value') or {}
+    if not category.get('field'):
+      raise Exception('图表未配置分类字段')
+    agg = (value.get('agg') or 'sum').lower()
+    if agg not in CHART_AGGREGATES:
+      raise Exception(f'不支持的聚合方式: {agg}')
+    if agg != 'count' and not value.get('field'):
+      raise Exception('图表未配置数值字段')
+    
+    category_expr = self._qualify(category)
+    bucket = chart.get('time_bucket')
+    if bucket == 'auto':
+      bucket = self._auto_time_bucket(query_config, category_expr, chart.get('max_buckets') or Config.CHART_MAX_BUCKETS)
+    if bucket:
+      if bucket not in TIME_BUCKETS:
+        raise Exception(f'不支持的时间分段: {bucket}')
+      category_expr = TIME_BUCKETS[bucket].format(field=category_expr)
+    
+    value_expr = self._qualify(value) if value.get('field') else '*'
+    fields = [{'table': None, 'field': category_expr, 'alias': 'category'}]
+    if agg == 'avg':
+      fields.append({'table': None, 'field': f'SUM({value_expr})', 'alias': 'value'})
+      fields.append({'table': None, 'field': f'COUNT({value_expr})', 'alias': 'value_count'})
+    else:
+      fields.append({'table': None, 'field': f'{CHART_AGGREGATES[agg]}({value_expr})', 'alias': 'value'})
+    return dict(query_config, fields=fields, group_by=[category_expr], order_by=[])
+  
+  def _build_chart_series(self, rows: List[Dict[str, Any]], chart: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    由分组结果生成图表数据
+
+    时间分段按时间排序；其他分类按数值降序保留前 top_n 个，其余合并为“其他”。
+    """
+    agg = ((chart.get('value') or {}).get('agg') or 'sum').lower()
+    points = []
+    for row in rows:
+      category = row['category']
+      points.append({
+        'category': '(空)' if category is None else str(category),
+        'value': row['value'] or 0,
+        'count': row.get('value_count') or 0,
+      })
+    
+    total_categories = len(points)
+    if chart.get('time_bucket'):
+      points.sort(key=lambda point: point['category'])
+    else:
+      if agg == 'avg':
+        points.sort(key=lambda point: point['value'] / point['count'] if point['count'] else 0, reverse=True)
+      else:
+        points.sort(key=lambda point: point['value'], reverse=True)
+      top_n = chart.get('top_n', Config.CHART_TOP_N)
+      # 保留前 top_n 个分类，其余合并为“其他”；只剩一个分类时直接显示
+      if top_n and len(points) > top_n + 1:
+        rest = points[top_n:]
+        if agg == 'max':
+          other_value = max(point['value'] for point in rest)
+        elif agg == 'min':
+          other_value = min(point['value'] for point in rest)
         else:
-          select_fields.append(f"{field_name} AS {alias}")
-      
-      # 构建FROM子句
-      from_clause = ', '.join(tables)
-      
-      # 构建WHERE子句
-      where_clause = ''
-      where_params = []
-      if filters:
-        where_conditions = []
-        for filter_item in filters:
-          field = filter_item.get('field')
-          operator = filter_item.get('operator', '=')
-          value = filter_item.get('value')
-          if field and value is not None:
-            where_conditions.append(f"{field} {operator} ?")
-            where_params.append(value)
-        if where_conditions:
-          where_clause = 'WHERE ' + ' AND '.join(where_conditions)
-      
-      # 构建GROUP BY子句
-      group_by_clause = ''
-      if group_by:
-        group_by_clause = 'GROUP BY ' + ', '.join(group_by)
-      
-      # 构建ORDER BY子句
-      order_by_clause = ''
-      if order_by:
-        order_by_items = []
-        for order_item in order_by:
-          field = order_item.get('field')
-          direction = order_item.get('direction', 'ASC')
-          order_by_items.append(f"{field} {direction}")
-        order_by_clause = 'ORDER BY ' + ', '.join(order_by_items)
-      
-      # 组合SQL
-      sql = f"SELECT {', '.join(select_fields)} FROM {from_clause} {where_clause} {group_by_clause} {order_by_clause}"
+          other_value = sum(point['value'] for point in rest)
+        points = points[:top_n] + [{
+          'category': OTHER_CATEGORY,
+          'value': other_value,
+          'count': sum(point['count'] for point in rest),
+        }]
+    
+    data = []
+    for point in points:
+      # avg 查询的是合计和计数，在这里换算为平均值
+      value = point['value'] / point['count'] if agg == 'avg' and point['count'] else point['value']
+      data.append({'category': point['category'], 'value': value})
+    category = chart.get('category') or {}
+    value = chart.get('value') or {}
+    return {
+      'type': chart.get('type', 'bar'),
+      'categoryField': category.get('alias') or category.get('field'),
+      'valueField': value.get('alias') or (f"{agg}({value['field']})" if value.get('field') else agg),
+      'categories': total_categories,
+      'data': data,
+    }
+  
+  def _downsample(self, result: Dict[str, Any], target_points: int, method: str = None,
+                  x_field: str = None, y_field: str = None):
+    """结果行数超过目标点数时降采样，图表数据和明细行同样处理"""
+    if not target_points:
+      return
+    method = method or Config.DOWNSAMPLE_METHOD
+    with span('downsample'):
+      data, info = downsample_rows(result['data'], result['columns'], int(target_points), method, x_field, y_field)
+    if info is None:
+      return
+    result['data'] = data
+    result['downsampled'] = info
+    if 'chart' in result:
+      result['chart']['data'] = data
+  
+  def execute_report_query(self, query_config: Dict[str, Any], chart: Dict[str, Any] = None,
+                           target_points: int = None, downsample_method: str = None,
+                           x_field: str = None, y_field: str = None) -> Dict[str, Any]:
+    """
+    执行报表查询，根据查询配置生成SQL并执行
+
+    指定 chart 时在数据库中分组聚合，只返回图表的数据点（chart 字段），data 为对应的 category/value 行。
+    指定 target_points 时，行数超过目标点数的时间序列结果按 downsample_method（lttb 或 minmax）降采样，
+    x_field、y_field 指定横纵坐标字段（不指定时自动选择）。
+    """
+    try:
+      query_config = self._normalize_query_config(query_config)
+      if chart:
+        query_config = self._chart_query_config(query_config, chart)
+      sql, params = self._build_report_sql(query_config)
       
       # 执行查询
-      results = self.db_service.execute_query(sql, tuple(where_params) if where_params else None)
-      
-      # 获取列信息
-      columns = []
-      if results:
-        columns = list(results[0].keys())
+      with span('query'):
+        results = self.db_service.execute_query(sql, params or None)
       
-      return {
-        'success': True,
-        'data': results,
-        'columns': columns,
-        'sql': sql,
-      }
+      if chart:
+        series = self._build_chart_series(results, chart)
+        result = {
+          'success': True,
+          'data': series['data'],
+          'columns': ['category', 'value'],
+          'chart': series,
+          'sql': sql,
+        }
+      else:
+        # 获取列信息
+        columns = []
+        if results:
+          columns = list(results[0].keys())
+        
+        result = {
+          'success': True,
+          'data': results,
+          'columns': columns,
+          'sql': sql,
+        }
+      self._downsample(result, target_points, downsample_method, x_field, y_field)
+      return result
     except Exception as e:
       return {
         'success': False,
@@ -229,4 +436,130 @@ class ReportService:
         'data': [],
         'columns': [],
       }
+  
+  def _merge_widget_queries(self, widgets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    合并组件查询
+
+    FROM、WHERE、GROUP BY、ORDER BY 相同的组件合并为一次查询，SELECT 取各组件字段的并集，
+    字段统一重命名为 c0、c1...，执行后再按各组件的字段和别名拆分结果。
+    """
+    groups = {}
+    for widget in widgets:
+      config = widget['query_config']
+      key = json.dumps(
+        [config['tables'], config['filters'], config['group_by'], config['order_by']],
+        ensure_ascii=False, sort_keys=True, default=str,
+      )
+      group = groups.get(key)
+      if group is None:
+        group = {'config': config, 'fields': {}, 'widgets': []}
+        groups[key] = group
+      projection = []
+      for field in config['fields']:
+        field_key = (field.get('table'), field['field'])
+        if field_key not in group['fields']:
+          group['fields'][field_key] = f"c{len(group['fields'])}"
+        projection.append((field['alias'], group['fields'][field_key]))
+      group['widgets'].append((widget['id'], projection))
+    
+    merged = []
+    for group in groups.values():
+      fields = [
+        {'table': table, 'field': field, 'alias': alias}
+        for (table, field), alias in group['fields'].items()
+      ]
+      merged.append({'query_config': dict(group['config'], fields=fields), 'widgets': group['widgets']})
+    return merged
+  
+  def _execute_merged_query(self, query_config: Dict[str, Any]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+      sql, params = self._build_report_sql(query_config)
+      with span('dashboard.query'):
+        rows = self.db_service.execute_read_query(sql, params or None)
+      return {'rows': rows, 'sql': sql, 'elapsedMs': round((time.perf_counter() - start) * 1000, 2)}
+    except Exception as e:
+      return {'error': str(e), 'elapsedMs': round((time.perf_counter() - start) * 1000, 2)}
+  
+  def execute_dashboard(self, report_id: int) -> Dict[str, Any]:
+    """
+    执行报表中所有组件的查询
+
+    组件的 query_config 未设置时使用报表的 query_config。图表组件设置了 chart 时在数据库中分组聚合，
+    只返回图表的数据点；设置了 target_points 时对结果降采样。可以合并的查询合并为一次扫描，合并后的查询在只读连接池上并发执行。
 
+    Returns:
+      按组件ID分组的查询结果，每个组件包含 data、columns、sql、elapsedMs 以及共享同一查询的组件数 mergedWith
+    """
+    report = self.get_report(report_id)
+    if not report:
+      raise Exception('报表不存在')
+    
+    default_config = report.get('query_config') or {}
+    widgets = []
+    results = {}
+    charts = {}
+    targets = {}
+    for widget in report['layout_config'].get('widgets', []):
+      widget_id = widget.get('i') or widget.get('id')
+      config = widget.get('query_config') or default_config
+      if widget.get('type') == 'text' and not widget.get('query_config'):
+        continue
+      config = self._normalize_query_config(config)
+      chart = widget.get('chart') if widget.get('type') == 'chart' else None
+      if chart:
+        try:
+          config = self._chart_query_config(config, chart)
+        except Exception as e:
+          results[widget_id] = {'success': False, 'message': str(e), 'data': [], 'columns': []}
+          continue
+      if not config['tables'] or not config['fields']:
+        results[widget_id] = {'success': False, 'message': '组件未配置数据源和字段', 'data': [], 'columns': []}
+        continue
+      widgets.append({'id': widget_id, 'query_config': config})
+      charts[widget_id] = chart
+      targets[widget_id] = (widget.get('target_points'), widget.get('x_field'), widget.get('y_field'))
+    
+    merged = self._merge_widget_queries(widgets)
+    # 在工作线程中沿用当前请求的追踪上下文，使各查询耗时计入请求的timings
+    futures = [
+      self._executor.submit(contextvars.copy_context().run, self._execute_merged_query, group['query_config'])
+      for group in merged
+    ]
+    for group, future in zip(merged, futures):
+      outcome = future.result()
+      for widget_id, projection in group['widgets']:
+        if 'error' in outcome:
+          results[widget_id] = {
+            'success': False,
+            'message': f"查询执行失败: {outcome['error']}",
+            'data': [],
+            'columns': [],
+          }
+          continue
+        rows = [{alias: row[column] for alias, column in projection} for row in outcome['rows']]
+        result = {
+          'success': True,
+          'data': rows,
+          'columns': [alias for alias, _ in projection],
+          'sql': outcome['sql'],
+          'elapsedMs': outcome['elapsedMs'],
+          'mergedWith': len(group['widgets']),
+        }
+        if charts[widget_id]:
+          result['chart'] = self._build_chart_series(rows, charts[widget_id])
+          result['data'] = result['chart']['data']
+          result['columns'] = ['category', 'value']
+        try:
+          target_points, x_field, y_field = targets[widget_id]
+          self._downsample(result, target_points, x_field=x_field, y_field=y_field)
+        except Exception as e:
+          result = {'success': False, 'message': str(e), 'data': [], 'columns': []}
+        results[widget_id] = result
+    
+    return {
+      'success': True,
+      'widgets': results,
+      'queries': len(merged),
+    }
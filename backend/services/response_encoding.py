@@ -0,0 +1,132 @@
+import gzip
+import json
+from typing import Dict, Any
+from flask import Request, Response
+from services.metrics_service import metrics
+from config import Config
+
+# 可选依赖：未安装时对应的编码不可用
+try:
+  import orjson
+except ImportError:
+  orjson = None
+try:
+  import msgpack
+except ImportError:
+  msgpack = None
+try:
+  import brotli
+except ImportError:
+  brotli = None
+try:
+  import pyarrow as pa
+except ImportError:
+  pa = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/x-msgpack'
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+# 可以压缩的响应类型
+COMPRESSIBLE_MIMETYPES = (JSON_MIMETYPE, MSGPACK_MIMETYPE, ARROW_MIMETYPE, 'text/plain', 'text/csv')
+
+RESPONSES = metrics.counter(
+  'aireport_response_encoding_total',
+  '按内容类型和压缩方式统计的响应数',
+  labelnames=('content_type', 'encoding'),
+)
+RESPONSE_BYTES = metrics.counter(
+  'aireport_response_bytes_total',
+  '响应体字节数（压缩前、压缩后）',
+  labelnames=('stage',),
+)
+
+def dumps_json(data: Any) -> bytes:
+  """序列化为JSON，安装了orjson时使用orjson"""
+  if orjson is not None:
+    return orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS)
+  return json.dumps(data, ensure_ascii=False, default=str).encode('utf-8')
+
+def _encode_arrow(payload: Dict[str, Any]) -> bytes:
+  """
+  查询结果按列编码为Arrow IPC流
+
+  data 转为列式的记录批，其余字段（success、sql、timings等）以JSON存放在schema元数据 aireport 中。
+  """
+  columns = payload.get('columns') or []
+  data = payload.get('data') or []
+  arrays = {col: [row.get(col) for row in data] for col in columns}
+  table = pa.table(arrays) if columns else pa.table({})
+  metadata = {key: value for key, value in payload.items() if key != 'data'}
+  table = table.replace_schema_metadata({'aireport': dumps_json(metadata)})
+  sink = pa.BufferOutputStream()
+  with pa.ipc.new_stream(sink, table.schema) as writer:
+    writer.write_table(table)
+  return sink.getvalue().to_pybytes()
+
+def available_mimetypes(payload: Dict[str, Any]):
+  mimetypes = [JSON_MIMETYPE]
+  if msgpack is not None:
+    mimetypes.append(MSGPACK_MIMETYPE)
+  if pa is not None and isinstance(payload.get('data'), list) and 'columns' in payload:
+    mimetypes.append(ARROW_MIMETYPE)
+  return mimetypes
+
+def encode_response(payload: Dict[str, Any], request: Request, status: int = 200) -> Response:
+  """
+  按请求的Accept头编码响应
+
+  默认为JSON；Accept 指定 application/x-msgpack 或 application/vnd.apache.arrow.stream
+  且安装了对应依赖时返回MessagePack或Arrow IPC（只用于包含 data、columns 的查询结果）。
+  """
+  mimetype = request.accept_mimetypes.best_match(available_mimetypes(payload)) or JSON_MIMETYPE
+  if mimetype == MSGPACK_MIMETYPE:
+    body = msgpack.packb(payload, use_bin_type=True, default=str)
+  elif mimetype == ARROW_MIMETYPE:
+    body = _encode_arrow(payload)
+  else:
+    body = dumps_json(payload)
+  response = Response(body, status=status, mimetype=mimetype)
+  response.vary.add('Accept')
+  return response
+
+def compress_response(response: Response, request: Request) -> Response:
+  """
+  按 Accept-Encoding 压缩响应体，优先使用brotli，其次gzip
+
+  只压缩大于 COMPRESS_MIN_SIZE 字节的可压缩类型；带ETag的响应改为弱ETag，
+  304 条件请求仍然按弱比较匹配。
+  """
+  if not Config.COMPRESS_ENABLED or response.direct_passthrough or response.status_code < 200 \
+      or response.status_code in (204, 206, 304) or 'Content-Encoding' in response.headers \
+      or response.mimetype not in COMPRESSIBLE_MIMETYPES:
+    return response
+
+  body = response.get_data()
+  response.vary.add('Accept-Encoding')
+  accepted = request.accept_encodings
+  if len(body) < Config.COMPRESS_MIN_SIZE:
+    encoding = None
+  elif brotli is not None and accepted['br']:
+    encoding = 'br'
+  elif accepted['gzip']:
+    encoding = 'gzip'
+  else:
+    encoding = None
+  if encoding is None:
+    RESPONSES.inc(content_type=response.mimetype, encoding='identity')
+    return response
+
+  if encoding == 'br':
+    compressed = brotli.compress(body, quality=Config.COMPRESS_BROTLI_QUALITY)
+  else:
+    compressed = gzip.compress(body, compresslevel=Config.COMPRESS_LEVEL)
+
+  response.set_data(compressed)
+  response.headers['Content-Encoding'] = encoding
+  etag, weak = response.get_etag()
+  if etag and not weak:
+    response.set_etag(etag, weak=True)
+  RESPONSES.inc(content_type=response.mimetype, encoding=encoding)
+  RESPONSE_BYTES.inc(len(body), stage='raw')
+  RESPONSE_BYTES.inc(len(compressed), stage='compressed')
+  return response
@@ -1,14 +1,22 @@
+import hashlib
 import json
 import re
 from typing import Dict, List, Any, Optional
 import requests
+from services.metrics_service import span
+from services.llm_cache import LLMResponseCache, make_cache_key
+from services.result_summarizer import ResultSummarizer
 from config import Config
 
 class ResultInterpretationService:
   """报表结果解读服务 - 基于大模型"""
   
-  def __init__(self):
+  def __init__(self, cache: LLMResponseCache = None):
     self.config = Config
+    if cache is None and self.config.LLM_CACHE_ENABLED:
+      cache = LLMResponseCache.from_config()
+    self.cache = cache
+    self.summarizer = ResultSummarizer()
   
   def _build_system_prompt(self) -> str:
     """构建系统提示词"""
@@ -31,6 +39,10 @@ class ResultInterpretationService:
     if not data:
       return "查询结果为空，没有数据。"
     
+    # 行数较多时用统计摘要代替原始数据，解读基于全部结果而不是前几行
+    if len(data) > max_rows and self.config.INTERPRETATION_SUMMARY_ENABLED:
+      return self.summarizer.summarize(data, columns)
+    
     # 限制行数，避免prompt过长
     display_data = data[:max_rows]
     
@@ -164,15 +176,35 @@ class ResultInterpretationService:
     else:
       raise Exception(f'不支持的大模型提供商: {provider}，支持: openai, qwen')
   
+  def _cache_key(self, user_query: str, data_text: str) -> str:
+    """缓存键：问题、数据文本的哈希，以及影响输出的模型和提示词"""
+    provider = self.config.LLM_PROVIDER.lower()
+    model = self.config.QWEN_MODEL if provider == 'qwen' else self.config.OPENAI_MODEL
+    question = ' '.join(user_query.split())
+    data_hash = hashlib.sha256(data_text.encode('utf-8')).hexdigest()
+    return make_cache_key(provider, model, self._build_system_prompt(), question, data_hash)
+  
   def interpret_result(self, user_query: str, data: List[Dict[str, Any]], columns: List[str]) -> Optional[str]:
-    """解读查询结果"""
+    """解读查询结果，同一问题和相同结果数据的解读直接从缓存返回"""
     try:
       # 格式化数据
-      data_text = self._format_data_for_prompt(data, columns)
+      with span('interpretation.format'):
+        data_text = self._format_data_for_prompt(data, columns)
+      
+      cache_key = None
+      if self.cache is not None:
+        with span('interpretation.cache'):
+          cache_key = self._cache_key(user_query, data_text)
+          interpretation = self.cache.get(cache_key, namespace='interpretation')
+        if interpretation is not None:
+          return interpretation
       
       # 调用大模型API生成解读
-      interpretation = self._call_llm_api(user_query, data_text)
+      with span('interpretation.llm'):
+        interpretation = self._call_llm_api(user_query, data_text)
       
+      if cache_key is not None and interpretation:
+        self.cache.set(cache_key, interpretation, namespace='interpretation')
       return interpretation
     except Exception as e:
       # 解读失败不影响主流程，返回None
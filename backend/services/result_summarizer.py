@@ -0,0 +1,157 @@
+from typing import Dict, List, Any, Optional
+import numpy as np
+import pandas as pd
+
+# 时间分段粒度
+TIME_FREQUENCIES = [('D', '日'), ('M', '月'), ('Q', '季度'), ('Y', '年')]
+
+class ResultSummarizer:
+  """
+  查询结果统计摘要
+
+  结果行数较多时，用统计摘要代替前若干行原始数据交给大模型解读：
+  - 数值列：最小值、最大值、均值、合计、四分位数
+  - 类别列：不同取值数和出现最多的若干取值及占比
+  - 时间列：时间范围，以及按时间分段的记录数和各数值列合计
+  摘要的长度只与列数有关，与结果行数无关。
+  """
+
+  def __init__(self, top_k: int = 5, max_buckets: int = 12, max_columns: int = 20, sample_rows: int = 5):
+    self.top_k = top_k
+    self.max_buckets = max_buckets
+    self.max_columns = max_columns
+    self.sample_rows = sample_rows
+
+  @staticmethod
+  def _format_number(value: float) -> str:
+    if value is None or pd.isna(value):
+      return '-'
+    if float(value).is_integer():
+      return f'{int(value):,}'
+    return f'{value:,.2f}'
+
+  def _detect_datetime(self, series: pd.Series) -> Optional[pd.Series]:
+    """识别日期时间列：文本值大多能解析为日期时返回解析结果"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+      return series
+    if not (series.dtype == object or pd.api.types.is_string_dtype(series)):
+      return None
+    sample = series.dropna().head(50).astype(str)
+    # 至少形如 2024-01 的文本才当作日期，避免把编号、名称误判为日期
+    if sample.empty or not sample.str.match(r'^\d{4}[-/]\d{1,2}').all():
+      return None
+    parsed = pd.to_datetime(series, errors='coerce')
+    if parsed.notna().mean() < 0.9:
+      return None
+    return parsed
+
+  def _time_frequency(self, start: pd.Timestamp, end: pd.Timestamp) -> int:
+    """根据时间跨度选择分段粒度（TIME_FREQUENCIES中的下标），使分段数尽量不超过上限"""
+    span_days = (end - start).days
+    for index, days in enumerate((1, 31, 92)):
+      if span_days <= self.max_buckets * days:
+        return index
+    return len(TIME_FREQUENCIES) - 1
+
+  def _numeric_lines(self, df: pd.DataFrame, numeric_columns: List[str]) -> List[str]:
+    if not numeric_columns:
+      return []
+    stats = df[numeric_columns].agg(['count', 'min', 'max', 'mean', 'sum'])
+    quantiles = df[numeric_columns].quantile([0.25, 0.5, 0.75])
+    lines = ['数值列统计：']
+    for col in numeric_columns:
+      lines.append(
+        f"  - {col}: 最小 {self._format_number(stats.at['min', col])}，"
+        f"最大 {self._format_number(stats.at['max', col])}，"
+        f"均值 {self._format_number(stats.at['mean', col])}，"
+        f"合计 {self._format_number(stats.at['sum', col])}，"
+        f"四分位数 {self._format_number(quantiles.at[0.25, col])} / "
+        f"{self._format_number(quantiles.at[0.5, col])} / {self._format_number(quantiles.at[0.75, col])}，"
+        f"非空 {int(stats.at['count', col])} 条"
+      )
+    return lines
+
+  def _category_lines(self, df: pd.DataFrame, category_columns: List[str], total: int) -> List[str]:
+    if not category_columns:
+      return []
+    lines = ['类别列分布：']
+    for col in category_columns:
+      counts = df[col].astype(str).where(df[col].notna(), '(空)').value_counts()
+      top = counts.head(self.top_k)
+      parts = [f'{value} {count}条({count / total:.1%})' for value, count in top.items()]
+      others = total - int(top.sum())
+      if others > 0:
+        parts.append(f'其他 {others}条({others / total:.1%})')
+      lines.append(f"  - {col}: 共 {len(counts)} 个不同取值；{'，'.join(parts)}")
+    return lines
+
+  def _trend_lines(self, df: pd.DataFrame, col: str, parsed: pd.Series, numeric_columns: List[str]) -> List[str]:
+    valid = parsed.notna()
+    if not valid.any():
+      return []
+    start, end = parsed[valid].min(), parsed[valid].max()
+    freq, freq_name = TIME_FREQUENCIES[self._time_frequency(start, end)]
+    periods = parsed[valid].dt.to_period(freq)
+    grouped = df.loc[valid, numeric_columns].groupby(periods.values)
+    counts = grouped.size()
+    sums = grouped.sum() if numeric_columns else None
+
+    lines = [f'时间列 {col}: {start:%Y-%m-%d} 至 {end:%Y-%m-%d}，按{freq_name}分段：']
+    # 分段过多时合并相邻分段，保证摘要长度有界
+    step = max(1, int(np.ceil(len(counts) / self.max_buckets)))
+    for i in range(0, len(counts), step):
+      chunk = counts.index[i:i + step]
+      label = str(chunk[0]) if len(chunk) == 1 else f'{chunk[0]}~{chunk[-1]}'
+      parts = [f'{int(counts.loc[chunk].sum())}条']
+      for measure in numeric_columns[:3]:
+        parts.append(f'{measure}合计 {self._format_number(sums.loc[chunk, measure].sum())}')
+      lines.append(f"  - {label}: {'，'.join(parts)}")
+    return lines
+
+  def summarize(self, data: List[Dict[str, Any]], columns: List[str]) -> str:
+    """
+    生成查询结果的统计摘要文本
+
+    Args:
+      data: 查询结果
+      columns: 列名列表
+
+    Returns:
+      摘要文本
+    """
+    total = len(data)
+    columns = columns[:self.max_columns]
+    df = pd.DataFrame.from_records(data, columns=columns)
+
+    numeric_columns = []
+    category_columns = []
+    time_columns = {}
+    for col in columns:
+      series = df[col]
+      if pd.api.types.is_bool_dtype(series):
+        category_columns.append(col)
+      elif pd.api.types.is_numeric_dtype(series):
+        # 编号类字段的统计没有意义
+        if col.lower() == 'id' or col.lower().endswith('_id'):
+          continue
+        numeric_columns.append(col)
+      else:
+        parsed = self._detect_datetime(series)
+        if parsed is not None:
+          time_columns[col] = parsed
+        else:
+          category_columns.append(col)
+
+    lines = [f'查询结果共 {total} 条记录，{len(df.columns)} 列：{", ".join(columns)}', '']
+    lines.extend(self._numeric_lines(df, numeric_columns))
+    lines.extend(self._category_lines(df, category_columns, total))
+    for col, parsed in time_columns.items():
+      lines.extend(self._trend_lines(df, col, parsed, numeric_columns))
+
+    if self.sample_rows:
+      lines.append('')
+      lines.append(f'前 {min(self.sample_rows, total)} 条记录示例：')
+      lines.append(' | '.join(columns))
+      for row in data[:self.sample_rows]:
+        lines.append(' | '.join(str(row.get(col, ''))[:50] for col in columns))
+    return '\n'.join(lines)
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import threading
+import time
+from typing import Dict, List, Any
+from services.database_service import DatabaseService
+from services.metrics_service import metrics
+from config import Config
+
+SCHEMA_VERSION = metrics.gauge('aireport_schema_version', '当前加载的schema版本号')
+SCHEMA_RELOADS = metrics.counter('aireport_schema_reloads_total', 'schema重新加载次数', labelnames=('reason',))
+
+class SchemaSnapshot:
+  """某一版本的schema快照，创建后不再修改"""
+
+  def __init__(self, version: int, tables: List[Dict[str, Any]]):
+    self.version = version
+    self.tables = tables
+    self.loaded_at = time.time()
+    self._api_body = None
+    self._etag = None
+
+  def to_dict(self) -> Dict[str, Any]:
+    return {
+      'version': self.version,
+      'tables': len(self.tables),
+      'loadedAt': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.loaded_at)),
+    }
+
+  def _build_api_body(self):
+    tables = []
+    for table in self.tables:
+      tables.append({
+        'name': table['db_name'],
+        'naturalName': table['aliases'][0] if table['aliases'] else '',
+        'aliases': table['aliases'],
+        'description': table['description'],
+        'columns': [
+          {
+            'name': col['db_name'],
+            'naturalName': col['aliases'][0] if col['aliases'] else '',
+            'aliases': col['aliases'],
+            'type': col['type'],
+            'description': col['description'],
+          }
+          for col in table['columns']
+        ],
+      })
+    body = json.dumps({
+      'success': True,
+      'data': {'version': self.version, 'tables': tables},
+    }, ensure_ascii=False)
+    # 版本号之外再加上内容摘要：没有字段映射的表的实际字段变化不会递增版本号
+    self._etag = f'{self.version}-{hashlib.sha256(body.encode("utf-8")).hexdigest()[:16]}'
+    self._api_body = body
+
+  def api_body(self) -> str:
+    """/api/schema 的响应体（JSON），每个快照只序列化一次"""
+    if self._api_body is None:
+      self._build_api_body()
+    return self._api_body
+
+  def etag(self) -> str:
+    if self._etag is None:
+      self._build_api_body()
+    return self._etag
+
+class SchemaRegistry:
+  """
+  带版本号的schema注册表
+
+  映射表上的触发器在每次变化时递增 schema_version 中的版本号。读取快照时，
+  若距上次检查超过轮询间隔，则查询版本号，变化时重新加载并整体替换快照；
+  依赖schema的缓存（如系统提示词）按快照版本号判断是否需要重建。
+  """
+
+  def __init__(self, db_service: DatabaseService, poll_interval: float = None):
+    self.db_service = db_service
+    self.poll_interval = Config.SCHEMA_POLL_INTERVAL if poll_interval is None else poll_interval
+    self._reload_lock = threading.Lock()
+    self._last_check = 0.0
+    self._snapshot = None
+    self.reload(reason='startup')
+
+  def _load(self) -> SchemaSnapshot:
+    # 先读版本号再读schema：加载期间发生的变化会在下次检查时再次触发加载
+    version = self.db_service.get_schema_version()
+    return SchemaSnapshot(version, self.db_service.get_schema())
+
+  def reload(self, reason: str = 'manual') -> SchemaSnapshot:
+    """立即重新加载schema并替换快照"""
+    with self._reload_lock:
+      snapshot = self._load()
+      self._snapshot = snapshot
+      self._last_check = time.monotonic()
+    SCHEMA_VERSION.set(snapshot.version)
+    SCHEMA_RELOADS.inc(reason=reason)
+    return snapshot
+
+  def current(self) -> SchemaSnapshot:
+    """获取当前schema快照，按轮询间隔检查版本号"""
+    if time.monotonic() - self._last_check >= self.poll_interval:
+      # 只由一个线程检查，其他线程直接使用当前快照
+      if self._reload_lock.acquire(blocking=False):
+        try:
+          self._last_check = time.monotonic()
+          changed = self.db_service.get_schema_version() != self._snapshot.version
+        finally:
+          self._reload_lock.release()
+        if changed:
+          return self.reload(reason='version_change')
+    return self._snapshot
@@ -0,0 +1,78 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+from services.metrics_service import metrics
+
+SINGLE_FLIGHT_REQUESTS = metrics.counter(
+  'aireport_single_flight_requests_total',
+  '合并执行的请求数（leader为实际执行的请求，coalesced为等待并共享结果的请求）',
+  labelnames=('group', 'role'),
+)
+
+class _Call:
+  """一次进行中的计算"""
+
+  def __init__(self):
+    self.event = threading.Event()
+    self.result = None
+    self.error = None
+    self.waiters = 0
+
+class SingleFlight:
+  """
+  合并相同的并发请求
+
+  同一个key同时只有一个请求（leader）实际执行，期间到达的相同请求等待它完成并共享结果或异常；
+  只合并进行中的计算，完成后不缓存结果。
+  """
+
+  def __init__(self, group: str, enabled: bool = True):
+    self.group = group
+    self.enabled = enabled
+    self._calls: Dict[Hashable, _Call] = {}
+    self._lock = threading.Lock()
+
+  def do(self, key: Hashable, fn: Callable[[], Any], share: Optional[Callable[[Any], Any]] = None) -> Any:
+    """
+    执行 fn，相同key的并发调用只执行一次
+
+    Args:
+      key: 请求的key
+      fn: 实际执行的计算
+      share: 结果可变时传入复制函数，有其他请求共享结果时每个请求各得到一份副本
+
+    Returns:
+      计算结果
+    """
+    if not self.enabled:
+      return fn()
+    with self._lock:
+      call = self._calls.get(key)
+      leader = call is None
+      if leader:
+        call = _Call()
+        self._calls[key] = call
+      else:
+        call.waiters += 1
+
+    if not leader:
+      SINGLE_FLIGHT_REQUESTS.inc(group=self.group, role='coalesced')
+      call.event.wait()
+      if call.error is not None:
+        raise call.error
+      return share(call.result) if share else call.result
+
+    SINGLE_FLIGHT_REQUESTS.inc(group=self.group, role='leader')
+    try:
+      call.result = fn()
+    except Exception as e:
+      call.error = e
+      raise
+    finally:
+      # 先移除再通知，之后到达的相同请求重新执行
+      with self._lock:
+        self._calls.pop(key, None)
+      call.event.set()
+    # 有请求共享结果时leader也返回副本，调用方修改结果不影响其他请求
+    if share and call.waiters:
+      return share(call.result)
+    return call.result
@@ -0,0 +1,306 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Any, Optional, Tuple
+from services.database_service import DatabaseService
+from services.schema_registry import SchemaRegistry
+from services.metrics_service import metrics
+from config import Config
+
+SQL_TEMPLATE_REQUESTS = metrics.counter(
+  'aireport_sql_template_total',
+  'SQL模板缓存的查询和学习结果',
+  labelnames=('result',),
+)
+
+# SQL中的字符串和数值字面量
+SQL_LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'|(?<![\w.])\d+(?:\.\d+)?(?![\w.])")
+# 字面量前面的比较表达式，如 u.city = 、status LIKE
+COMPARISON_PATTERN = re.compile(r'([\w.]+)\s*(=|!=|<>|>=|<=|>|<|LIKE)\s*$', re.IGNORECASE)
+# 可以参数化的数值字面量前面的比较运算符或 LIMIT
+NUMBER_CONTEXT_PATTERN = re.compile(r'(?:=|!=|<>|>=|<=|>|<|\bLIMIT)\s*$', re.IGNORECASE)
+# 问题中紧跟在数字后面的日期单位，如“1月份”中的数字是日期的一部分，不作为数值槽位
+DATE_UNIT_PATTERN = re.compile(r'^\s*(?:年|月|日|号|季度|周)')
+TABLE_PATTERN = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+NUMBER_CAPTURE = r'(\d+(?:\.\d+)?)'
+# 取值需要在数据库中存在的比较运算
+VALUE_CHECK_OPERATORS = ('=', 'LIKE')
+SQL_KEYWORDS = {'WHERE', 'GROUP', 'ORDER', 'LIMIT', 'JOIN', 'LEFT', 'RIGHT', 'INNER', 'OUTER', 'CROSS', 'ON', 'HAVING', 'UNION'}
+
+def normalize_question(question: str) -> str:
+  return ' '.join(question.split())
+
+def _derived_from(value: str, question: str) -> bool:
+  """字符串取值是否来自问题：原样出现在问题中，或是由问题中的数字组成的日期（如“1月”对应 '01'）"""
+  if value in question:
+    return True
+  numbers = re.findall(r'\d+', value)
+  if not numbers or re.sub(r'[\d\s:/-]', '', value):
+    return False
+  question_numbers = {int(number) for number in re.findall(r'\d+', question)}
+  return any(int(number) in question_numbers for number in numbers)
+
+def _shape_pattern(value: str) -> str:
+  """由样例取值生成格式正则，如 2024-01-01 -> \\d{4}-\\d{2}-\\d{2}"""
+  parts = []
+  for run in re.finditer(r'\d+|\D', value):
+    text = run.group()
+    parts.append(f'\\d{{{len(text)}}}' if text.isdigit() else re.escape(text))
+  return '(' + ''.join(parts) + ')'
+
+class SQLTemplate:
+  """问题模板与SQL模板"""
+
+  def __init__(self, question_parts: List[Any], sql_parts: List[Any], slots: List[Dict[str, Any]],
+               schema_version: int, template_id: int = None):
+    # question_parts、sql_parts 由固定文本（字符串）和槽位序号（整数）交替组成
+    self.question_parts = question_parts
+    self.sql_parts = sql_parts
+    self.slots = slots
+    self.schema_version = schema_version
+    self.template_id = template_id
+    self.hits = 0
+    self.last_used = time.time()
+    pattern = ''
+    for part in question_parts:
+      pattern += re.escape(part) if isinstance(part, str) else slots[part]['pattern']
+    self.regex = re.compile(pattern)
+    self.key = ''.join(part if isinstance(part, str) else f'{{{part}}}' for part in question_parts)
+
+  @property
+  def prefix(self) -> str:
+    return self.question_parts[0] if self.question_parts and isinstance(self.question_parts[0], str) else ''
+
+  def render(self, values: List[str]) -> str:
+    """用槽位取值生成SQL"""
+    sql = []
+    for part in self.sql_parts:
+      if isinstance(part, str):
+        sql.append(part)
+        continue
+      slot = self.slots[part]
+      if slot['type'] == 'number':
+        sql.append(values[part])
+      else:
+        literal = slot['prefix'] + values[part] + slot['suffix']
+        sql.append("'" + literal.replace("'", "''") + "'")
+    return ''.join(sql)
+
+class SQLTemplateCache:
+  """
+  参数化SQL模板缓存
+
+  大模型生成SQL后，把SQL中出现在问题里的字面量（城市、状态、日期、数值等）替换为槽位，
+  得到“问题模板 -> SQL模板”。之后只在这些取值上不同的问题（如“北京的用户”和“上海的用户”）
+  直接代入生成SQL。字符串槽位会识别其比较的字段，等值和LIKE比较的取值需要在数据库中存在，
+  其他比较（如日期范围）的取值需要与学习时的格式一致。数值只在比较和 LIMIT 中参数化；SQL中来自问题
+  但无法参数化的取值会在其他问题中保持不变，这类SQL不学习。模板按schema版本隔离，数量有上限。
+  """
+
+  def __init__(self, db_service: DatabaseService, schema_registry: SchemaRegistry,
+               path: str = None, max_templates: int = None):
+    self.db_service = db_service
+    self.schema_registry = schema_registry
+    self.path = path or Config.SQL_TEMPLATE_PATH
+    self.max_templates = Config.SQL_TEMPLATE_MAX if max_templates is None else max_templates
+    self._lock = threading.Lock()
+    self._templates = {}
+
+    template_dir = os.path.dirname(self.path)
+    if template_dir and not os.path.exists(template_dir):
+      os.makedirs(template_dir, exist_ok=True)
+    self._connection = sqlite3.connect(self.path, check_same_thread=False)
+    self._connection.execute("""
+      CREATE TABLE IF NOT EXISTS sql_templates (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        schema_version INTEGER NOT NULL,
+        question_template TEXT NOT NULL,
+        template TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        UNIQUE(schema_version, question_template)
+      )
+    """)
+    self._connection.commit()
+    self._load()
+
+  def _load(self):
+    """加载当前schema版本的模板"""
+    version = self.schema_registry.current().version
+    rows = self._connection.execute(
+      'SELECT id, template FROM sql_templates WHERE schema_version = ? ORDER BY id DESC LIMIT ?',
+      (version, self.max_templates),
+    ).fetchall()
+    for template_id, data in rows:
+      data = json.loads(data)
+      template = SQLTemplate(data['question_parts'], data['sql_parts'], data['slots'], version, template_id)
+      self._templates[template.key] = template
+
+  def _current_templates(self) -> List[SQLTemplate]:
+    version = self.schema_registry.current().version
+    with self._lock:
+      if any(t.schema_version != version for t in self._templates.values()):
+        self._templates = {}
+        self._load()
+      return list(self._templates.values())
+
+  def _resolve_tables(self, sql: str) -> Dict[str, str]:
+    """SQL中的表别名 -> 表名"""
+    aliases = {}
+    for table, alias in TABLE_PATTERN.findall(sql):
+      aliases[table.lower()] = table
+      if alias and alias.upper() not in SQL_KEYWORDS:
+        aliases[alias.lower()] = table
+    return aliases
+
+  def _resolve_column(self, reference: str, aliases: Dict[str, str]) -> Optional[Tuple[str, str]]:
+    """字段引用（可带表别名）-> (表名, 字段名)，无法唯一确定时返回None"""
+    tables = {t['db_name']: {c['db_name'] for c in t['columns']} for t in self.schema_registry.current().tables}
+    if '.' in reference:
+      alias, column = reference.split('.', 1)
+      table = aliases.get(alias.lower())
+      return (table, column) if table in tables and column in tables[table] else None
+    owners = [table for table in set(aliases.values()) if table in tables and reference in tables[table]]
+    return (owners[0], reference) if len(owners) == 1 else None
+
+  def _extract(self, question: str, sql: str) -> Optional[SQLTemplate]:
+    """从问题和SQL中提取模板，无法可靠提取时返回None"""
+    aliases = self._resolve_tables(sql)
+    slots = []
+    sql_parts = []
+    spans = []
+    # 没有参数化的字符串取值
+    constants = []
+    position = 0
+    for match in SQL_LITERAL_PATTERN.finditer(sql):
+      literal = match.group()
+      if literal.startswith("'"):
+        value = literal[1:-1].replace("''", "'")
+        core = value.strip('%')
+        prefix = value[:len(value) - len(value.lstrip('%'))]
+        suffix = value[len(prefix) + len(core):]
+        slot_type = 'string'
+      else:
+        core, prefix, suffix, slot_type = literal, '', '', 'number'
+      if slot_type == 'string':
+        constants.append(core)
+      # 只有在问题中恰好出现一次的字面量才参数化
+      if not core or question.count(core) != 1:
+        continue
+      start = question.index(core)
+      after = start + len(core)
+      if slot_type == 'number' and (
+        question[start - 1:start].isdigit() or question[after:after + 1].isdigit()
+        # 只参数化比较和 LIMIT 中的数值，日期中的数字（“1月份”）不参数化
+        or not NUMBER_CONTEXT_PATTERN.search(sql[:match.start()])
+        or DATE_UNIT_PATTERN.match(question[after:])
+      ):
+        continue
+
+      slot = {'type': slot_type, 'prefix': prefix, 'suffix': suffix}
+      if slot_type == 'number':
+        slot['pattern'] = NUMBER_CAPTURE
+      else:
+        comparison = COMPARISON_PATTERN.search(sql[:match.start()])
+        if not comparison:
+          continue
+        resolved = self._resolve_column(comparison.group(1), aliases)
+        if resolved is None:
+          continue
+        constants.pop()
+        slot['table'], slot['column'] = resolved
+        slot['operator'] = comparison.group(2).upper()
+        slot['pattern'] = '(.+?)' if slot['operator'] in VALUE_CHECK_OPERATORS else _shape_pattern(core)
+
+      if any(start < end and start + len(core) > begin for begin, end in spans):
+        return None
+      sql_parts.append(sql[position:match.start()])
+      sql_parts.append(len(slots))
+      position = match.end()
+      slots.append(slot)
+      spans.append((start, start + len(core)))
+    sql_parts.append(sql[position:])
+    # 来自问题但没有参数化的字符串取值（如“1月份”对应的 '01'）在其他问题中会保持不变，不学习
+    if any(_derived_from(value, question) for value in constants if value):
+      return None
+
+    # 按在问题中的位置切分问题；相邻的槽位无法区分边界，不学习
+    question_parts = []
+    position = 0
+    for index in sorted(range(len(spans)), key=lambda i: spans[i][0]):
+      begin, end = spans[index]
+      if question_parts and begin == position:
+        return None
+      question_parts.append(question[position:begin])
+      question_parts.append(index)
+      position = end
+    question_parts.append(question[position:])
+    return SQLTemplate(question_parts, sql_parts, slots, self.schema_registry.current().version)
+
+  def _value_exists(self, slot: Dict[str, Any], value: str) -> bool:
+    sql = f"SELECT 1 AS found FROM {slot['table']} WHERE {slot['column']} {slot['operator']} ? LIMIT 1"
+    try:
+      return bool(self.db_service.execute_query(sql, (slot['prefix'] + value + slot['suffix'],)))
+    except Exception:
+      return False
+
+  def lookup(self, question: str) -> Optional[str]:
+    """
+    查找与问题匹配的模板并生成SQL
+
+    Args:
+      question: 自然语言问题
+
+    Returns:
+      生成的SQL，没有匹配的模板时返回None
+    """
+    question = normalize_question(question)
+    for template in self._current_templates():
+      if not question.startswith(template.prefix):
+        continue
+      match = template.regex.fullmatch(question)
+      if not match:
+        continue
+      values = list(match.groups())
+      valid = True
+      for slot, value in zip(template.slots, values):
+        if slot['type'] == 'string' and slot['operator'] in VALUE_CHECK_OPERATORS and not self._value_exists(slot, value):
+          valid = False
+          break
+      if not valid:
+        continue
+      template.hits += 1
+      template.last_used = time.time()
+      SQL_TEMPLATE_REQUESTS.inc(result='hit')
+      return template.render(values)
+    SQL_TEMPLATE_REQUESTS.inc(result='miss')
+    return None
+
+  def learn(self, question: str, sql: str):
+    """从大模型生成的SQL学习模板"""
+    question = normalize_question(question)
+    template = self._extract(question, sql)
+    if template is None:
+      SQL_TEMPLATE_REQUESTS.inc(result='rejected')
+      return
+    data = json.dumps({
+      'question_parts': template.question_parts,
+      'sql_parts': template.sql_parts,
+      'slots': template.slots,
+    }, ensure_ascii=False)
+    with self._lock:
+      cursor = self._connection.execute(
+        'INSERT OR REPLACE INTO sql_templates (schema_version, question_template, template, created_at) VALUES (?, ?, ?, ?)',
+        (template.schema_version, template.key, data, time.time()),
+      )
+      template.template_id = cursor.lastrowid
+      self._templates[template.key] = template
+      # 超出上限时淘汰最久未使用的模板
+      while len(self._templates) > self.max_templates:
+        oldest = min(self._templates.values(), key=lambda t: t.last_used)
+        del self._templates[oldest.key]
+        self._connection.execute('DELETE FROM sql_templates WHERE id = ?', (oldest.template_id,))
+      self._connection.commit()
+    SQL_TEMPLATE_REQUESTS.inc(result='learned')
@@ -0,0 +1,151 @@
+"""SQLite与DuckDB执行引擎的结果一致性和耗时对比
+
+在合成数据上分别用SQLite和DuckDB执行可以转换为DuckDB写法的聚合查询（大模型桩服务中的预置SQL、
+报表图表聚合查询），逐行比较结果（浮点数按相对误差比较）并输出两者的耗时。任一查询结果不一致时以非零状态退出。
+
+示例:
+  python benchmark/engine_parity.py --scale 10
+  python benchmark/engine_parity.py --db bench.db --mode copy --repeat 5
+"""
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List, Any, Optional
+
+from mock_llm_server import DEFAULT_CANNED_SQL
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'database'))
+
+from data_generator import DataGenerator
+
+CHART_CASES = [
+  {'category': {'table': 'orders', 'field': 'status'}, 'value': {'table': 'orders', 'field': 'amount', 'agg': 'sum'}},
+  {'category': {'table': 'orders', 'field': 'status'}, 'value': {'table': 'orders', 'agg': 'count'}},
+  {'category': {'table': 'orders', 'field': 'status'}, 'value': {'table': 'orders', 'field': 'amount', 'agg': 'avg'}},
+  {'category': {'table': 'orders', 'field': 'order_date'}, 'value': {'table': 'orders', 'field': 'amount', 'agg': 'sum'}, 'time_bucket': 'month'},
+  {'category': {'table': 'orders', 'field': 'order_date'}, 'value': {'table': 'orders', 'field': 'amount', 'agg': 'max'}, 'time_bucket': 'year'},
+  {'category': {'table': 'orders', 'field': 'product_name'}, 'value': {'table': 'orders', 'field': 'amount', 'agg': 'min'}},
+]
+
+EXTRA_SQL = [
+  'SELECT COUNT(*) AS total, SUM(amount) AS total_amount, AVG(amount) AS avg_amount FROM orders',
+  "SELECT status, COUNT(*) AS order_count FROM orders WHERE order_date >= '2023-01-01' GROUP BY status ORDER BY order_count DESC",
+  'SELECT u.city, SUM(o.amount) AS total_amount FROM orders o JOIN users u ON o.user_id = u.id GROUP BY u.city ORDER BY total_amount DESC',
+  # 转换为整数：SQLite截断小数，DuckDB四舍五入
+  'SELECT status, SUM(CAST(amount AS INTEGER)) AS total_amount FROM orders GROUP BY status',
+  'SELECT CAST(AVG(amount) AS INTEGER) AS avg_amount FROM orders',
+  # 排序字段有大量相同值时 LIMIT 截取的行
+  'SELECT user_id, COUNT(*) AS order_count FROM orders GROUP BY user_id ORDER BY order_count DESC LIMIT 10',
+  'SELECT status, user_id, COUNT(*) AS order_count FROM orders GROUP BY status, user_id ORDER BY order_count DESC, status LIMIT 20',
+]
+
+def values_equal(left: Any, right: Any, tolerance: float) -> bool:
+  if isinstance(left, float) or isinstance(right, float):
+    if left is None or right is None:
+      return left is right
+    return math.isclose(float(left), float(right), rel_tol=tolerance, abs_tol=tolerance)
+  return left == right
+
+def compare_rows(expected: List[Dict[str, Any]], actual: List[Dict[str, Any]], tolerance: float) -> Optional[str]:
+  """逐行比较，返回第一处不一致的说明，一致时返回None"""
+  if len(expected) != len(actual):
+    return f'行数不同: SQLite {len(expected)}，DuckDB {len(actual)}'
+  for index, (left, right) in enumerate(zip(expected, actual)):
+    if list(left.keys()) != list(right.keys()):
+      return f'列不同: SQLite {list(left.keys())}，DuckDB {list(right.keys())}'
+    for key in left:
+      if not values_equal(left[key], right[key], tolerance):
+        return f'第{index + 1}行 {key} 不同: SQLite {left[key]!r}，DuckDB {right[key]!r}'
+  return None
+
+def timed(run, repeat: int) -> (List[Dict[str, Any]], float):
+  """执行repeat次，返回结果和最短耗时（毫秒）"""
+  best = None
+  rows = None
+  for _ in range(repeat):
+    start = time.perf_counter()
+    rows = run()
+    elapsed = (time.perf_counter() - start) * 1000
+    best = elapsed if best is None else min(best, elapsed)
+  return rows, best
+
+def build_cases(report_service) -> List[Dict[str, str]]:
+  cases = [{'name': question, 'sql': sql} for question, sql in DEFAULT_CANNED_SQL.items()]
+  cases += [{'name': f'sql#{index + 1}', 'sql': sql} for index, sql in enumerate(EXTRA_SQL)]
+  base_config = report_service._normalize_query_config({'tables': ['orders'], 'fields': []})
+  for index, chart in enumerate(CHART_CASES):
+    sql, _ = report_service._build_report_sql(report_service._chart_query_config(base_config, chart))
+    cases.append({'name': f'chart#{index + 1} {chart["value"]["agg"]}', 'sql': sql})
+  return cases
+
+def main():
+  parser = argparse.ArgumentParser(description='SQLite与DuckDB执行引擎的结果一致性和耗时对比')
+  parser.add_argument('--scale', type=float, default=1.0, help='合成数据规模因子，1对应1万条订单（默认: 1）')
+  parser.add_argument('--seed', type=int, default=42, help='随机种子')
+  parser.add_argument('--db', help='使用已有的数据库，不重新生成数据')
+  parser.add_argument('--mode', default='auto', choices=['auto', 'attach', 'copy'], help='DuckDB读取数据的方式')
+  parser.add_argument('--repeat', type=int, default=3, help='每个查询在每个引擎上的执行次数，取最短耗时')
+  parser.add_argument('--tolerance', type=float, default=1e-6, help='浮点数比较的相对误差')
+  args = parser.parse_args()
+
+  db_path = args.db
+  if not db_path:
+    db_path = os.path.join(tempfile.mkdtemp(prefix='aireport-parity-'), 'parity.db')
+    print(f'生成合成数据 -> {db_path}')
+    DataGenerator(db_path, args.scale, args.seed).generate()
+
+  # 后端配置在导入时读取环境变量
+  os.environ['DB_PATH'] = os.path.abspath(db_path)
+  os.environ['DB_REPLICA_PATH'] = ''
+  os.environ['QUERY_ENGINE'] = 'sqlite'
+  os.environ['SINGLE_FLIGHT_ENABLED'] = 'False'
+  sys.path.insert(0, os.path.join(ROOT_DIR, 'backend'))
+  from services.database_service import DatabaseService, PRIMARY_TABLES_PATTERN
+  from services.report_service import ReportService
+  from services.query_engine import DuckDBEngine, duckdb_sql
+
+  db_service = DatabaseService()
+  report_service = ReportService(db_service)
+  sqlite_engine = db_service.engines['sqlite']
+  duckdb_engine = DuckDBEngine(db_service, mode=args.mode, sync_interval=0, skip_tables=PRIMARY_TABLES_PATTERN)
+  print(f'DuckDB模式: {duckdb_engine.mode}')
+  deadline = time.time() + 600
+  while not duckdb_engine.ready():
+    if duckdb_engine.last_error:
+      raise Exception(duckdb_engine.last_error)
+    if time.time() > deadline:
+      raise Exception('等待DuckDB同步超时')
+    time.sleep(0.2)
+
+  failures = 0
+  print(f'\n{"查询":<32} {"SQLite(ms)":>11} {"DuckDB(ms)":>11} {"加速比":>7}  结果')
+  for case in build_cases(report_service):
+    translated = duckdb_sql(case['sql'])
+    if translated is None:
+      print(f'{case["name"]:<32} {"":>11} {"":>11} {"":>7}  跳过（不适合DuckDB执行）')
+      continue
+    expected, sqlite_ms = timed(lambda: sqlite_engine.execute(case['sql']), args.repeat)
+    try:
+      actual, duckdb_ms = timed(lambda: duckdb_engine.execute(translated), args.repeat)
+    except Exception as e:
+      # 实际运行时会改用SQLite执行，不算作不一致
+      print(f'{case["name"]:<32} {sqlite_ms:>11.1f} {"":>11} {"":>7}  DuckDB执行失败，改用SQLite: {e}')
+      continue
+    problem = compare_rows(expected, actual, args.tolerance)
+    if problem:
+      failures += 1
+    print(f'{case["name"]:<32} {sqlite_ms:>11.1f} {duckdb_ms:>11.1f} {sqlite_ms / max(duckdb_ms, 1e-6):>6.1f}x  {problem or "一致"}')
+
+  duckdb_engine.close()
+  db_service.close()
+  if failures:
+    print(f'\n{failures} 个查询结果不一致')
+    sys.exit(1)
+  print('\n所有查询结果一致')
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,141 @@
+"""OpenAI兼容的大模型桩服务，用于离线基准测试
+
+只实现 POST /v1/chat/completions：
+- 系统提示词是SQL生成提示词时，按用户问题返回预置的SQL
+- 其他请求（结果解读）返回固定的解读文本
+每个请求按配置的延迟和抖动休眠后返回，模拟真实大模型的耗时。
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+# 默认的问题到SQL映射，与 run_benchmark.py 中的问题集对应
+DEFAULT_CANNED_SQL = {
+  '查询所有用户': 'SELECT * FROM users LIMIT 100',
+  '每个城市的用户数': 'SELECT city, COUNT(*) AS user_count FROM users GROUP BY city',
+  '按状态统计订单数量': 'SELECT status, COUNT(*) AS order_count FROM orders GROUP BY status',
+  '每个月的订单总金额': "SELECT strftime('%Y-%m', order_date) AS month, SUM(amount) AS total_amount FROM orders GROUP BY month ORDER BY month",
+  '订单金额最高的前10个用户': 'SELECT u.name, SUM(o.amount) AS total_amount FROM orders o JOIN users u ON o.user_id = u.id GROUP BY u.id ORDER BY total_amount DESC LIMIT 10',
+  '每个分类的产品平均价格': 'SELECT category, AVG(price) AS avg_price FROM products GROUP BY category',
+  '北京的用户': "SELECT * FROM users WHERE city = '北京' LIMIT 100",
+  '年龄大于30的用户数量': 'SELECT COUNT(*) AS user_count FROM users WHERE age > 30',
+}
+
+DEFAULT_SQL = 'SELECT COUNT(*) AS total FROM users'
+INTERPRETATION_TEXT = '查询结果显示数据分布较为集中，主要指标保持稳定。（基准测试桩服务返回的固定解读）'
+
+class MockLLMServer:
+  """在后台线程中运行的大模型桩服务"""
+
+  def __init__(self, host: str = '127.0.0.1', port: int = 0, latency_ms: float = 200.0,
+               jitter_ms: float = 50.0, canned_sql: Dict[str, str] = None, seed: int = 42):
+    self.latency_ms = latency_ms
+    self.jitter_ms = jitter_ms
+    self.canned_sql = dict(DEFAULT_CANNED_SQL)
+    if canned_sql:
+      self.canned_sql.update(canned_sql)
+    self._random = random.Random(seed)
+    self._random_lock = threading.Lock()
+    self.request_count = 0
+    self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+    self.httpd.daemon_threads = True
+    self._thread = None
+
+  @property
+  def base_url(self) -> str:
+    host, port = self.httpd.server_address[:2]
+    return f'http://{host}:{port}/v1'
+
+  def _delay(self) -> float:
+    """本次请求的模拟延迟（秒）"""
+    with self._random_lock:
+      jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms)
+    return max(0.0, self.latency_ms + jitter) / 1000
+
+  def _answer(self, payload: dict) -> str:
+    """根据请求内容生成回答"""
+    messages = payload.get('messages', [])
+    system = next((m.get('content', '') for m in messages if m.get('role') == 'system'), '')
+    user = next((m.get('content', '') for m in reversed(messages) if m.get('role') == 'user'), '')
+    if 'SQL' in system:
+      return self.canned_sql.get(user.strip(), DEFAULT_SQL)
+    return INTERPRETATION_TEXT
+
+  def _make_handler(self):
+    server = self
+
+    class Handler(BaseHTTPRequestHandler):
+      def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+          self.send_error(404)
+          return
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+          payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+          self.send_error(400)
+          return
+
+        with server._random_lock:
+          server.request_count += 1
+          request_number = server.request_count
+        time.sleep(server._delay())
+        body = json.dumps({
+          'id': f'mock-{request_number}',
+          'object': 'chat.completion',
+          'model': payload.get('model', 'mock'),
+          'choices': [{
+            'index': 0,
+            'message': {'role': 'assistant', 'content': server._answer(payload)},
+            'finish_reason': 'stop',
+          }],
+        }, ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+      def log_message(self, format, *args):
+        pass
+
+    return Handler
+
+  def start(self):
+    """在后台线程启动服务"""
+    self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+    self._thread.start()
+    return self
+
+  def stop(self):
+    """停止服务"""
+    self.httpd.shutdown()
+    self.httpd.server_close()
+
+def main():
+  parser = argparse.ArgumentParser(description='OpenAI兼容的大模型桩服务')
+  parser.add_argument('--host', default='127.0.0.1')
+  parser.add_argument('--port', type=int, default=8900)
+  parser.add_argument('--latency-ms', type=float, default=200.0, help='平均响应延迟（毫秒）')
+  parser.add_argument('--jitter-ms', type=float, default=50.0, help='延迟抖动范围（毫秒）')
+  parser.add_argument('--canned', help='JSON文件，格式为 {"问题": "SQL"}，覆盖或补充默认映射')
+  args = parser.parse_args()
+
+  canned_sql = None
+  if args.canned:
+    with open(args.canned, 'r', encoding='utf-8') as f:
+      canned_sql = json.load(f)
+
+  server = MockLLMServer(args.host, args.port, args.latency_ms, args.jitter_ms, canned_sql)
+  print(f'大模型桩服务已启动: {server.base_url}')
+  try:
+    server.httpd.serve_forever()
+  except KeyboardInterrupt:
+    server.stop()
+
+if __name__ == '__main__':
+  main()
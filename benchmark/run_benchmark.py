@@ -0,0 +1,314 @@
+"""后端热点路径的离线基准测试
+
+启动大模型桩服务和独立数据库上的后端进程，按固定并发压测：
+- POST /api/query（NL2SQL + SQL执行 + 结果解读）
+- POST /api/reports/execute（报表查询）
+- 报表CRUD（创建、读取、更新、删除）
+输出每个场景的吞吐量、p50/p95/p99延迟和各阶段耗时，可与基线结果比较以发现性能回退。
+
+示例:
+  python benchmark/run_benchmark.py --scale 10 --concurrency 1,8,32 --duration 20
+  python benchmark/run_benchmark.py --output bench.json --baseline bench_main.json
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Callable
+
+import requests
+
+from mock_llm_server import MockLLMServer, DEFAULT_CANNED_SQL
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(ROOT_DIR, 'backend')
+sys.path.insert(0, os.path.join(ROOT_DIR, 'database'))
+
+from data_generator import DataGenerator
+
+QUESTIONS = list(DEFAULT_CANNED_SQL.keys())
+
+REPORT_QUERY_CONFIGS = [
+  {
+    'tables': ['orders'],
+    'fields': [
+      {'field': 'status', 'alias': 'status'},
+      {'field': 'COUNT(*)', 'alias': 'order_count'},
+    ],
+    'group_by': ['status'],
+  },
+  {
+    'tables': ['orders'],
+    'fields': [
+      {'field': "strftime('%Y-%m', order_date)", 'alias': 'month'},
+      {'field': 'SUM(amount)', 'alias': 'total_amount'},
+    ],
+    'group_by': ['month'],
+    'order_by': [{'field': 'month', 'direction': 'ASC'}],
+  },
+  {
+    'tables': ['users'],
+    'fields': [
+      {'table': 'users', 'field': 'city', 'alias': 'city'},
+      {'table': 'users', 'field': 'name', 'alias': 'name'},
+    ],
+    'filters': [{'field': 'age', 'operator': '>', 'value': 30}],
+  },
+]
+
+def percentile(sorted_values: List[float], p: float) -> float:
+  """计算已排序数据的百分位数（线性插值）"""
+  if not sorted_values:
+    return 0.0
+  k = (len(sorted_values) - 1) * p / 100
+  lower = int(k)
+  upper = min(lower + 1, len(sorted_values) - 1)
+  return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+class BackendProcess:
+  """以子进程方式运行后端，指向基准测试数据库和大模型桩服务"""
+
+  def __init__(self, db_path: str, llm_base_url: str, port: int):
+    self.port = port
+    self.base_url = f'http://127.0.0.1:{port}'
+    env = dict(os.environ)
+    env.update({
+      'DB_PATH': db_path,
+      'PORT': str(port),
+      'DEBUG': 'False',
+      'LLM_PROVIDER': 'openai',
+      'OPENAI_BASE_URL': llm_base_url,
+      'OPENAI_API_KEY': 'benchmark',
+    })
+    self.process = subprocess.Popen(
+      [sys.executable, 'app.py'],
+      cwd=BACKEND_DIR,
+      env=env,
+      stdout=subprocess.DEVNULL,
+      stderr=subprocess.DEVNULL,
+    )
+
+  def wait_ready(self, timeout: float = 30.0):
+    """等待后端健康检查通过"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+      if self.process.poll() is not None:
+        raise Exception('后端进程启动失败')
+      try:
+        if requests.get(f'{self.base_url}/api/health', timeout=1).ok:
+          return
+      except requests.exceptions.RequestException:
+        pass
+      time.sleep(0.2)
+    raise Exception('等待后端启动超时')
+
+  def stop(self):
+    """停止后端进程"""
+    self.process.terminate()
+    try:
+      self.process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+      self.process.kill()
+
+class Scenario:
+  """一个压测场景，run_once执行一次操作并返回服务端各阶段耗时"""
+
+  def __init__(self, name: str, run_once: Callable[[requests.Session, random.Random], Dict[str, float]]):
+    self.name = name
+    self.run_once = run_once
+
+def build_scenarios(base_url: str) -> List[Scenario]:
+  """构建压测场景"""
+
+  def query(session, rng):
+    response = session.post(f'{base_url}/api/query', json={'query': rng.choice(QUESTIONS), 'timings': True})
+    response.raise_for_status()
+    result = response.json()
+    if not result.get('success'):
+      raise Exception(result.get('message'))
+    return result.get('timings', {})
+
+  def report_execute(session, rng):
+    response = session.post(f'{base_url}/api/reports/execute', json={
+      'query_config': rng.choice(REPORT_QUERY_CONFIGS),
+      'timings': True,
+    })
+    response.raise_for_status()
+    result = response.json()
+    if not result.get('success'):
+      raise Exception(result.get('message'))
+    return result.get('timings', {})
+
+  def report_crud(session, rng):
+    payload = {
+      'name': f'基准测试报表{rng.randint(0, 1 << 30)}',
+      'description': '',
+      'data_source': 'default',
+      'layout_config': {'layout': [], 'widgets': []},
+      'query_config': REPORT_QUERY_CONFIGS[0],
+    }
+    response = session.post(f'{base_url}/api/reports', json=payload)
+    response.raise_for_status()
+    report_id = response.json()['data']['id']
+    session.get(f'{base_url}/api/reports/{report_id}').raise_for_status()
+    session.put(f'{base_url}/api/reports/{report_id}', json={'description': 'updated'}).raise_for_status()
+    session.delete(f'{base_url}/api/reports/{report_id}').raise_for_status()
+    return {}
+
+  return [
+    Scenario('query', query),
+    Scenario('report_execute', report_execute),
+    Scenario('report_crud', report_crud),
+  ]
+
+def run_scenario(scenario: Scenario, concurrency: int, duration: float, seed: int) -> Dict[str, Any]:
+  """以固定并发运行场景指定时长"""
+  latencies = []
+  stage_timings = {}
+  errors = []
+  lock = threading.Lock()
+  deadline = time.perf_counter() + duration
+
+  def worker(worker_id: int):
+    rng = random.Random(seed + worker_id)
+    session = requests.Session()
+    while time.perf_counter() < deadline:
+      start = time.perf_counter()
+      try:
+        timings = scenario.run_once(session, rng)
+      except Exception as e:
+        with lock:
+          errors.append(str(e))
+        continue
+      elapsed_ms = (time.perf_counter() - start) * 1000
+      with lock:
+        latencies.append(elapsed_ms)
+        for stage, value in (timings or {}).items():
+          stage_timings.setdefault(stage, []).append(value)
+
+  start = time.perf_counter()
+  with ThreadPoolExecutor(max_workers=concurrency) as executor:
+    list(executor.map(worker, range(concurrency)))
+  elapsed = time.perf_counter() - start
+
+  latencies.sort()
+  stages = {}
+  for stage, values in sorted(stage_timings.items()):
+    values.sort()
+    stages[stage] = {
+      'p50': percentile(values, 50),
+      'p95': percentile(values, 95),
+      'p99': percentile(values, 99),
+    }
+  return {
+    'scenario': scenario.name,
+    'concurrency': concurrency,
+    'requests': len(latencies),
+    'errors': len(errors),
+    'first_error': errors[0] if errors else None,
+    'throughput': len(latencies) / elapsed if elapsed > 0 else 0.0,
+    'latency_ms': {
+      'p50': percentile(latencies, 50),
+      'p95': percentile(latencies, 95),
+      'p99': percentile(latencies, 99),
+    },
+    'stages_ms': stages,
+  }
+
+def print_result(result: Dict[str, Any]):
+  """打印单个场景的结果"""
+  latency = result['latency_ms']
+  print(
+    f"{result['scenario']:<16} c={result['concurrency']:<4} "
+    f"req={result['requests']:<7} err={result['errors']:<4} "
+    f"rps={result['throughput']:<9.1f} "
+    f"p50={latency['p50']:<8.1f} p95={latency['p95']:<8.1f} p99={latency['p99']:.1f}"
+  )
+  for stage, values in result['stages_ms'].items():
+    print(f"    {stage:<24} p50={values['p50']:<8.2f} p95={values['p95']:<8.2f} p99={values['p99']:.2f}")
+  if result['first_error']:
+    print(f"    首个错误: {result['first_error']}")
+
+def compare_with_baseline(results: List[Dict[str, Any]], baseline_path: str, max_regression: float) -> List[str]:
+  """与基线结果比较p95延迟，返回超过阈值的回退项"""
+  with open(baseline_path, 'r', encoding='utf-8') as f:
+    baseline = {(r['scenario'], r['concurrency']): r for r in json.load(f)['results']}
+
+  regressions = []
+  for result in results:
+    base = baseline.get((result['scenario'], result['concurrency']))
+    if not base or not base['latency_ms']['p95']:
+      continue
+    ratio = result['latency_ms']['p95'] / base['latency_ms']['p95'] - 1
+    if ratio > max_regression:
+      regressions.append(
+        f"{result['scenario']} c={result['concurrency']}: p95 "
+        f"{base['latency_ms']['p95']:.1f}ms -> {result['latency_ms']['p95']:.1f}ms (+{ratio:.0%})"
+      )
+  return regressions
+
+def main():
+  parser = argparse.ArgumentParser(description='后端离线基准测试')
+  parser.add_argument('--scale', type=float, default=1.0, help='合成数据规模因子，1对应1万条订单（默认: 1）')
+  parser.add_argument('--concurrency', default='1,8,32', help='并发级别，逗号分隔（默认: 1,8,32）')
+  parser.add_argument('--duration', type=float, default=10.0, help='每个场景每个并发级别的压测时长（秒）')
+  parser.add_argument('--scenarios', default='query,report_execute,report_crud', help='要运行的场景，逗号分隔')
+  parser.add_argument('--llm-latency-ms', type=float, default=200.0, help='大模型桩服务的平均延迟')
+  parser.add_argument('--llm-jitter-ms', type=float, default=50.0, help='大模型桩服务的延迟抖动')
+  parser.add_argument('--port', type=int, default=5099, help='后端进程端口')
+  parser.add_argument('--seed', type=int, default=42, help='随机种子')
+  parser.add_argument('--db', help='复用已有的基准测试数据库，不重新生成数据')
+  parser.add_argument('--output', help='将结果写入JSON文件')
+  parser.add_argument('--baseline', help='基线结果JSON文件，p95回退超过阈值时以非零状态退出')
+  parser.add_argument('--max-regression', type=float, default=0.2, help='允许的p95回退比例（默认: 0.2）')
+  args = parser.parse_args()
+
+  work_dir = tempfile.mkdtemp(prefix='aireport-bench-')
+  db_path = args.db
+  if not db_path:
+    db_path = os.path.join(work_dir, 'bench.db')
+    print(f'生成合成数据 -> {db_path}')
+    start = time.perf_counter()
+    DataGenerator(db_path, args.scale, args.seed).generate()
+    print(f'数据生成耗时: {time.perf_counter() - start:.1f}s')
+
+  llm_server = MockLLMServer(latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms, seed=args.seed).start()
+  backend = BackendProcess(db_path, llm_server.base_url, args.port)
+  results = []
+  try:
+    backend.wait_ready()
+    scenarios = {s.name: s for s in build_scenarios(backend.base_url)}
+    levels = [int(level) for level in args.concurrency.split(',') if level.strip()]
+    for name in [n.strip() for n in args.scenarios.split(',') if n.strip()]:
+      if name not in scenarios:
+        raise Exception(f'未知场景: {name}')
+      for concurrency in levels:
+        result = run_scenario(scenarios[name], concurrency, args.duration, args.seed)
+        print_result(result)
+        results.append(result)
+  finally:
+    backend.stop()
+    llm_server.stop()
+
+  if args.output:
+    with open(args.output, 'w', encoding='utf-8') as f:
+      json.dump({'args': vars(args), 'results': results}, f, ensure_ascii=False, indent=2)
+    print(f'结果已写入: {args.output}')
+
+  if args.baseline:
+    regressions = compare_with_baseline(results, args.baseline, args.max_regression)
+    if regressions:
+      print('\n发现性能回退:')
+      for item in regressions:
+        print(f'  - {item}')
+      sys.exit(1)
+    print('\n未发现超过阈值的性能回退')
+
+if __name__ == '__main__':
+  main()
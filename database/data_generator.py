@@ -0,0 +1,260 @@
+"""演示schema的大规模合成数据生成器
+
+向 users、orders、products 批量写入分布有偏的合成数据，作为压测和索引测试的基础：
+- 用户所在城市服从Zipf分布，少数大城市占大多数用户；年龄近似正态分布
+- 产品分类和价格按分类设定，价格服从对数正态分布
+- 订单的用户和产品服从幂律分布（少数活跃用户、热销产品占大多数订单），
+  下单日期逐年增长并带有季节性波动，订单状态按比例分布
+
+规模因子为1时生成 1,000 个用户、100 个产品、10,000 条订单，规模与因子成正比。
+
+示例:
+  python database/data_generator.py --scale 100 --seed 7
+  python database/data_generator.py --db /tmp/bench.db --scale 1000 --reset
+"""
+import argparse
+import math
+import os
+import random
+import sqlite3
+import time
+from datetime import date, timedelta
+from itertools import accumulate
+from typing import Dict, List, Any, Iterator, Tuple
+
+DATABASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INIT_SQL_PATH = os.path.join(DATABASE_DIR, 'init.sql')
+
+BASE_USERS = 1000
+BASE_PRODUCTS = 100
+BASE_ORDERS = 10000
+
+CITIES = [
+  '北京', '上海', '广州', '深圳', '杭州', '成都', '武汉', '南京', '重庆', '西安',
+  '苏州', '天津', '长沙', '郑州', '青岛', '沈阳', '宁波', '东莞', '无锡', '厦门',
+  '福州', '合肥', '济南', '大连', '昆明', '哈尔滨', '南昌', '贵阳', '南宁', '兰州',
+]
+
+SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈姚卢姜崔钟谭陆汪范金石廖贾夏韦付方白邹孟熊秦邱江尹薛闫段雷侯龙史陶黎贺顾毛郝龚邵万钱严覃武戴莫孔向汤'
+GIVEN_NAMES = '伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉兰萍红鹏辉建国晨宇浩然子涵欣怡梓轩思远雨桐一诺'
+
+# 分类: (权重, 价格中位数, 产品名称)
+CATEGORIES = {
+  '电子产品': (0.35, 1500.0, ['笔记本电脑', '智能手机', '无线耳机', '平板电脑', '智能手表', '机械键盘', '显示器', '移动电源']),
+  '服装': (0.25, 250.0, ['T恤', '牛仔裤', '羽绒服', '运动裤', '运动鞋', '衬衫', '卫衣', '外套']),
+  '家电': (0.15, 1800.0, ['咖啡机', '空气净化器', '冰箱', '洗衣机', '电饭煲', '吸尘器', '微波炉']),
+  '家具': (0.10, 900.0, ['办公桌', '人体工学椅', '书桌', '沙发', '书架', '床头柜']),
+  '食品': (0.10, 60.0, ['咖啡豆', '坚果礼盒', '茶叶', '巧克力', '牛奶']),
+  '图书': (0.05, 45.0, ['小说', '技术书籍', '绘本', '杂志']),
+}
+
+# 订单状态及比例
+ORDER_STATUSES = [('已完成', 0.80), ('待处理', 0.12), ('已取消', 0.08)]
+
+def zipf_cum_weights(n: int, exponent: float) -> List[float]:
+  """生成Zipf分布的累积权重，供 random.choices 使用"""
+  return list(accumulate(1.0 / (rank ** exponent) for rank in range(1, n + 1)))
+
+class DataGenerator:
+  """合成数据生成器"""
+
+  def __init__(self, db_path: str, scale: float = 1.0, seed: int = 42, batch_size: int = 50000,
+               txn_rows: int = 500000, start_date: date = date(2021, 1, 1), end_date: date = date(2024, 12, 31)):
+    """
+    Args:
+      db_path: SQLite数据库路径，表结构不存在时按 init.sql 创建（含表名、字段映射）
+      scale: 规模因子
+      seed: 随机种子，相同种子生成相同数据
+      batch_size: 每次 executemany 的行数
+      txn_rows: 每个事务提交的行数
+      start_date: 订单日期起始
+      end_date: 订单日期结束
+    """
+    self.db_path = db_path
+    self.scale = scale
+    self.rng = random.Random(seed)
+    self.batch_size = batch_size
+    self.txn_rows = txn_rows
+    self.start_date = start_date
+    self.end_date = end_date
+    self.user_count = max(int(BASE_USERS * scale), 1)
+    self.product_count = max(int(BASE_PRODUCTS * scale ** 0.5), len(CATEGORIES))
+    self.order_count = max(int(BASE_ORDERS * scale), 1)
+
+  def _connect(self) -> sqlite3.Connection:
+    """打开数据库并确保表结构和映射数据存在"""
+    connection = sqlite3.connect(self.db_path)
+    # 与后端一致：只在表结构不存在时执行 init.sql，避免示例数据覆盖已生成的数据
+    initialized = connection.execute(
+      "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ('users', 'orders', 'products', 'table_mapping', 'column_mapping')"
+    ).fetchone()[0] == 5
+    if not initialized:
+      with open(INIT_SQL_PATH, 'r', encoding='utf-8') as f:
+        connection.executescript(f.read())
+    # 批量加载期间降低持久化开销
+    connection.execute('PRAGMA synchronous = OFF')
+    connection.execute('PRAGMA journal_mode = MEMORY')
+    connection.execute('PRAGMA cache_size = -200000')
+    return connection
+
+  def _load(self, connection: sqlite3.Connection, table: str, sql: str, rows: Iterator[Tuple], total: int) -> Dict[str, Any]:
+    """分批写入一张表，每 txn_rows 行提交一次事务"""
+    start = time.perf_counter()
+    written = 0
+    since_commit = 0
+    connection.execute('BEGIN')
+    batch = []
+    for row in rows:
+      batch.append(row)
+      if len(batch) >= self.batch_size:
+        connection.executemany(sql, batch)
+        written += len(batch)
+        since_commit += len(batch)
+        batch = []
+        if since_commit >= self.txn_rows:
+          connection.commit()
+          connection.execute('BEGIN')
+          since_commit = 0
+        print(f'  {table}: {written}/{total}', end='\r')
+    if batch:
+      connection.executemany(sql, batch)
+      written += len(batch)
+    connection.commit()
+    elapsed = time.perf_counter() - start
+    stats = {
+      'table': table,
+      'rows': written,
+      'seconds': elapsed,
+      'rows_per_second': written / elapsed if elapsed > 0 else 0.0,
+    }
+    print(f'  {table}: {written} 行，{elapsed:.1f}s，{stats["rows_per_second"]:,.0f} 行/秒')
+    return stats
+
+  def _next_id(self, connection: sqlite3.Connection, table: str) -> int:
+    return connection.execute(f'SELECT COALESCE(MAX(id), 0) FROM {table}').fetchone()[0] + 1
+
+  def _user_rows(self, first_id: int) -> Iterator[Tuple]:
+    rng = self.rng
+    city_weights = zipf_cum_weights(len(CITIES), 1.1)
+    span_days = (self.end_date - self.start_date).days
+    for i in range(self.user_count):
+      name = rng.choice(SURNAMES) + ''.join(rng.choice(GIVEN_NAMES) for _ in range(rng.choice((1, 2))))
+      age = min(max(int(rng.gauss(32, 9)), 18), 70)
+      city = rng.choices(CITIES, cum_weights=city_weights)[0]
+      created_at = self.start_date + timedelta(days=rng.randrange(span_days + 1))
+      yield (first_id + i, name, age, city, f'{created_at.isoformat()} {rng.randrange(24):02d}:{rng.randrange(60):02d}:00')
+
+  def _build_products(self, first_id: int) -> List[Tuple]:
+    rng = self.rng
+    categories = list(CATEGORIES)
+    weights = [CATEGORIES[c][0] for c in categories]
+    products = []
+    for i in range(self.product_count):
+      category = rng.choices(categories, weights=weights)[0]
+      _, median_price, names = CATEGORIES[category]
+      base_name = rng.choice(names)
+      name = base_name if i < len(categories) * 3 else f'{base_name}-{i:05d}'
+      price = round(rng.lognormvariate(math.log(median_price), 0.5), 2)
+      stock = int(rng.expovariate(1 / 120))
+      products.append((first_id + i, name, category, price, stock))
+    return products
+
+  def _order_date(self) -> date:
+    """订单日期：整体逐年增长，11月、12月为旺季"""
+    rng = self.rng
+    span_days = (self.end_date - self.start_date).days
+    while True:
+      # 线性增长：越靠后的日期被接受的概率越高
+      offset = rng.randrange(span_days + 1)
+      day = self.start_date + timedelta(days=offset)
+      seasonal = 1.6 if day.month in (11, 12) else 1.0
+      if rng.random() < (0.3 + 0.7 * offset / max(span_days, 1)) * seasonal / 1.6:
+        return day
+
+  def _order_rows(self, first_user_id: int, products: List[Tuple]) -> Iterator[Tuple]:
+    rng = self.rng
+    user_weights = zipf_cum_weights(self.user_count, 0.8)
+    product_weights = zipf_cum_weights(len(products), 1.0)
+    statuses = [status for status, _ in ORDER_STATUSES]
+    status_weights = [weight for _, weight in ORDER_STATUSES]
+    # 打乱排名，使活跃用户和热销产品不集中在小id上
+    user_ids = list(range(first_user_id, first_user_id + self.user_count))
+    rng.shuffle(user_ids)
+    ranked_products = list(products)
+    rng.shuffle(ranked_products)
+
+    for _ in range(self.order_count):
+      user_id = rng.choices(user_ids, cum_weights=user_weights)[0]
+      _, product_name, _, price, _ = rng.choices(ranked_products, cum_weights=product_weights)[0]
+      quantity = 1 + int(rng.expovariate(1.5))
+      amount = round(price * quantity, 2)
+      status = rng.choices(statuses, weights=status_weights)[0]
+      yield (user_id, product_name, amount, self._order_date().isoformat(), status)
+
+  def generate(self, reset: bool = False) -> List[Dict[str, Any]]:
+    """
+    生成并写入合成数据
+
+    Args:
+      reset: 是否先清空 users、orders、products 中的已有数据
+
+    Returns:
+      每张表的写入统计（行数、耗时、吞吐量）
+    """
+    connection = self._connect()
+    try:
+      if reset:
+        for table in ('orders', 'users', 'products'):
+          connection.execute(f'DELETE FROM {table}')
+        connection.commit()
+
+      print(f'规模因子 {self.scale}：用户 {self.user_count}，产品 {self.product_count}，订单 {self.order_count}')
+      stats = []
+      first_user_id = self._next_id(connection, 'users')
+      stats.append(self._load(
+        connection, 'users',
+        'INSERT INTO users (id, name, age, city, created_at) VALUES (?, ?, ?, ?, ?)',
+        self._user_rows(first_user_id), self.user_count,
+      ))
+
+      products = self._build_products(self._next_id(connection, 'products'))
+      stats.append(self._load(
+        connection, 'products',
+        'INSERT INTO products (id, name, category, price, stock) VALUES (?, ?, ?, ?, ?)',
+        iter(products), len(products),
+      ))
+
+      stats.append(self._load(
+        connection, 'orders',
+        'INSERT INTO orders (user_id, product_name, amount, order_date, status) VALUES (?, ?, ?, ?, ?)',
+        self._order_rows(first_user_id, products), self.order_count,
+      ))
+
+      # 更新统计信息，便于查询优化器选择索引
+      start = time.perf_counter()
+      connection.execute('ANALYZE')
+      connection.commit()
+      print(f'  ANALYZE: {time.perf_counter() - start:.1f}s')
+      return stats
+    finally:
+      connection.close()
+
+def main():
+  parser = argparse.ArgumentParser(description='演示schema的大规模合成数据生成器')
+  parser.add_argument('--db', default=os.path.join(DATABASE_DIR, 'ai_report.db'), help='SQLite数据库路径')
+  parser.add_argument('--scale', type=float, default=1.0, help='规模因子，1对应1万条订单（默认: 1）')
+  parser.add_argument('--seed', type=int, default=42, help='随机种子（默认: 42）')
+  parser.add_argument('--batch-size', type=int, default=50000, help='每次executemany的行数')
+  parser.add_argument('--txn-rows', type=int, default=500000, help='每个事务提交的行数')
+  parser.add_argument('--reset', action='store_true', help='先清空users、orders、products中的已有数据')
+  args = parser.parse_args()
+
+  generator = DataGenerator(args.db, args.scale, args.seed, args.batch_size, args.txn_rows)
+  start = time.perf_counter()
+  stats = generator.generate(reset=args.reset)
+  elapsed = time.perf_counter() - start
+  total_rows = sum(item['rows'] for item in stats)
+  print(f'完成：共 {total_rows} 行，{elapsed:.1f}s，平均 {total_rows / elapsed:,.0f} 行/秒')
+
+if __name__ == '__main__':
+  main()
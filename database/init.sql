@@ -33,7 +33,7 @@ CREATE TABLE IF NOT EXISTS products (
 CREATE TABLE IF NOT EXISTS table_mapping (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     natural_name VARCHAR(100) NOT NULL UNIQUE,
-    db_table_name VARCHAR(100) NOT NULL UNIQUE,
+    db_table_name VARCHAR(100) NOT NULL,  -- 同一个表可以有多个自然语言名称
     description TEXT
 );
 
@@ -48,6 +48,54 @@ CREATE TABLE IF NOT EXISTS column_mapping (
     UNIQUE(table_id, natural_name)
 );
 
+-- schema版本表：表名、字段映射变化时由触发器递增版本号，后端据此热加载schema
+CREATE TABLE IF NOT EXISTS schema_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+INSERT OR IGNORE INTO schema_version (id, version) VALUES (1, 0);
+
+CREATE TRIGGER IF NOT EXISTS trg_table_mapping_insert AFTER INSERT ON table_mapping
+BEGIN UPDATE schema_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_table_mapping_update AFTER UPDATE ON table_mapping
+BEGIN UPDATE schema_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_table_mapping_delete AFTER DELETE ON table_mapping
+BEGIN UPDATE schema_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_column_mapping_insert AFTER INSERT ON column_mapping
+BEGIN UPDATE schema_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_column_mapping_update AFTER UPDATE ON column_mapping
+BEGIN UPDATE schema_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_column_mapping_delete AFTER DELETE ON column_mapping
+BEGIN UPDATE schema_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1; END;
+
+-- 数据版本表：分析表（用户、订单、产品）写入时由触发器递增版本号，报表快照和只读副本据此判断数据是否变化
+CREATE TABLE IF NOT EXISTS data_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0);
+
+CREATE TRIGGER IF NOT EXISTS trg_data_users_insert AFTER INSERT ON users
+BEGIN UPDATE data_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_data_users_update AFTER UPDATE ON users
+BEGIN UPDATE data_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_data_users_delete AFTER DELETE ON users
+BEGIN UPDATE data_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_data_orders_insert AFTER INSERT ON orders
+BEGIN UPDATE data_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_data_orders_update AFTER UPDATE ON orders
+BEGIN UPDATE data_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_data_orders_delete AFTER DELETE ON orders
+BEGIN UPDATE data_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_data_products_insert AFTER INSERT ON products
+BEGIN UPDATE data_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_data_products_update AFTER UPDATE ON products
+BEGIN UPDATE data_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_data_products_delete AFTER DELETE ON products
+BEGIN UPDATE data_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1; END;
+
 -- 创建索引以提升查询性能
 CREATE INDEX IF NOT EXISTS idx_users_city ON users(city);
 CREATE INDEX IF NOT EXISTS idx_users_age ON users(age);
@@ -162,6 +210,7 @@ CREATE TABLE IF NOT EXISTS report_configs (
     data_source TEXT NOT NULL,  -- SQLite数据库路径或标识
     layout_config TEXT NOT NULL,  -- JSON格式的布局配置
     query_config TEXT,  -- JSON格式的查询配置（表、字段、筛选条件等）
+    schedule TEXT,  -- 预计算的cron表达式（分 时 日 月 周），为空时不预计算
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
 );
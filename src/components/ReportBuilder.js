@@ -27,23 +27,27 @@ function ReportBuilder({ reportId = null, onSave = null }) {
   
   // 加载报表数据
   useEffect(() => {
+    loadSchema();
     if (reportId) {
       loadReport(reportId);
-    } else {
-      loadTables();
     }
   }, [reportId]);
   
-  // 加载表列表
-  const loadTables = async () => {
+  // 一次加载所有表和字段（服务端按ETag缓存，未变化时返回304）
+  const loadSchema = async () => {
     try {
-      const response = await fetch('http://localhost:5000/api/tables');
+      const response = await fetch('http://localhost:5000/api/schema');
       const result = await response.json();
       if (result.success) {
-        setTables(result.data);
+        const tableColumns = {};
+        result.data.tables.forEach((table) => {
+          tableColumns[table.name] = table.columns;
+        });
+        setTables(result.data.tables);
+        setColumns(tableColumns);
       }
     } catch (error) {
-      message.error('加载表列表失败');
+      message.error('加载表结构失败');
     }
   };
   
@@ -67,9 +71,6 @@ function ReportBuilder({ reportId = null, onSave = null }) {
           setSelectedTable(report.query_config.table);
           setSelectedFields(report.query_config.fields || []);
           setFilters(report.query_config.filters || []);
-          if (report.query_config.table) {
-            loadColumns(report.query_config.table);
-          }
         }
       }
     } catch (error) {
@@ -79,27 +80,10 @@ function ReportBuilder({ reportId = null, onSave = null }) {
     }
   };
   
-  // 加载表字段
-  const loadColumns = async (tableName) => {
-    if (!tableName) {
-      return;
-    }
-    try {
-      const response = await fetch(`http://localhost:5000/api/tables/${tableName}/columns`);
-      const result = await response.json();
-      if (result.success) {
-        setColumns({ ...columns, [tableName]: result.data });
-      }
-    } catch (error) {
-      message.error('加载字段列表失败');
-    }
-  };
-  
   // 处理表选择
   const handleTableChange = (value) => {
     setSelectedTable(value);
     setSelectedFields([]);
-    loadColumns(value);
   };
   
   // 添加字段
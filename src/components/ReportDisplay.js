@@ -50,6 +50,10 @@ function ReportDisplay({ result, compact = false }) {
 
   // 分析数据，判断是否适合图表展示
   const chartData = useMemo(() => {
+    // 后端已聚合的图表数据直接使用
+    if (result.chart) {
+      return result.chart;
+    }
     if (!result.data || result.data.length === 0) {
       return null;
     }
@@ -116,7 +120,7 @@ function ReportDisplay({ result, compact = false }) {
     }
 
     return null;
-  }, [result.data, result.columns]);
+  }, [result.data, result.columns, result.chart]);
 
   // 渲染图表
   const renderChart = () => {
@@ -54,7 +54,22 @@ export const reportApi = {
   deleteReport: (reportId) => api.delete(`/api/reports/${reportId}`),
   
   // 执行报表查询
-  executeReport: (queryConfig) => api.post('/api/reports/execute', { query_config: queryConfig }),
+  executeReport: (queryConfig, chart) => api.post('/api/reports/execute', { query_config: queryConfig, chart }),
+  
+  // 执行报表中所有组件的查询
+  executeDashboard: (reportId) => api.post(`/api/reports/${reportId}/dashboard`, {}),
+  
+  // 执行已保存报表的查询（数据未变化时返回预计算的快照）
+  executeSavedReport: (reportId, refresh = false) => api.post(`/api/reports/${reportId}/execute`, { refresh }),
+  
+  // 提交导出任务（format: csv、parquet、xlsx）
+  createExport: (reportId, format) => api.post('/api/exports', { report_id: reportId, format }),
+  
+  // 查询导出任务进度
+  getExport: (jobId) => api.get(`/api/exports/${jobId}`),
+  
+  // 导出文件下载地址
+  getExportDownloadUrl: (jobId) => `${API_BASE_URL}/api/exports/${jobId}/download`,
 };
 
 export default api;